@@ -1,9 +1,18 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Header, Request
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
+from pydantic import BaseModel
 from datetime import datetime, timedelta
+import asyncio
+import hmac
 import jwt
 import os
+import sqlite3
+import uuid
+
+from telemetry import instrument
+from tokens import InvalidRefreshToken, RefreshTokens, Revocations, SigningKeys, TokenRevoked
+from users import LoginGuard, TooManyAttempts, UserStore, client_address
 
 app = FastAPI(title="Auth Service")
 
@@ -18,40 +27,172 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# 라우트별 응답 시간, AWS 호출, 이벤트 루프 지연을 `/metrics`로 노출
+instrument(app)
+
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+# 사용자 테이블이 비어 있을 때만 만드는 초기 관리자 계정. 비밀번호를 주지 않으면 만들지 않음
+ADMIN_USERNAME = os.getenv("ADMIN_USERNAME", "admin")
+ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD")
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
+# 각 서비스가 폐기 목록을 받아갈 때 쓰는 토큰. 설정하지 않으면 폐기 목록을 내려주지 않음
+SERVICE_TOKEN = os.getenv("SERVICE_TOKEN")
+
+store = UserStore()
+guard = LoginGuard(store)
+signing_keys = SigningKeys(store.path, ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+refresh_tokens = RefreshTokens(store.path)
+# 로그아웃된 토큰(jti) 목록. 각 서비스가 seq 이후 항목만 주기적으로 받아가서 캐시된 토큰도 거부함
+revocations = Revocations(store.path)
+
 
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
+    return signing_keys.sign(to_encode)
+
+
+async def decode_access_token(token):
+    # auth-service 안의 모든 access 토큰 확인은 여기로. 서명/만료에 더해 로그아웃된 토큰(jti)도 거부
+    payload = signing_keys.decode(token)
+    if payload.get("jti") and await asyncio.to_thread(revocations.is_revoked, payload["jti"]):
+        raise TokenRevoked("Token has been revoked")
+    return payload
+
+
+async def issue_tokens(username, role, refresh_token=None):
+    refresh_token = refresh_token or await asyncio.to_thread(refresh_tokens.issue, username)
+    return {
+        "access_token": create_access_token({"sub": username, "role": role}),
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        "refresh_token": refresh_token
+    }
+
+
+async def rotate_signing_keys():
+    # 교체 주기의 1/10(최대 1시간)마다 확인해서 새 키 생성/이전 키 정리
+    while True:
+        await asyncio.sleep(min(signing_keys.rotation_seconds / 10, 3600))
+        await asyncio.to_thread(signing_keys.rotate)
+
+
+@app.on_event("startup")
+async def start_background_tasks():
+    await asyncio.to_thread(signing_keys.rotate)
+    app.state.key_rotation = asyncio.create_task(rotate_signing_keys())
+    if ADMIN_PASSWORD and await store.count() == 0:
+        await store.create(ADMIN_USERNAME, ADMIN_PASSWORD, "admin")
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    app.state.key_rotation.cancel()
 
 
 @app.post("/api/auth/login")
-async def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    # 간단한 인증 (실제로는 데이터베이스 확인 필요)
-    if form_data.username == "admin" and form_data.password == "admin":
-        access_token = create_access_token({"sub": form_data.username, "role": "admin"})
-        return {"access_token": access_token, "token_type": "bearer"}
-    raise HTTPException(status_code=401, detail="Incorrect username or password")
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
+    try:
+        client_ip = client_address(request.client.host if request.client else None, request.headers.get("x-forwarded-for"))
+        user = await guard.authenticate(form_data.username, form_data.password, client_ip)
+    except TooManyAttempts as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    if user is None:
+        raise HTTPException(status_code=401, detail="Incorrect username or password")
+    username, _, role = user
+    return await issue_tokens(username, role)
+
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+
+@app.post("/api/auth/refresh")
+async def refresh(request: RefreshRequest):
+    # refresh 토큰은 한 번만 쓸 수 있고, 쓸 때마다 새 access/refresh 토큰을 같이 발급
+    try:
+        username, refresh_token = await asyncio.to_thread(refresh_tokens.rotate, request.refresh_token)
+    except InvalidRefreshToken as e:
+        raise HTTPException(status_code=401, detail=str(e))
+    user = await store.get(username)
+    if user is None:
+        raise HTTPException(status_code=401, detail="User no longer exists")
+    return await issue_tokens(username, user[2], refresh_token)
+
+
+class CreateUserRequest(BaseModel):
+    username: str
+    password: str
+    role: str = "user"
+
+
+@app.post("/api/auth/users", status_code=201)
+async def create_user(request: CreateUserRequest, token: str = Depends(oauth2_scheme)):
+    try:
+        payload = await decode_access_token(token)
+    except TokenRevoked:
+        raise HTTPException(status_code=401, detail="Token revoked")
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    if payload.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Admin role required")
+    if await store.get(request.username):
+        raise HTTPException(status_code=409, detail="User already exists")
+    try:
+        await store.create(request.username, request.password, request.role)
+    except sqlite3.IntegrityError:
+        raise HTTPException(status_code=409, detail="User already exists")
+    return {"username": request.username, "role": request.role}
+
+
+class LogoutRequest(BaseModel):
+    refresh_token: str = None
 
 
 @app.post("/api/auth/logout")
-async def logout():
+async def logout(request: LogoutRequest = None, token: str = Depends(oauth2_scheme)):
+    if request and request.refresh_token:
+        await asyncio.to_thread(refresh_tokens.revoke, request.refresh_token)
+    try:
+        payload = await decode_access_token(token)
+    except jwt.ExpiredSignatureError:
+        # 이미 만료된 토큰은 어느 서비스에서도 통과하지 않으므로 폐기할 필요 없음
+        return {"message": "Logged out successfully"}
+    except TokenRevoked:
+        raise HTTPException(status_code=401, detail="Token revoked")
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    if payload.get("jti"):
+        await asyncio.to_thread(revocations.add, payload["jti"], payload["exp"])
     return {"message": "Logged out successfully"}
 
 
+@app.get("/api/auth/.well-known/jwks.json")
+async def jwks():
+    # 각 서비스가 토큰 헤더의 kid로 공개키를 찾아 검증. 교체 중에는 이전 키도 같이 내려줌
+    return signing_keys.jwks()
+
+
+@app.get("/api/auth/revocations")
+async def list_revocations(since: int = 0, authorization: str = Header(None)):
+    # 서비스 간 호출 전용. SERVICE_TOKEN을 Bearer로 보낸 요청에만 jti와 만료 시각을 내려줌
+    expected = f"Bearer {SERVICE_TOKEN}"
+    if not SERVICE_TOKEN or not hmac.compare_digest((authorization or "").encode(), expected.encode()):
+        raise HTTPException(status_code=403, detail="Service token required")
+    seq, rows = await asyncio.to_thread(revocations.since, since)
+    return {"seq": seq, "revoked": [{"jti": jti, "exp": exp} for jti, exp in rows]}
+
+
 @app.get("/health")
 async def health_check():
     return {
         "status": "healthy",
         "service": "auth-service",
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": datetime.utcnow().isoformat(),
+        "login": guard.stats()
     }
 
 
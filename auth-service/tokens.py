@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import secrets
+import sqlite3
+import time
+import uuid
+from contextlib import closing
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+from jwt.algorithms import OKPAlgorithm, RSAAlgorithm
+
+# 서명 알고리즘은 EdDSA(Ed25519) 또는 RS256. 각 서비스는 JWKS의 공개키로만 검증하므로 비밀키를 공유하지 않음
+JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "EdDSA")
+SIGNING_KEY_ROTATION_HOURS = float(os.getenv("SIGNING_KEY_ROTATION_HOURS", "24"))
+REFRESH_TOKEN_EXPIRE_DAYS = float(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "14"))
+# 전환 기간용. 설정되어 있으면 kid 없는 이전 HS256 토큰도 만료될 때까지 검증/로그아웃 가능
+SECRET_KEY = os.getenv("SECRET_KEY")
+# 키를 교체한 직후 서비스들이 아직 이전 JWKS를 들고 있을 수 있으므로 조금 더 남겨둠
+KEY_RETIRE_MARGIN_SECONDS = 300
+
+JWK_ALGORITHMS = {"EdDSA": OKPAlgorithm, "RS256": RSAAlgorithm}
+
+
+class InvalidRefreshToken(Exception):
+    pass
+
+
+class TokenRevoked(jwt.InvalidTokenError):
+    pass
+
+
+def generate_private_key(algorithm):
+    if algorithm == "EdDSA":
+        return ed25519.Ed25519PrivateKey.generate()
+    if algorithm == "RS256":
+        return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    raise ValueError(f"Unsupported JWT_ALGORITHM: {algorithm}")
+
+
+class SigningKeys:
+    """서명 키 보관/교체. SIGNING_KEY_ROTATION_HOURS마다 새 키로 서명하고, 이전 키는 그 키로 서명된
+    토큰이 모두 만료될 때까지 JWKS에 남겨둠. 키는 사용자 DB에 저장해서 재시작해도 유지됨"""
+
+    def __init__(self, path, token_lifetime_seconds, algorithm=JWT_ALGORITHM,
+                 rotation_seconds=SIGNING_KEY_ROTATION_HOURS * 3600):
+        self.path = path
+        self.token_lifetime_seconds = token_lifetime_seconds
+        self.algorithm = algorithm
+        self.rotation_seconds = rotation_seconds
+        self.keys = []
+        with closing(sqlite3.connect(self.path)) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS signing_keys ("
+                "kid TEXT PRIMARY KEY, algorithm TEXT NOT NULL, private_pem TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+
+    def rotate(self):
+        # 스레드에서 호출. 활성 키가 오래됐거나 알고리즘 설정이 바뀌었으면 새 키를 만들고 만료된 이전 키는 삭제
+        now = time.time()
+        with closing(sqlite3.connect(self.path)) as conn, conn:
+            rows = conn.execute(
+                "SELECT kid, algorithm, private_pem, created_at FROM signing_keys ORDER BY created_at"
+            ).fetchall()
+            if not rows or now - rows[-1][3] >= self.rotation_seconds or rows[-1][1] != self.algorithm:
+                private_key = generate_private_key(self.algorithm)
+                pem = private_key.private_bytes(
+                    serialization.Encoding.PEM,
+                    serialization.PrivateFormat.PKCS8,
+                    serialization.NoEncryption()
+                ).decode()
+                rows.append((uuid.uuid4().hex, self.algorithm, pem, now))
+                conn.execute("INSERT INTO signing_keys VALUES (?, ?, ?, ?)", rows[-1])
+            # 다음 키가 만들어진 시점 + 토큰 수명이 지나면 그 키로 서명된 토큰은 남아 있지 않음
+            retire_before = now - self.token_lifetime_seconds - KEY_RETIRE_MARGIN_SECONDS
+            kept = [row for row, successor in zip(rows, rows[1:]) if successor[3] > retire_before] + rows[-1:]
+            for row in rows:
+                if row not in kept:
+                    conn.execute("DELETE FROM signing_keys WHERE kid = ?", (row[0],))
+        self.keys = [
+            (kid, algorithm, serialization.load_pem_private_key(pem.encode(), password=None))
+            for kid, algorithm, pem, _ in kept
+        ]
+
+    def sign(self, claims):
+        kid, algorithm, private_key = self.keys[-1]
+        return jwt.encode(claims, private_key, algorithm=algorithm, headers={"kid": kid})
+
+    def decode(self, token):
+        kid = jwt.get_unverified_header(token).get("kid")
+        if kid is None:
+            return decode_legacy(token)
+        for key_id, algorithm, private_key in self.keys:
+            if key_id == kid:
+                return jwt.decode(token, private_key.public_key(), algorithms=[algorithm])
+        raise jwt.InvalidTokenError("Unknown signing key")
+
+    def jwks(self):
+        keys = []
+        for kid, algorithm, private_key in self.keys:
+            jwk = json.loads(JWK_ALGORITHMS[algorithm].to_jwk(private_key.public_key()))
+            jwk.update({"kid": kid, "alg": algorithm, "use": "sig"})
+            keys.append(jwk)
+        return {"keys": keys}
+
+
+def token_hash(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def decode_legacy(token):
+    if not SECRET_KEY:
+        raise jwt.InvalidTokenError("Token has no key id")
+    claims = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+    # 이전 토큰에는 jti가 없을 수 있으므로 토큰 해시로 대신함 (각 서비스의 auth.py와 같은 규칙)
+    claims.setdefault("jti", token_hash(token))
+    return claims
+
+
+class RefreshTokens:
+    """refresh 토큰 저장소. 한 번 쓴 토큰은 새 토큰으로 교체되고, 이미 쓴 토큰이 다시 들어오면
+    탈취된 것으로 보고 같은 family(같은 로그인에서 이어진 토큰들) 전체를 폐기함. DB에는 해시만 저장"""
+
+    def __init__(self, path, lifetime_seconds=REFRESH_TOKEN_EXPIRE_DAYS * 86400):
+        self.path = path
+        self.lifetime_seconds = lifetime_seconds
+        with closing(sqlite3.connect(self.path)) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS refresh_tokens ("
+                "token_hash TEXT PRIMARY KEY, family TEXT NOT NULL, username TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, used INTEGER NOT NULL DEFAULT 0)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS refresh_tokens_family ON refresh_tokens (family)")
+
+    def _insert(self, conn, username, family):
+        token = secrets.token_urlsafe(32)
+        conn.execute(
+            "INSERT INTO refresh_tokens (token_hash, family, username, expires_at) VALUES (?, ?, ?, ?)",
+            (token_hash(token), family, username, time.time() + self.lifetime_seconds)
+        )
+        return token
+
+    def issue(self, username):
+        with closing(sqlite3.connect(self.path)) as conn, conn:
+            conn.execute("DELETE FROM refresh_tokens WHERE expires_at < ?", (time.time(),))
+            return self._insert(conn, username, uuid.uuid4().hex)
+
+    def rotate(self, token):
+        # (username, 새 refresh 토큰). 동시에 같은 토큰으로 두 번 교체되지 않도록 쓰기 잠금을 잡고 처리
+        with closing(sqlite3.connect(self.path, isolation_level=None)) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT family, username, expires_at, used FROM refresh_tokens WHERE token_hash = ?",
+                    (token_hash(token),)
+                ).fetchone()
+                if row is None or row[2] < time.time():
+                    raise InvalidRefreshToken("Invalid refresh token")
+                family, username, _, used = row
+                if used:
+                    conn.execute("DELETE FROM refresh_tokens WHERE family = ?", (family,))
+                    conn.execute("COMMIT")
+                    raise InvalidRefreshToken("Refresh token reuse detected")
+                conn.execute("UPDATE refresh_tokens SET used = 1 WHERE token_hash = ?", (token_hash(token),))
+                new_token = self._insert(conn, username, family)
+                conn.execute("COMMIT")
+                return username, new_token
+            except InvalidRefreshToken:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def revoke(self, token):
+        with closing(sqlite3.connect(self.path)) as conn, conn:
+            conn.execute(
+                "DELETE FROM refresh_tokens WHERE family = "
+                "(SELECT family FROM refresh_tokens WHERE token_hash = ?)",
+                (token_hash(token),)
+            )
+
+
+class Revocations:
+    """로그아웃된 access 토큰(jti) 목록. refresh 토큰과 같은 DB에 저장해서 재시작해도 유지되고,
+    각 서비스는 seq 이후에 추가된 항목만 받아감. 만료된 항목은 추가할 때 정리"""
+
+    def __init__(self, path):
+        self.path = path
+        with closing(sqlite3.connect(self.path)) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS revoked_tokens ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, jti TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS revoked_tokens_jti ON revoked_tokens (jti)")
+
+    def add(self, jti, exp):
+        with closing(sqlite3.connect(self.path)) as conn, conn:
+            conn.execute("DELETE FROM revoked_tokens WHERE expires_at <= ?", (time.time(),))
+            conn.execute("INSERT INTO revoked_tokens (jti, expires_at) VALUES (?, ?)", (jti, exp))
+
+    def is_revoked(self, jti):
+        with closing(sqlite3.connect(self.path)) as conn:
+            return conn.execute("SELECT 1 FROM revoked_tokens WHERE jti = ? LIMIT 1", (jti,)).fetchone() is not None
+
+    def since(self, seq):
+        # (마지막 seq, seq 이후 항목). AUTOINCREMENT라 만료 항목을 지워도 seq는 줄지 않음
+        with closing(sqlite3.connect(self.path)) as conn:
+            row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'revoked_tokens'").fetchone()
+            rows = conn.execute(
+                "SELECT jti, expires_at FROM revoked_tokens WHERE seq > ? AND expires_at > ? ORDER BY seq",
+                (seq, time.time())
+            ).fetchall()
+        return (row[0] if row else 0), rows
@@ -0,0 +1,204 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import ipaddress
+import os
+import sqlite3
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from datetime import datetime
+
+USERS_DB = os.getenv("USERS_DB", "users.db")
+# scrypt 파라미터 (N=2^14, r=8 → 해시 하나에 16MB). 저장된 해시에 파라미터를 같이 기록하므로 바꿔도 기존 해시는 그대로 검증됨
+HASH_N = int(os.getenv("PASSWORD_HASH_N", str(2 ** 14)))
+HASH_R = int(os.getenv("PASSWORD_HASH_R", "8"))
+HASH_P = int(os.getenv("PASSWORD_HASH_P", "1"))
+LOGIN_MAX_PENDING = int(os.getenv("LOGIN_MAX_PENDING", "64"))
+LOGIN_MAX_FAILURES = int(os.getenv("LOGIN_MAX_FAILURES", "5"))
+LOGIN_FAILURE_WINDOW = float(os.getenv("LOGIN_FAILURE_WINDOW", "300"))
+# X-Forwarded-For를 믿을 프록시(ALB 등) 대역 (쉼표 구분 CIDR). 비워두면 헤더를 무시하고 접속한 주소를 그대로 씀
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(cidr.strip(), strict=False)
+    for cidr in os.getenv("TRUSTED_PROXIES", "").split(",") if cidr.strip()
+]
+
+
+def available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+# hashlib.scrypt는 계산 중 GIL을 풀기 때문에 프로세스 풀 없이 스레드만으로 코어 수만큼 병렬 처리됨
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(available_cores())))
+hash_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="hash")
+# 클라이언트 하나가 해시 대기열을 다 차지하지 못하도록 클라이언트 IP별 동시 로그인 수 제한
+LOGIN_MAX_PENDING_PER_CLIENT = int(os.getenv("LOGIN_MAX_PENDING_PER_CLIENT", str(HASH_WORKERS * 2)))
+
+
+def is_trusted_proxy(host):
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in TRUSTED_PROXIES)
+
+
+def client_address(peer, forwarded_for=None):
+    # 클라이언트가 X-Forwarded-For 앞부분을 마음대로 넣을 수 있으므로 믿을 프록시가 붙인 오른쪽부터 거슬러 올라가
+    # 처음 나오는 믿지 않는 주소를 클라이언트로 봄 (로그인 제한이 헤더 조작으로 우회되지 않도록)
+    if peer is None or not forwarded_for or not is_trusted_proxy(peer):
+        return peer
+    hops = [hop.strip() for hop in forwarded_for.split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not is_trusted_proxy(hop):
+            return hop
+    return hops[0] if hops else peer
+
+
+class TooManyAttempts(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Too many attempts, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+def hash_password(password, salt=None, n=HASH_N, r=HASH_R, p=HASH_P):
+    salt = salt or os.urandom(16)
+    digest = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r + 1024 * 1024)
+    encode = lambda value: base64.b64encode(value).decode()
+    return f"scrypt${n}${r}${p}${encode(salt)}${encode(digest)}"
+
+
+def check_password(password, encoded):
+    _, n, r, p, salt, digest = encoded.split("$")
+    expected = hash_password(password, base64.b64decode(salt), int(n), int(r), int(p))
+    return hmac.compare_digest(expected.encode(), encoded.encode())
+
+
+# 없는 사용자도 같은 시간만큼 해시를 계산해서 응답 시간으로 사용자 존재 여부를 알 수 없도록 함
+DUMMY_HASH = hash_password("dummy-password")
+
+
+class UserStore:
+    """SQLite 사용자 저장소. 쿼리는 짧으므로 호출마다 연결을 열고 닫음"""
+
+    def __init__(self, path=USERS_DB):
+        self.path = path
+        with closing(sqlite3.connect(self.path)) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS users ("
+                "username TEXT PRIMARY KEY, password_hash TEXT NOT NULL, role TEXT NOT NULL, created_at TEXT NOT NULL)"
+            )
+
+    def _get(self, username):
+        with closing(sqlite3.connect(self.path)) as conn:
+            return conn.execute(
+                "SELECT username, password_hash, role FROM users WHERE username = ?", (username,)
+            ).fetchone()
+
+    def _create(self, username, password_hash, role):
+        with closing(sqlite3.connect(self.path)) as conn, conn:
+            conn.execute(
+                "INSERT INTO users (username, password_hash, role, created_at) VALUES (?, ?, ?, ?)",
+                (username, password_hash, role, datetime.utcnow().isoformat())
+            )
+
+    def _count(self):
+        with closing(sqlite3.connect(self.path)) as conn:
+            return conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    async def get(self, username):
+        return await asyncio.to_thread(self._get, username)
+
+    async def create(self, username, password, role):
+        password_hash = await run_hash(hash_password, password)
+        await asyncio.to_thread(self._create, username, password_hash, role)
+
+    async def count(self):
+        return await asyncio.to_thread(self._count)
+
+
+async def run_hash(fn, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(hash_executor, fn, *args)
+
+
+class LoginGuard:
+    """로그인 해시 계산을 코어 수만큼만 돌리고, 대기열이 차면 바로 거절해서 무차별 대입 요청이 몰려도
+    이벤트 루프와 다른 요청이 밀리지 않도록 함. (사용자, 클라이언트 IP)별 실패 횟수도 제한"""
+
+    def __init__(self, store, max_pending=LOGIN_MAX_PENDING, max_pending_per_client=LOGIN_MAX_PENDING_PER_CLIENT,
+                 max_failures=LOGIN_MAX_FAILURES, failure_window=LOGIN_FAILURE_WINDOW):
+        self.store = store
+        self.max_pending = max_pending
+        self.max_pending_per_client = max_pending_per_client
+        self._pending_by_client = {}
+        self.max_failures = max_failures
+        self.failure_window = failure_window
+        self._failures = {}
+        self.pending = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.throttled = 0
+
+    def _check_failures(self, key):
+        failures = self._failures.get(key)
+        if not failures:
+            return
+        now = time.monotonic()
+        while failures and now - failures[0] > self.failure_window:
+            failures.popleft()
+        if not failures:
+            del self._failures[key]
+        elif len(failures) >= self.max_failures:
+            self.throttled += 1
+            raise TooManyAttempts(int(self.failure_window - (now - failures[0])) + 1)
+
+    def _record_failure(self, key):
+        self._failures.setdefault(key, deque()).append(time.monotonic())
+        # 오래된 키가 쌓이지 않도록 가끔 정리
+        if len(self._failures) > 10000:
+            now = time.monotonic()
+            for stale in [k for k, v in self._failures.items() if now - v[-1] > self.failure_window]:
+                del self._failures[stale]
+
+    async def authenticate(self, username, password, client_ip):
+        # 성공하면 사용자 row, 실패하면 None
+        key = (username, client_ip)
+        self._check_failures(key)
+        client_pending = self._pending_by_client.get(client_ip, 0)
+        if self.pending >= self.max_pending or client_pending >= self.max_pending_per_client:
+            self.throttled += 1
+            raise TooManyAttempts(1)
+        self.pending += 1
+        self._pending_by_client[client_ip] = client_pending + 1
+        try:
+            user = await self.store.get(username)
+            valid = await run_hash(check_password, password, user[1] if user else DUMMY_HASH)
+        finally:
+            self.pending -= 1
+            self._pending_by_client[client_ip] -= 1
+            if not self._pending_by_client[client_ip]:
+                del self._pending_by_client[client_ip]
+        if user and valid:
+            self._failures.pop(key, None)
+            self.succeeded += 1
+            return user
+        self._record_failure(key)
+        self.failed += 1
+        return None
+
+    def stats(self):
+        return {
+            "hash_workers": HASH_WORKERS,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "max_pending_per_client": self.max_pending_per_client,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "throttled": self.throttled,
+        }
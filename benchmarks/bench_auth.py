@@ -0,0 +1,81 @@
+"""요청당 JWT 검증 비용 측정: 기존 방식(동기 의존성 + 매번 jwt.decode) / 캐시 없는 검증 / 캐시된 검증
+
+    python benchmarks/bench_auth.py --requests 5000 --calls 200000
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+import httpx
+import jwt
+from fastapi import Depends, FastAPI, HTTPException
+
+from harness import SECRET_KEY, load_service, make_token
+
+
+def legacy_verify_token(token):
+    # 변경 전 서비스들의 verify_token과 같은 방식
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+
+def bench_calls(auth, token, calls):
+    # 의존성 함수 밖에서 검증 자체의 비용만 비교
+    results = {}
+    for label, verifier in (("uncached", auth.TokenVerifier(max_entries=0)), ("cached", auth.TokenVerifier())):
+        started = time.perf_counter()
+        for _ in range(calls):
+            verifier.verify(token)
+        results[label] = (time.perf_counter() - started) / calls * 1e6
+    for label, micros in results.items():
+        print(f"verify {label:<9} {micros:8.2f} us/call")
+
+
+def build_app(auth, mode):
+    app = FastAPI()
+    if mode == "legacy":
+        def dependency(token: str = Depends(auth.oauth2_scheme)):
+            return legacy_verify_token(token)
+    else:
+        dependency = auth.verify_token
+
+    @app.get("/ping")
+    async def ping(user=Depends(dependency)):
+        return {"sub": user["sub"]}
+
+    return app
+
+
+async def bench_requests(auth, token, requests):
+    headers = {"Authorization": f"Bearer {token}"}
+    for mode, cache_size in (("legacy", 0), ("uncached", 0), ("cached", 10000)):
+        auth.verifier = auth.TokenVerifier(max_entries=cache_size)
+        app = build_app(auth, mode)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                                     headers=headers) as client:
+            await client.get("/ping")
+            started = time.perf_counter()
+            for _ in range(requests):
+                await client.get("/ping")
+            elapsed = time.perf_counter() - started
+        print(f"request {mode:<9} {elapsed / requests * 1e6:8.1f} us/request  {requests / elapsed:8.0f} req/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--calls", type=int, default=200000)
+    args = parser.parse_args()
+
+    load_service("s3")
+    auth = sys.modules["auth"]
+    token = make_token()
+    bench_calls(auth, token, args.calls)
+    asyncio.run(bench_requests(auth, token, args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""auth-service 로그인 처리량과 무차별 대입 burst 중 다른 요청의 응답 시간 측정
+
+    python benchmarks/bench_auth_login.py --logins 64 --concurrency 1,4,16 --burst 500
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+
+from harness import load_service
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def login(client, username, password):
+    return await client.post("/api/auth/login", data={"username": username, "password": password})
+
+
+async def bench_throughput(service, logins, concurrency):
+    # 사용자마다 다른 IP에서 로그인하는 상황 (IP별 동시 로그인 제한에 걸리지 않도록 워커마다 클라이언트를 따로 둠)
+    queue = asyncio.Queue()
+    for i in range(logins):
+        queue.put_nowait(i)
+
+    async def worker(index):
+        transport = httpx.ASGITransport(app=service.app, client=(f"10.1.0.{index}", 40000))
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            while not queue.empty():
+                i = queue.get_nowait()
+                response = await login(client, f"user{i % 8}", "correct-password")
+                assert response.status_code == 200, response.text
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(index) for index in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    print(f"concurrency={concurrency:<3} {logins / elapsed:7.1f} logins/s")
+
+
+async def bench_burst(client, attacker, burst):
+    # 다른 IP(attacker)에서 사용자 이름을 바꿔가며 틀린 비밀번호를 한꺼번에 보내는 동안 /health와 정상 로그인 응답 시간 측정
+    health_latencies = []
+    login_latencies = []
+    done = asyncio.Event()
+
+    async def probe_health():
+        while not done.is_set():
+            started = time.perf_counter()
+            await client.get("/health")
+            health_latencies.append(time.perf_counter() - started)
+            await asyncio.sleep(0.01)
+
+    async def legit_logins():
+        while not done.is_set():
+            started = time.perf_counter()
+            response = await login(client, "user0", "correct-password")
+            login_latencies.append((time.perf_counter() - started, response.status_code))
+            await asyncio.sleep(0.05)
+
+    background = [asyncio.create_task(probe_health()), asyncio.create_task(legit_logins())]
+    started = time.perf_counter()
+    responses = await asyncio.gather(*(login(attacker, f"victim{i}", "wrong") for i in range(burst)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await asyncio.gather(*background)
+
+    statuses = [response.status_code for response in responses]
+    ok_logins = [latency for latency, status in login_latencies if status == 200]
+    print(f"burst={burst}  {elapsed:.2f}s  401={statuses.count(401)}  429={statuses.count(429)}")
+    print(f"/health during burst  p50={statistics.median(health_latencies) * 1000:.1f}ms  "
+          f"p99={percentile(health_latencies, 0.99) * 1000:.1f}ms  n={len(health_latencies)}")
+    if ok_logins:
+        print(f"legit login during burst  p50={statistics.median(ok_logins) * 1000:.0f}ms  "
+              f"ok={len(ok_logins)}/{len(login_latencies)}")
+
+
+async def run(service, args):
+    await service.start_background_tasks()
+    for i in range(8):
+        await service.store.create(f"user{i}", "correct-password", "user")
+    print(service.guard.stats())
+    transport = httpx.ASGITransport(app=service.app)
+    attacker_transport = httpx.ASGITransport(app=service.app, client=("10.0.0.66", 40000))
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client, \
+            httpx.AsyncClient(transport=attacker_transport, base_url="http://bench", timeout=120) as attacker:
+        for concurrency in args.concurrency:
+            await bench_throughput(service, args.logins, concurrency)
+        await bench_burst(client, attacker, args.burst)
+    print(service.guard.stats())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--concurrency", type=lambda s: [int(x) for x in s.split(",")], default=[1, 4, 16])
+    parser.add_argument("--burst", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["USERS_DB"] = os.path.join(directory, "users.db")
+        service = load_service("auth")
+        asyncio.run(run(service, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""s3-service에 동시 요청을 보내 AWS 호출 계층의 처리량이 동시성에 비례하는지 확인
+
+    python benchmarks/bench_aws_concurrency.py --latency 0.05 --levels 1,8,32
+
+캐시 적중이나 같은 키 요청 합치기가 끼지 않도록 캐시를 끄고 요청마다 다른 prefix로 객체 목록을 조회함
+(--cache on이면 캐시를 켠 상태로 같은 요청을 보내서 비교)
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import time
+
+from harness import StubClient, client_for, load_service
+
+requests_sent = itertools.count()
+
+
+async def run_level(main, concurrency: int, rounds: int, cached: bool):
+    async with client_for(main.app) as client:
+        started = time.perf_counter()
+        for _ in range(rounds):
+            params = [{} if cached else {"prefix": f"p{next(requests_sent)}/"} for _ in range(concurrency)]
+            responses = await asyncio.gather(
+                *(client.get("/api/s3/buckets/bench/objects", params=p) for p in params)
+            )
+            assert all(r.status_code == 200 for r in responses)
+        elapsed = time.perf_counter() - started
+    return concurrency * rounds / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--levels", default="1,4,16,32")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--cache", choices=("on", "off"), default="off")
+    args = parser.parse_args()
+
+    if args.cache == "off":
+        os.environ["CACHE_STALE_SECONDS"] = "0"
+        os.environ["OBJECTS_CACHE_TTL"] = "0"
+    # API별 호출 한도(기본 20/s)가 아니라 동시 실행 수에 따른 처리량을 보려는 것이므로 한도를 충분히 높임
+    os.environ.setdefault("AWS_RATE_LIMIT", "100000")
+    os.environ.setdefault("AWS_RATE_BURST", "100000")
+
+    service = load_service("s3")
+    service.s3_client = StubClient(args.latency, {"list_objects_v2": {"Contents": [], "IsTruncated": False}})
+
+    async def run_all():
+        for level in (int(x) for x in args.levels.split(",")):
+            calls = service.s3_client.calls
+            rps = await run_level(service, level, args.rounds, args.cache == "on")
+            print(f"concurrency={level:4d}  {rps:8.1f} req/s  aws_calls={service.s3_client.calls - calls}")
+
+    asyncio.run(run_all())
+    print(service.aws.stats())
+    print(service.cache.stats())
+
+
+if __name__ == "__main__":
+    main()
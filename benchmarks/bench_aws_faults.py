@@ -0,0 +1,72 @@
+"""장애를 흉내 내는 boto3 대역으로 AWS 호출 계층의 속도 제한/재시도/회로 차단과 캐시 대체 응답 확인
+
+    python benchmarks/bench_aws_faults.py --calls 200 --aws-rate 10
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from harness import FaultyClient, client_for, load_service
+
+
+async def bench_throttling(service, calls, aws_rate):
+    # AWS 한도(aws_rate/s)보다 훨씬 많은 호출을 한꺼번에 보냄. 호출 계층이 속도를 줄여서 대부분 재시도 안에 성공해야 함
+    client = FaultyClient(0.01, {"describe_instances": {"Reservations": []}}, rate_limit=aws_rate)
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(service.aws.call(client.describe_instances) for _ in range(calls)), return_exceptions=True
+    )
+    elapsed = time.perf_counter() - started
+    failed = sum(isinstance(result, Exception) for result in results)
+    print(f"throttling  calls={calls} ok={calls - failed} failed={failed} aws_throttled={client.throttled} "
+          f"{elapsed:.1f}s ({calls / elapsed:.1f} calls/s, aws limit {aws_rate}/s)")
+    print(f"            {service.aws.stats()}")
+
+
+async def bench_outage(service):
+    # 버킷 목록을 한 번 캐시한 뒤 AWS를 내려서, 회로가 열리고 만료된 캐시 값으로 응답하는지 확인
+    service.s3_client = FaultyClient(0.01, {"list_buckets": {"Buckets": [{"Name": "bench"}]}})
+    async with client_for(service.app) as http:
+        response = await http.get("/api/s3/buckets")
+        assert response.status_code == 200
+        service.s3_client.down = True
+        for entry in service.cache._entries.values():
+            entry.fetched_at -= entry.ttl + service.cache.stale_seconds
+
+        statuses = []
+        started = time.perf_counter()
+        for _ in range(20):
+            statuses.append((await http.get("/api/s3/buckets")).status_code)
+        elapsed = time.perf_counter() - started
+        print(f"outage      20 requests in {elapsed:.2f}s statuses={sorted(set(statuses))} "
+              f"aws_attempts_failed={service.s3_client.failed} cache_fallbacks={service.cache.fallbacks}")
+        print(f"            circuits={service.aws.stats()['circuits']} rejected={service.aws.stats()['rejected']}")
+
+        # 캐시 값이 없는 조회는 회로가 열릴 때까지 500, 열린 뒤에는 AWS를 부르지 않고 503 + Retry-After
+        responses = [await http.get("/api/s3/buckets/bench/objects") for _ in range(8)]
+        print(f"            uncached endpoint: {[r.status_code for r in responses]} "
+              f"Retry-After={responses[-1].headers.get('retry-after')}")
+
+        service.s3_client.down = False
+        await asyncio.sleep(float(os.environ["AWS_BREAKER_RESET_SECONDS"]))
+        for entry in service.cache._entries.values():
+            entry.fetched_at -= entry.ttl + service.cache.stale_seconds
+        response = await http.get("/api/s3/buckets")
+        print(f"recovery    status={response.status_code} circuits={service.aws.stats()['circuits']}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--aws-rate", type=float, default=10)
+    args = parser.parse_args()
+
+    os.environ.setdefault("AWS_BREAKER_RESET_SECONDS", "2")
+    # 기본 속도 한도(AWS_RATE_LIMIT)를 쓰는 ec2 서비스의 호출 계층으로 확인
+    asyncio.run(bench_throttling(load_service("ec2"), args.calls, args.aws_rate))
+    asyncio.run(bench_outage(load_service("s3")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""prefix 일괄 삭제(DeleteObjects 배치)와 키별 DELETE 요청 비교, 진행 이벤트 이어 받기/재개 확인
+
+    python benchmarks/bench_bulk_delete.py --objects 100000 --latency 0.05 --concurrency 4
+"""
+import argparse
+import asyncio
+import bisect
+import json
+import os
+import threading
+import time
+
+from harness import StubClient, client_for, load_service
+
+
+class FakeBucket:
+    """list_objects_v2 / delete_objects / delete_object 응답을 만드는 S3 버킷 대역. denied로 시작하는 키는 삭제 거부"""
+
+    def __init__(self, count, denied=0):
+        self.keys = sorted([f"tmp-run-1-obj-{i:07d}" for i in range(count)] +
+                           [f"tmp-run-1-denied-{i:03d}" for i in range(denied)])
+        self._lock = threading.Lock()
+
+    def list_objects_v2(self, Bucket, Prefix="", MaxKeys=1000, StartAfter=None, ContinuationToken=None, **kwargs):
+        with self._lock:
+            after = ContinuationToken or StartAfter
+            start = bisect.bisect_right(self.keys, after) if after else bisect.bisect_left(self.keys, Prefix)
+            page = [key for key in self.keys[start:start + MaxKeys] if key.startswith(Prefix)]
+        response = {"Contents": [{"Key": key} for key in page], "IsTruncated": len(page) == MaxKeys}
+        if response["IsTruncated"]:
+            response["NextContinuationToken"] = page[-1]
+        return response
+
+    def delete_objects(self, Bucket, Delete):
+        errors = []
+        with self._lock:
+            for item in Delete["Objects"]:
+                if "-denied-" in item["Key"]:
+                    errors.append({"Key": item["Key"], "Code": "AccessDenied", "Message": "Access Denied"})
+                    continue
+                index = bisect.bisect_left(self.keys, item["Key"])
+                if index < len(self.keys) and self.keys[index] == item["Key"]:
+                    del self.keys[index]
+        return {"Errors": errors} if errors else {}
+
+    def delete_object(self, Bucket, Key):
+        return self.delete_objects(Bucket, {"Objects": [{"Key": Key}]})
+
+
+def parse_sse(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if "event" in fields:
+            events.append((int(fields["id"]) if "id" in fields else None, fields["event"], json.loads(fields["data"])))
+    return events
+
+
+async def per_key(service, bucket, http, samples):
+    # 기존 방식: 키마다 DELETE 요청 하나와 AWS 호출 하나
+    keys = bucket.keys[:samples]
+    started = time.perf_counter()
+    for key in keys:
+        response = await http.delete(f"/api/s3/buckets/bench/objects/{key}")
+        assert response.status_code == 200, response.text
+    return (time.perf_counter() - started) / samples
+
+
+async def bench(service, args):
+    bucket = FakeBucket(args.objects, denied=args.denied)
+    service.s3_client = StubClient(args.latency, {
+        "list_objects_v2": bucket.list_objects_v2,
+        "delete_objects": bucket.delete_objects,
+        "delete_object": bucket.delete_object,
+    })
+    async with client_for(service.app) as http:
+        per_request = await per_key(service, bucket, http, args.samples)
+        remaining = len(bucket.keys)
+        print(f"per-key DELETE      {per_request * 1000:7.1f} ms/object -> {remaining} objects ≈ "
+              f"{per_request * remaining / 60:.1f} min")
+
+        # 일괄 삭제를 시작하고 진행 스트림을 몇 이벤트만 받다가 끊은 뒤, Last-Event-ID로 이어 받음
+        # (httpx ASGITransport는 응답을 끝까지 모아서 돌려주므로 끊기는 연결은 엔드포인트가 쓰는 제너레이터로 흉내 냄)
+        started = time.perf_counter()
+        response = await http.post("/api/s3/buckets/bench/delete", json={"prefix": "tmp-run-1-"})
+        assert response.status_code == 202, response.text
+        job_id = response.json()["job_id"]
+        seen = []
+        stream = service.delete_jobs.events(service.delete_jobs.get(job_id))
+        async for message in stream:
+            seen.extend(event for event in parse_sse(message) if event[0] is not None)
+            if len(seen) >= 5:
+                break
+        await stream.aclose()
+        last_id = max(seq for seq, _, _ in seen)
+        print(f"stream              disconnected after event {last_id}")
+        response = await http.get(f"/api/s3/delete-jobs/{job_id}/events", headers={"Last-Event-ID": str(last_id)})
+        resumed = parse_sse(response.text)
+        seqs = [seq for seq, _, _ in resumed if seq is not None]
+        assert seqs[0] == last_id + 1 and seqs == list(range(seqs[0], seqs[-1] + 1)), seqs[:5]
+        done = resumed[-1][2]
+        elapsed = time.perf_counter() - started
+        errors = sum(len(data.get("errors", [])) for _, event, data in seen + resumed if event == "progress")
+        print(f"bulk delete         {done['deleted']} deleted, {done['failed_keys']} failed ({errors} per-key errors "
+              f"streamed) in {elapsed:.1f}s, {done['batches']} batches, status={done['status']}")
+        print(f"                    resumed stream: events {seqs[0]}..{seqs[-1]} without gaps, "
+              f"bucket left with {len(bucket.keys)} keys")
+
+        # 작업을 중간에 취소한 뒤 resume_after부터 다시 시작하면 나머지만 지움
+        bucket.keys = FakeBucket(max(args.objects // 10, 10000)).keys
+        response = await http.post("/api/s3/buckets/bench/delete", json={"prefix": "tmp-run-1-"})
+        job_id = response.json()["job_id"]
+        while True:
+            status = (await http.get(f"/api/s3/delete-jobs/{job_id}")).json()
+            if status["batches"] >= 3 or status["finished_at"]:
+                break
+            await asyncio.sleep(0.01)
+        cancelled = (await http.delete(f"/api/s3/delete-jobs/{job_id}")).json()
+        response = await http.post("/api/s3/buckets/bench/delete",
+                                   json={"prefix": "tmp-run-1-", "start_after": cancelled["resume_after"]})
+        assert response.status_code == 202, response.text
+        job = service.delete_jobs.get(response.json()["job_id"])
+        await job.done.wait()
+        print(f"cancel + resume     cancelled after {cancelled['deleted']} ({cancelled['status']}), "
+              f"resumed after {cancelled['resume_after']!r}: {job.deleted} more, bucket left with {len(bucket.keys)}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--objects", type=int, default=100000)
+    parser.add_argument("--denied", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--samples", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    os.environ["DELETE_CONCURRENCY"] = str(args.concurrency)
+    os.environ["INVENTORY_ENABLED"] = "0"
+    asyncio.run(bench(load_service("s3"), args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""인벤토리 색인의 증분 갱신(상세 조회 수)과 검색 응답 시간을 목록 API를 매번 훑는 경우와 비교
+
+    python benchmarks/bench_inventory.py --functions 2000 --latency 0.02
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from datetime import datetime
+
+from harness import StubClient, client_for, load_service
+
+PAGE_SIZE = 50
+
+
+class LambdaInventory:
+    """list_functions(페이지) / list_tags 응답을 만드는 Lambda 대역 데이터"""
+
+    def __init__(self, count):
+        self.functions = {}
+        self.version = 0
+        for i in range(count):
+            self.add(f"app-{i % 40}-worker-{i}", {"team": f"team-{i % 7}", "env": "prod" if i % 3 else "dev"})
+
+    def add(self, name, tags):
+        self.version += 1
+        self.functions[name] = {
+            "FunctionName": name,
+            "FunctionArn": f"arn:aws:lambda:ap-northeast-2:123456789012:function:{name}",
+            "Runtime": "python3.11",
+            "LastModified": datetime.utcnow().isoformat(),
+            "CodeSha256": f"sha-{self.version}",
+            "Tags": tags,
+        }
+
+    def deploy(self, name):
+        self.version += 1
+        self.functions[name]["CodeSha256"] = f"sha-{self.version}"
+
+    def list_functions(self, Marker=None):
+        names = sorted(self.functions)
+        start = int(Marker or 0)
+        page = [{k: v for k, v in self.functions[name].items() if k != "Tags"} for name in names[start:start + PAGE_SIZE]]
+        response = {"Functions": page}
+        if start + PAGE_SIZE < len(names):
+            response["NextMarker"] = str(start + PAGE_SIZE)
+        return response
+
+    def list_tags(self, Resource):
+        return {"Tags": self.functions[Resource.rsplit(":", 1)[1]]["Tags"]}
+
+
+async def refresh(inventory, stub, label):
+    calls = stub.calls
+    detail_calls = inventory.detail_calls
+    seq = inventory.seq
+    started = time.perf_counter()
+    await inventory.refresh()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<22} {elapsed * 1000:8.0f} ms  aws_calls={stub.calls - calls:<5} "
+          f"detail_calls={inventory.detail_calls - detail_calls:<5} changes={inventory.seq - seq}")
+
+
+async def run(service, args):
+    data = LambdaInventory(args.functions)
+    stub = StubClient(args.latency, {"list_functions": data.list_functions, "list_tags": data.list_tags})
+    service.lambda_client = stub
+    inventory = service.inventory
+
+    await refresh(inventory, stub, "first snapshot")
+    await refresh(inventory, stub, "no changes")
+    for i in range(10):
+        data.deploy(f"app-{i % 40}-worker-{i}")
+    for i in range(10, 15):
+        del data.functions[f"app-{i % 40}-worker-{i}"]
+    for i in range(5):
+        data.add(f"new-function-{i}", {"team": "team-new"})
+    await refresh(inventory, stub, "10 deploy/5 del/5 new")
+    print(f"{'':<23}events: {sorted({event['change'] for event in inventory.changes_since(0)['changes']})}")
+
+    async with client_for(service.app) as http:
+        # 목록 API를 처음부터 끝까지 받아서 클라이언트에서 이름으로 거르는 경우 (태그 조건은 함수별 list_tags가 더 필요)
+        async def scan():
+            params = {}
+            found = []
+            while True:
+                response = await service.aws.call(stub.list_functions, **params)
+                found.extend(f for f in response["Functions"] if "worker-1" in f["FunctionName"])
+                if not response.get("NextMarker"):
+                    return found
+                params["Marker"] = response["NextMarker"]
+
+        async def search():
+            response = await http.get("/api/lambda/search", params={"q": "worker-1", "tag": "env=prod"})
+            assert response.status_code == 200, response.text
+            return response.json()
+
+        for label, fn in (("list + client scan", scan), ("GET /api/lambda/search", search)):
+            latencies = []
+            for _ in range(args.rounds):
+                started = time.perf_counter()
+                await fn()
+                latencies.append(time.perf_counter() - started)
+            print(f"{label:<22} {statistics.median(latencies) * 1000:8.1f} ms (median of {args.rounds})")
+        result = await search()
+        print(f"{'':<23}total={result['total']} returned={len(result['results'])}")
+
+    for query, tags in (("worker 1234", []), ("app-1 worker", ["team=team-3"]), ("", ["env=prod"])):
+        started = time.perf_counter()
+        for _ in range(1000):
+            result = inventory.search(query, tags)
+        elapsed = (time.perf_counter() - started) / 1000
+        print(f"index search q={query!r:<15} tag={tags!s:<16} {elapsed * 1e6:8.1f} µs/query  total={result['total']}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--functions", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    # 상세 조회 수만 보기 위해 호출 속도 제한은 사실상 끔 (실제로는 AWS_RATE_LIMIT에 맞춰 천천히 색인됨)
+    os.environ.setdefault("AWS_RATE_LIMIT", "100000")
+    os.environ.setdefault("AWS_RATE_BURST", "1000")
+    os.environ["INVENTORY_ENABLED"] = "0"
+    asyncio.run(run(load_service("lambda"), args))
+
+
+if __name__ == "__main__":
+    main()
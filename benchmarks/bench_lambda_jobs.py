@@ -0,0 +1,66 @@
+"""느린 Lambda 함수를 대량으로 비동기 호출했을 때 작업 접수 지연과 전체 처리량 측정
+
+    python benchmarks/bench_lambda_jobs.py --jobs 200 --latency 1.0 --functions 4
+"""
+import argparse
+import asyncio
+import io
+import json
+import time
+
+from harness import client_for, load_service
+
+
+class SlowLambda:
+    """호출마다 latency초 걸리는 Lambda 클라이언트 대역"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def invoke(self, FunctionName, InvocationType, Payload):
+        if InvocationType == 'RequestResponse':
+            time.sleep(self.latency)
+        body = json.dumps({"echo": json.loads(Payload)}).encode()
+        return {"StatusCode": 200 if InvocationType == 'RequestResponse' else 202,
+                "Payload": io.BytesIO(body), "ResponseMetadata": {}}
+
+
+async def run(service, job_count, functions):
+    async with client_for(service.app) as client:
+        started = time.perf_counter()
+        responses = await asyncio.gather(*(
+            client.post(f"/api/lambda/functions/fn-{i % functions}/invoke",
+                        params={"mode": "async"}, json={"payload": {"n": i}})
+            for i in range(job_count)
+        ))
+        submitted = time.perf_counter() - started
+        job_ids = [r.json()["job_id"] for r in responses]
+
+        async def wait(job_id):
+            while True:
+                job = (await client.get(f"/api/lambda/jobs/{job_id}", params={"wait": 30})).json()
+                if job["status"] in ("succeeded", "failed"):
+                    return job
+
+        results = await asyncio.gather(*(wait(job_id) for job_id in job_ids))
+        elapsed = time.perf_counter() - started
+    failed = sum(1 for job in results if job["status"] != "succeeded")
+    print(f"jobs={job_count}  submit={submitted * 1000:.0f}ms  total={elapsed:.2f}s  "
+          f"{job_count / elapsed:.1f} jobs/s  failed={failed}")
+    print(service.jobs.stats())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--functions", type=int, default=4)
+    args = parser.parse_args()
+
+    service = load_service("lambda")
+    service.lambda_client = SlowLambda(args.latency)
+    asyncio.run(run(service, args.jobs, args.functions))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+"""auth/s3/ec2/rds/lambda/cloudwatch 서비스를 한 프로세스에 올리고 로그인 + 인증 요청을 섞은 부하를 걸어
+처리량, 응답 시간(p50/p99), 메모리를 재고 결과를 JSON으로 저장. 이전 결과와 비교해서 성능 회귀를 확인
+
+AWS는 지정한 지연 시간 뒤 고정 응답을 돌려주는 StubClient로 대신함 (실제 요청 없음).
+부하를 만드는 클라이언트도 같은 이벤트 루프에서 돌기 때문에 절대값보다는 같은 머신에서 커밋끼리 비교하는 용도
+
+    python benchmarks/bench_load.py --concurrency 1,16,64 --duration 10 --latency 0.02
+    python benchmarks/bench_load.py --cache off --latencies ec2=0.2 --output /tmp/load.json
+    python benchmarks/bench_load.py --compare benchmarks/results/load-abc1234.json
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import httpx
+import jwt
+
+from harness import ROOT, StubClient, load_service
+
+SERVICES = ("auth", "s3", "ec2", "rds", "lambda", "cloudwatch")
+ACCOUNTS = 8
+PASSWORD = "load-test-password"
+
+# (이름, 가중치, 메서드, 경로, JSON 본문) - 대시보드를 보는 사용자가 주로 부르는 조회 API 위주
+LOGIN = ("auth login", 0, "POST", "/api/auth/login", None)
+MIX = (
+    ("s3 buckets", 3, "GET", "/api/s3/buckets", None),
+    ("s3 objects", 3, "GET", "/api/s3/buckets/load/objects?prefix=logs/&page_size=200", None),
+    ("ec2 instances", 3, "GET", "/api/ec2/instances", None),
+    ("ec2 status", 2, "GET", "/api/ec2/instances/i-00000000000000001/status", None),
+    ("rds instances", 2, "GET", "/api/rds/instances", None),
+    ("lambda functions", 2, "GET", "/api/lambda/functions", None),
+    ("lambda invoke", 2, "POST", "/api/lambda/functions/fn-1/invoke", {"payload": {"id": 1}}),
+    ("cloudwatch log groups", 2, "GET", "/api/cloudwatch/log-groups", None),
+    ("cloudwatch metrics", 1, "GET", "/api/cloudwatch/metrics/CWAgent", None),
+)
+WEIGHTS = [entry[1] for entry in MIX]
+# 이보다 요청 수가 적은 API는 p99가 흔들려서 회귀 판정에서 뺌
+MIN_COMPARE_SAMPLES = 100
+
+
+def parse_latencies(value):
+    return {name: float(seconds) for name, seconds in (item.split("=") for item in value.split(",") if item)}
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+
+def aws_responses():
+    # 서비스별로 실제 계정과 비슷한 크기의 응답
+    launched = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    instances = [
+        {"InstanceId": f"i-{i:017d}", "InstanceType": "t3.micro", "State": {"Name": "running"},
+         "LaunchTime": launched, "Tags": [{"Key": "Name", "Value": f"web-{i}"}, {"Key": "team", "Value": f"t{i % 5}"}]}
+        for i in range(100)
+    ]
+    return {
+        "s3": {
+            "list_buckets": {"Buckets": [{"Name": f"bucket-{i}"} for i in range(30)]},
+            "list_objects_v2": {"Contents": [{"Key": f"logs/{i:05d}.gz", "Size": 1024 * i, "LastModified": launched}
+                                             for i in range(200)], "IsTruncated": False},
+        },
+        "ec2": {
+            "describe_instances": {"Reservations": [{"Instances": instances[i:i + 10]} for i in range(0, 100, 10)]},
+            "describe_instance_status": {"InstanceStatuses": [{"InstanceState": {"Name": "running"}}]},
+        },
+        "rds": {
+            "describe_db_instances": {"DBInstances": [
+                {"DBInstanceIdentifier": f"db-{i}", "Engine": "postgres", "DBInstanceStatus": "available",
+                 "Endpoint": {"Address": f"db-{i}.example.internal"}}
+                for i in range(20)
+            ]},
+        },
+        "lambda": {
+            "list_functions": {"Functions": [
+                {"FunctionName": f"fn-{i}", "Runtime": "python3.11", "LastModified": launched.isoformat()}
+                for i in range(50)
+            ]},
+            # 응답 본문은 스트림이라 호출마다 새로 만듦
+            "invoke": lambda **kwargs: {"StatusCode": 200, "Payload": io.BytesIO(b'{"ok": true}')},
+        },
+        "cloudwatch": {
+            "describe_log_groups": {"logGroups": [{"logGroupName": f"/aws/lambda/fn-{i}"} for i in range(50)]},
+            "list_metrics": {"Metrics": [{"MetricName": f"Metric{i}", "Namespace": "CWAgent"} for i in range(50)]},
+        },
+    }
+
+
+def attach_stubs(services, latencies):
+    responses = aws_responses()
+    stubs = {}
+    for name, service in services.items():
+        if name == "auth":
+            continue
+        stub = stubs[name] = StubClient(latencies[name], responses[name])
+        for attr in ("s3_client", "ec2_client", "rds_client", "lambda_client", "logs_client", "cloudwatch_client"):
+            if hasattr(service, attr):
+                setattr(service, attr, stub)
+        if name == "ec2":
+            service.ec2_clients = {region: stub for region in service.ec2_clients}
+    return stubs
+
+
+def dispatch(services):
+    # /api/{서비스}/... 경로로 앱을 고르는 ASGI 앱. 사용자 한 명이 모든 서비스를 부르는 프론트엔드처럼 동작
+    apps = {name: service.app for name, service in services.items()}
+
+    async def app(scope, receive, send):
+        await apps[scope["path"].split("/")[2]](scope, receive, send)
+
+    return app
+
+
+async def share_signing_keys(services, client):
+    # 각 서비스가 auth-service에서 JWKS를 받아오는 것과 같은 결과를 미리 넣어둠 (로그인으로 받은 토큰 검증용)
+    response = await client.get("/api/auth/.well-known/jwks.json")
+    keys = {jwk["kid"]: (jwt.PyJWK(jwk).key, jwk["alg"]) for jwk in response.json()["keys"]}
+    for name, service in services.items():
+        if name != "auth":
+            service.verifier.public_keys = keys
+            service.verifier.keys_fetched_at = time.monotonic()
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+
+    def add(self, name, seconds, ok):
+        self.latencies.setdefault(name, []).append(seconds)
+        if not ok:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    @staticmethod
+    def summary(latencies, errors, elapsed):
+        return {
+            "requests": len(latencies),
+            "errors": errors,
+            "throughput_rps": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(statistics.median(latencies) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+            "max_ms": round(max(latencies) * 1000, 2),
+        }
+
+    def results(self, elapsed):
+        everything = [latency for latencies in self.latencies.values() for latency in latencies]
+        return {
+            **self.summary(everything, sum(self.errors.values()), elapsed),
+            "endpoints": {
+                name: self.summary(latencies, self.errors.get(name, 0), elapsed)
+                for name, latencies in sorted(self.latencies.items())
+            },
+        }
+
+
+def client_for_user(app, index):
+    # 사용자마다 IP를 달리해서 로그인 제한(IP별 동시 로그인 수)은 실제처럼 사용자 단위로 걸리게 함
+    transport = httpx.ASGITransport(app=app, client=(f"10.2.{index // 250}.{index % 250 + 1}", 40000))
+    return httpx.AsyncClient(transport=transport, base_url="http://load", timeout=60)
+
+
+async def send(client, entry, account, recorder):
+    name, _, method, path, body = entry
+    started = time.perf_counter()
+    if entry is LOGIN:
+        response = await client.post(path, data=account)
+        if response.status_code == 200:
+            client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+    else:
+        response = await client.request(method, path, json=body)
+    recorder.add(name, time.perf_counter() - started, response.status_code < 400)
+    return response
+
+
+async def virtual_user(index, app, recorder, deadline, rng, args):
+    # 로그인 -> 인증 요청 session_requests번을 반복 (세션마다 새 토큰)
+    account = {"username": f"load{index % ACCOUNTS}", "password": PASSWORD}
+    async with client_for_user(app, index) as client:
+        while time.perf_counter() < deadline:
+            # 로그인에 실패하면(429 등) 잠시 뒤 다시 시도
+            if (await send(client, LOGIN, account, recorder)).status_code != 200:
+                await asyncio.sleep(0.1)
+                continue
+            for _ in range(args.session_requests):
+                if time.perf_counter() >= deadline:
+                    return
+                await send(client, rng.choices(MIX, WEIGHTS)[0], account, recorder)
+                if args.think:
+                    await asyncio.sleep(rng.uniform(0, args.think * 2))
+
+
+async def warm_up(app):
+    # 첫 요청에만 드는 비용(토큰 검증 캐시, 지연 생성 등)이 첫 단계에 몰리지 않도록 모든 요청을 한 번씩 먼저 보냄
+    recorder = Recorder()
+    async with client_for_user(app, 0) as client:
+        for entry in (LOGIN,) + MIX:
+            response = await send(client, entry, {"username": "load0", "password": PASSWORD}, recorder)
+            assert response.status_code < 400, (entry[0], response.status_code, response.text)
+
+
+async def run_level(app, stubs, concurrency, args):
+    recorder = Recorder()
+    calls = {name: stub.calls for name, stub in stubs.items()}
+    peak = rss_mb()
+    done = asyncio.Event()
+
+    async def sample_memory():
+        nonlocal peak
+        while not done.is_set():
+            peak = max(peak, rss_mb())
+            await asyncio.sleep(0.2)
+
+    sampler = asyncio.create_task(sample_memory())
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(*(
+        virtual_user(index, app, recorder, deadline, random.Random(args.seed + index), args)
+        for index in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await sampler
+    return {
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 2),
+        **recorder.results(elapsed),
+        "aws_calls": {name: stub.calls - calls[name] for name, stub in stubs.items()},
+        "memory": {"rss_mb": round(rss_mb(), 1), "peak_rss_mb": round(peak, 1)},
+    }
+
+
+async def run(services, args):
+    auth = services["auth"]
+    await auth.start_background_tasks()
+    for i in range(ACCOUNTS):
+        await auth.store.create(f"load{i}", PASSWORD, "user")
+    stubs = attach_stubs(services, args.latencies)
+    app = dispatch(services)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://load") as client:
+        await share_signing_keys(services, client)
+    await warm_up(app)
+
+    levels = []
+    for concurrency in args.concurrency:
+        level = await run_level(app, stubs, concurrency, args)
+        levels.append(level)
+        print(f"concurrency={concurrency:<4} {level['throughput_rps']:8.1f} req/s  p50={level['p50_ms']:7.1f}ms  "
+              f"p99={level['p99_ms']:7.1f}ms  errors={level['errors']:<5} "
+              f"peak RSS={level['memory']['peak_rss_mb']:.1f}MB")
+        for name, endpoint in level["endpoints"].items():
+            print(f"    {name:<22} n={endpoint['requests']:<6} p50={endpoint['p50_ms']:7.1f}ms  "
+                  f"p99={endpoint['p99_ms']:7.1f}ms  errors={endpoint['errors']}")
+    await auth.stop_background_tasks()
+    return levels
+
+
+def change(now, then):
+    return now / then - 1 if then else 0.0
+
+
+def compare(current, baseline, threshold):
+    # 같은 동시성 단계끼리 전체 처리량이 threshold 이상 줄거나 p99가 threshold 이상 늘면 회귀로 표시
+    # API별 처리량은 섞는 비율에 따라 달라지므로 p99만 보고, 표본이 적은 API는 표시만 함
+    regressions = []
+    previous = {level["concurrency"]: level for level in baseline["levels"]}
+    print(f"\ncompared with {(baseline.get('commit') or 'unknown')[:12]} ({baseline.get('started_at')})")
+    for key, value in current["config"].items():
+        if baseline.get("config", {}).get(key, value) != value:
+            print(f"warning: {key} differs ({baseline['config'][key]} -> {value})")
+    for level in current["levels"]:
+        before = previous.get(level["concurrency"])
+        if before is None:
+            continue
+        rps = change(level["throughput_rps"], before["throughput_rps"])
+        p99 = change(level["p99_ms"], before["p99_ms"])
+        regressed = rps < -threshold or p99 > threshold
+        if regressed:
+            regressions.append((level["concurrency"], "overall"))
+        print(f"concurrency={level['concurrency']:<4} {'overall':<22} throughput {rps * 100:+6.1f}%  "
+              f"p99 {p99 * 100:+6.1f}%{'  REGRESSION' if regressed else ''}")
+        for name, now in level["endpoints"].items():
+            then = before["endpoints"].get(name)
+            if then is None:
+                continue
+            p50 = change(now["p50_ms"], then["p50_ms"])
+            p99 = change(now["p99_ms"], then["p99_ms"])
+            enough = min(now["requests"], then["requests"]) >= MIN_COMPARE_SAMPLES
+            regressed = enough and p99 > threshold
+            if regressed:
+                regressions.append((level["concurrency"], name))
+            print(f"concurrency={level['concurrency']:<4} {name:<22} p50 {p50 * 100:+6.1f}%  p99 {p99 * 100:+6.1f}%"
+                  f"{'  REGRESSION' if regressed else '' if enough else '  (few samples)'}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=lambda s: [int(x) for x in s.split(",")], default=[1, 16, 64])
+    parser.add_argument("--duration", type=float, default=10, help="동시성 단계마다 부하를 거는 시간(초)")
+    parser.add_argument("--latency", type=float, default=0.02, help="AWS 호출 지연(초)")
+    parser.add_argument("--latencies", type=parse_latencies, default={}, help="서비스별 지연 (예: ec2=0.2,rds=0.1)")
+    parser.add_argument("--session-requests", type=int, default=50, help="로그인 한 번에 보내는 인증 요청 수")
+    parser.add_argument("--think", type=float, default=0, help="요청 사이 평균 대기 시간(초)")
+    parser.add_argument("--cache", choices=("on", "off"), default="on", help="off면 조회 결과 캐시를 끄고 매번 AWS 호출")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="결과 JSON 경로 (기본 benchmarks/results/load-<커밋>.json)")
+    parser.add_argument("--compare", help="비교할 이전 결과 JSON")
+    parser.add_argument("--threshold", type=float, default=0.1, help="회귀로 볼 변화율 (0.1 = 10%%)")
+    args = parser.parse_args()
+    args.latencies = {name: args.latencies.get(name, args.latency) for name in SERVICES}
+
+    # 토큰 폐기 목록 동기화/인벤토리 색인 같은 백그라운드 작업은 서비스 밖(auth-service, AWS)을 부르므로 끔
+    os.environ["INVENTORY_ENABLED"] = "0"
+    os.environ["REVOCATION_POLL_SECONDS"] = "0"
+    if args.cache == "off":
+        os.environ["CACHE_STALE_SECONDS"] = "0"
+        for name in ("BUCKETS", "OBJECTS", "INSTANCES", "STATUS", "FUNCTIONS", "LOG_GROUPS"):
+            os.environ[f"{name}_CACHE_TTL"] = "0"
+
+    commit, dirty = git_revision()
+    started_at = datetime.now(timezone.utc).isoformat()
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["USERS_DB"] = os.path.join(directory, "users.db")
+        baseline_rss = rss_mb()
+        services = {name: load_service(name) for name in SERVICES}
+        loaded_rss = rss_mb()
+        levels = asyncio.run(run(services, args))
+
+    result = {
+        "benchmark": "load",
+        "commit": commit,
+        "dirty": dirty,
+        "started_at": started_at,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "memory": {
+            "services_loaded_mb": round(loaded_rss - baseline_rss, 1),
+            "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        },
+        "levels": levels,
+    }
+    output = args.output or os.path.join(ROOT, "benchmarks", "results", f"load-{(commit or 'unknown')[:7]}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"services loaded +{result['memory']['services_loaded_mb']}MB, max RSS {result['memory']['max_rss_mb']}MB")
+    print(f"saved {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(result, json.load(f), args.threshold)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
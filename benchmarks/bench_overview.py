@@ -0,0 +1,93 @@
+"""gateway-service /api/overview 응답 시간을 백엔드를 하나씩 호출하는 경우와 비교
+
+    python benchmarks/bench_overview.py --latencies s3=0.05,ec2=0.2,rds=0.1,lambda=0.08,cloudwatch=0.12 --slow cloudwatch=5
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from harness import client_for, load_service
+
+
+def parse_latencies(value):
+    return {name: float(seconds) for name, seconds in (item.split("=") for item in value.split(",") if item)}
+
+
+def backend_app(latency):
+    app = FastAPI()
+
+    @app.get("/{path:path}")
+    async def handle(path: str):
+        await asyncio.sleep(latency)
+        return {"path": path}
+
+    return app
+
+
+def dispatch(apps):
+    # Host 헤더로 백엔드 앱을 골라주는 ASGI 앱 (실제 네트워크 없이 게이트웨이 클라이언트가 부르는 대상)
+    async def app(scope, receive, send):
+        host = dict(scope["headers"])[b"host"].decode().split(":")[0]
+        await apps[host](scope, receive, send)
+
+    return app
+
+
+async def timed(fn, rounds):
+    latencies = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        await fn()
+        latencies.append(time.perf_counter() - started)
+    return statistics.median(latencies) * 1000
+
+
+async def run(service, latencies, rounds):
+    hosts = {}
+    for name, config in service.BACKENDS.items():
+        host = config["url"].split("//")[1].split(":")[0]
+        hosts[host] = backend_app(latencies.get(name, 0.05))
+    await service.start_background_tasks()
+    await service.client.aclose()
+    service.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=dispatch(hosts)))
+    backends = httpx.AsyncClient(transport=httpx.ASGITransport(app=dispatch(hosts)))
+
+    async with client_for(service.app) as client:
+        async def sequential():
+            # 프론트엔드가 페이지 로드 때 서비스를 하나씩 부르는 경우
+            for config in service.BACKENDS.values():
+                await backends.get(config["url"] + config["path"])
+
+        async def overview():
+            response = await client.get("/api/overview")
+            assert response.status_code == 200, response.text
+            return response.json()
+
+        print(f"sequential  {await timed(sequential, rounds):8.1f} ms")
+        print(f"overview    {await timed(overview, rounds):8.1f} ms")
+        result = await overview()
+        print({name: (section["status"], section["elapsed_ms"]) for name, section in result["sections"].items()})
+        print(f"partial={result['partial']}")
+    await backends.aclose()
+    await service.stop_background_tasks()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latencies", type=parse_latencies,
+                        default=parse_latencies("s3=0.05,ec2=0.2,rds=0.1,lambda=0.08,cloudwatch=0.12"))
+    parser.add_argument("--slow", type=parse_latencies, default={},
+                        help="timeout을 넘기는 백엔드 (예: cloudwatch=5)")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    service = load_service("gateway")
+    asyncio.run(run(service, {**args.latencies, **args.slow}, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""서비스별 모듈 로드 시간(파드 콜드 스타트의 대부분)과 상주 메모리, 첫 AWS 호출 준비 시간 측정
+
+서비스마다 새 프로세스에서 `main`을 import하고, 이어서 서비스가 쓰는 boto3 클라이언트를 모두 준비(첫 요청 또는 preload)한 뒤의
+시간과 RSS를 잼. AWS에는 요청을 보내지 않음
+
+    python benchmarks/bench_startup.py --services s3,ec2,rds,lambda,cloudwatch --rounds 3
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 각 서비스가 쓰는 boto3 클라이언트 (main 모듈의 변수 이름)
+CLIENTS = {
+    "s3": ["s3_client"],
+    "ec2": ["ec2_client"],
+    "rds": ["rds_client"],
+    "lambda": ["lambda_client", "logs_client"],
+    "cloudwatch": ["logs_client", "cloudwatch_client"],
+}
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+
+import_rss = rss_mb()
+# 메서드에 접근하면 지연 생성 클라이언트도 실제 클라이언트가 만들어짐
+for name in sys.argv[1].split(","):
+    getattr(main, name).meta.region_name
+ready = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "clients_ms": (ready - imported) * 1000,
+    "import_rss_mb": import_rss,
+    "ready_rss_mb": rss_mb(),
+}))
+"""
+
+
+def probe(service, env):
+    service_dir = os.path.join(ROOT, f"{service}-service")
+    # auth 모듈이 로드되며 만드는 파일이 저장소에 남지 않도록 임시 디렉터리에서 실행
+    with tempfile.TemporaryDirectory() as cwd:
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE, ",".join(CLIENTS[service])],
+            cwd=cwd, env={**env, "PYTHONPATH": service_dir}, capture_output=True, text=True, check=True
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--services", default=",".join(CLIENTS))
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("AWS_DEFAULT_REGION", "ap-northeast-2")
+    env.setdefault("SECRET_KEY", "benchmark-secret-key-0123456789abcdef")
+    env.setdefault("TELEMETRY_ENABLED", "1")
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+
+    print(f"{'service':<12}{'import ms':>11}{'clients ms':>12}{'total ms':>10}{'import RSS':>12}{'ready RSS':>11}")
+    for service in args.services.split(","):
+        runs = [probe(service, env) for _ in range(args.rounds)]
+        median = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+        print(f"{service:<12}{median['import_ms']:>11.0f}{median['clients_ms']:>12.0f}"
+              f"{median['import_ms'] + median['clients_ms']:>10.0f}"
+              f"{median['import_rss_mb']:>10.1f}MB{median['ready_rss_mb']:>9.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""스트리밍 멀티파트 업로드의 메모리/디스크 사용량이 파일 크기와 무관한지 확인
+
+    python benchmarks/bench_stream_upload.py --sizes-mb 32,128,512 --part-size-mb 8 --concurrency 4
+"""
+import argparse
+import asyncio
+import tempfile
+import os
+import time
+import tracemalloc
+import uuid
+
+from harness import client_for, load_service
+
+
+class MultipartS3StandIn:
+    """업로드된 파트의 크기만 기록하고 내용은 버리는 S3 대역"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.uploads = {}
+
+    def create_multipart_upload(self, Bucket, Key):
+        upload_id = uuid.uuid4().hex
+        self.uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        time.sleep(self.latency)
+        self.uploads[UploadId][PartNumber] = len(Body)
+        return {"ETag": f'"{PartNumber}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        return {}
+
+
+async def body(total: int, chunk_size: int = 64 * 1024):
+    chunk = b"x" * chunk_size
+    sent = 0
+    while sent < total:
+        piece = chunk[:min(chunk_size, total - sent)]
+        sent += len(piece)
+        yield piece
+
+
+async def run(service, sizes, part_size_mb, concurrency):
+    async with client_for(service.app) as client:
+        for size_mb in sizes:
+            total = size_mb * 1024 * 1024
+            tmp_before = sum(len(files) for _, _, files in os.walk(tempfile.gettempdir()))
+            tracemalloc.start()
+            response = await client.put(
+                f"/api/s3/buckets/bench/multipart/object-{size_mb}mb",
+                params={"part_size_mb": part_size_mb, "concurrency": concurrency},
+                content=body(total),
+                timeout=None
+            )
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            tmp_after = sum(len(files) for _, _, files in os.walk(tempfile.gettempdir()))
+            result = response.json()
+            assert response.status_code == 200, result
+            assert result["bytes"] == total
+            print(
+                f"size={size_mb:5d}MB  parts={result['parts']:4d}  "
+                f"{result['mb_per_sec']:8.1f} MB/s  peak_mem={peak / 1024 / 1024:6.1f}MB  "
+                f"new_tmp_files={tmp_after - tmp_before}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes-mb", default="32,128,512")
+    parser.add_argument("--part-size-mb", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    service = load_service("s3")
+    service.s3_client = MultipartS3StandIn(args.latency)
+    sizes = [int(x) for x in args.sizes_mb.split(",")]
+    asyncio.run(run(service, sizes, args.part_size_mb, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""지표 수집 미들웨어를 켰을 때와 껐을 때 요청당 처리 시간 비교, AWS 호출 기록 비용 측정
+
+    python benchmarks/bench_telemetry.py --requests 5000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from harness import StubClient, client_for, load_service
+
+
+async def bench_requests(service, requests):
+    async with client_for(service.app) as client:
+        # 첫 요청에서 토큰 검증과 버킷 목록이 캐시되므로 이후는 미들웨어를 포함한 요청 처리 비용만 남음
+        await client.get("/api/s3/buckets")
+        started = time.perf_counter()
+        for _ in range(requests):
+            response = await client.get("/api/s3/buckets")
+            assert response.status_code == 200
+        return (time.perf_counter() - started) / requests * 1e6
+
+
+async def bench_middleware(calls):
+    # httpx/FastAPI 비용 없이 미들웨어 자체의 비용만 측정
+    telemetry = sys.modules["telemetry"]
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    results = {}
+    for label, target in (("bare", app), ("middleware", telemetry.MetricsMiddleware(app))):
+        started = time.perf_counter()
+        for _ in range(calls):
+            await target({"type": "http", "method": "GET"}, receive, send)
+        results[label] = (time.perf_counter() - started) / calls * 1e6
+    return results["middleware"] - results["bare"]
+
+
+def bench_record(calls):
+    telemetry = sys.modules["telemetry"]
+    started = time.perf_counter()
+    for _ in range(calls):
+        telemetry.record_aws_call("list_buckets", 0.01, "ok")
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--calls", type=int, default=100000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    services = {}
+    for enabled in ("0", "1"):
+        os.environ["TELEMETRY_ENABLED"] = enabled
+        services[enabled] = load_service("s3")
+        services[enabled].s3_client = StubClient(0, {"list_buckets": {"Buckets": [{"Name": "bench"}]}})
+    # 켠 것/끈 것을 번갈아 돌려 가장 빠른 값 사용 (실행 순서와 잡음 영향 줄이기)
+    results = {"0": float("inf"), "1": float("inf")}
+    for _ in range(args.rounds):
+        for enabled, service in services.items():
+            results[enabled] = min(results[enabled], asyncio.run(bench_requests(service, args.requests)))
+    print(f"request telemetry off  {results['0']:8.1f} us/request")
+    print(f"request telemetry on   {results['1']:8.1f} us/request  (+{results['1'] - results['0']:.1f} us, "
+          f"{(results['1'] / results['0'] - 1) * 100:.1f}%)")
+    print(f"middleware alone       {asyncio.run(bench_middleware(args.calls)):8.2f} us/request")
+    print(f"record_aws_call        {bench_record(args.calls):8.2f} us/call")
+
+
+if __name__ == "__main__":
+    main()
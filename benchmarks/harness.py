@@ -0,0 +1,112 @@
+import importlib
+import os
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import httpx
+import jwt
+from botocore.exceptions import ClientError
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SECRET_KEY = "benchmark-secret-key-0123456789abcdef"
+
+# 서비스마다 같은 이름의 모듈(main, aws_client 등)을 쓰므로 로드 전에 비워줌
+SERVICE_MODULES = ("main", "aws_client", "cache", "uploads", "downloads", "db_pool", "health_prober", "jobs", "inventory", "bulk_delete", "log_tail", "log_search", "metrics", "auth", "users", "tokens", "telemetry")
+
+
+def load_service(name: str):
+    os.environ.setdefault("SECRET_KEY", SECRET_KEY)
+    os.environ.setdefault("AWS_DEFAULT_REGION", "ap-northeast-2")
+    service_dir = os.path.join(ROOT, f"{name}-service")
+    for module in SERVICE_MODULES:
+        sys.modules.pop(module, None)
+    sys.path.insert(0, service_dir)
+    try:
+        return importlib.import_module("main")
+    finally:
+        sys.path.remove(service_dir)
+
+
+def make_token(username: str = "admin"):
+    expire = datetime.utcnow() + timedelta(minutes=30)
+    payload = {"sub": username, "role": "admin", "exp": expire}
+    return jwt.encode(payload, os.environ.get("SECRET_KEY", SECRET_KEY), algorithm="HS256")
+
+
+def client_for(app):
+    transport = httpx.ASGITransport(app=app)
+    headers = {"Authorization": f"Bearer {make_token()}"}
+    return httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers)
+
+
+class StubClient:
+    """지정한 지연 시간 후 고정 응답을 돌려주는 boto3 클라이언트 대역"""
+
+    def __init__(self, latency: float = 0.05, responses: dict = None, region: str = "ap-northeast-2"):
+        self.latency = latency
+        self.responses = responses or {}
+        self.calls = 0
+        self.meta = SimpleNamespace(region_name=region)
+
+    def __getattr__(self, operation):
+        def call(*args, **kwargs):
+            self.calls += 1
+            time.sleep(self.latency)
+            response = self.responses.get(operation, {})
+            return response(**kwargs) if callable(response) else response
+        # boto3 클라이언트 메서드처럼 API 이름과 클라이언트(리전)를 알 수 있도록 함
+        call.__name__ = operation
+        call.__self__ = self
+        return call
+
+
+class FaultyClient(StubClient):
+    """AWS 쪽 장애를 흉내 내는 StubClient. API별로 초당 rate_limit번을 넘는 호출은 ThrottlingException,
+    down이 True인 동안에는 503 ServiceUnavailable을 냄"""
+
+    def __init__(self, latency: float = 0.05, responses: dict = None, rate_limit: float = None):
+        super().__init__(latency, responses)
+        self.rate_limit = rate_limit
+        self.down = False
+        self.throttled = 0
+        self.failed = 0
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def _inject(self, operation):
+        with self._lock:
+            if self.down:
+                self.failed += 1
+                raise ClientError(
+                    {"Error": {"Code": "ServiceUnavailable", "Message": "Service unavailable"},
+                     "ResponseMetadata": {"HTTPStatusCode": 503}},
+                    operation
+                )
+            if self.rate_limit is None:
+                return
+            now = time.monotonic()
+            window = self._windows.setdefault(operation, deque())
+            while window and now - window[0] >= 1.0:
+                window.popleft()
+            if len(window) >= self.rate_limit:
+                self.throttled += 1
+                raise ClientError(
+                    {"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"},
+                     "ResponseMetadata": {"HTTPStatusCode": 400}},
+                    operation
+                )
+            window.append(now)
+
+    def __getattr__(self, operation):
+        call = super().__getattr__(operation)
+
+        def faulty(*args, **kwargs):
+            self._inject(operation)
+            return call(*args, **kwargs)
+        faulty.__name__ = operation
+        faulty.__self__ = self
+        return faulty
@@ -0,0 +1,148 @@
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+
+from aws_client import is_degraded, is_throttling
+
+# 읽기 전용 describe/list 결과를 프로세스 메모리에 캐시해서 대시보드 폴링이 AWS 호출 한도를 소모하지 않도록 함
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+CACHE_STALE_SECONDS = float(os.getenv("CACHE_STALE_SECONDS", "30"))
+
+
+class CacheEntry:
+    __slots__ = ("operation", "params", "value", "fetched_at", "ttl")
+
+    def __init__(self, operation, params, value, ttl):
+        self.operation = operation
+        self.params = params
+        self.value = value
+        self.fetched_at = time.monotonic()
+        self.ttl = ttl
+
+
+class TTLCache:
+    """LRU + TTL 캐시. 만료 후 stale 구간에는 이전 값을 바로 돌려주고 백그라운드에서 갱신하며,
+    같은 키에 대한 동시 요청은 업스트림 호출 하나를 공유함. 업스트림 장애나 스로틀링으로 실패하면
+    stale 구간이 지난 값이라도 남아 있는 값을 돌려줌"""
+
+    def __init__(self, service: str, max_entries: int = CACHE_MAX_ENTRIES, stale_seconds: float = CACHE_STALE_SECONDS):
+        self.service = service
+        self.max_entries = max_entries
+        self.stale_seconds = stale_seconds
+        self._entries = OrderedDict()
+        self._inflight = {}
+        # 로드가 진행 중인 키별 [무효화 세대, 진행 중인 로드 수, params]. 로드가 모두 끝나면 제거
+        self._loads = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.refresh_errors = 0
+        self.fallbacks = 0
+
+    @staticmethod
+    def make_key(operation, params):
+        return operation, json.dumps(params, sort_keys=True, default=str)
+
+    async def get(self, operation, loader, ttl, **params):
+        key = self.make_key(operation, params)
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry.fetched_at
+            if age < entry.ttl:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry.value
+            if age < entry.ttl + self.stale_seconds:
+                self.stale_hits += 1
+                self._entries.move_to_end(key)
+                if key not in self._inflight:
+                    self._start_load(key, operation, params, loader, ttl, background=True)
+                return entry.value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = self._start_load(key, operation, params, loader, ttl)
+        # 요청 하나가 취소돼도 같은 로드를 기다리는 다른 요청에는 영향이 없도록 shield
+        try:
+            return await asyncio.shield(task)
+        except Exception as e:
+            # 업스트림 장애(회로 차단 포함)나 스로틀링이면 남아 있는 값으로 대신 응답
+            if entry is None or not (is_degraded(e) or is_throttling(e)):
+                raise
+            self.fallbacks += 1
+            return entry.value
+
+    def _start_load(self, key, operation, params, loader, ttl, background=False):
+        state = self._loads.setdefault(key, [0, 0, params])
+        state[1] += 1
+        generation = state[0]
+
+        async def load():
+            try:
+                value = await loader()
+            except Exception:
+                if background:
+                    self.refresh_errors += 1
+                raise
+            finally:
+                if self._inflight.get(key) is asyncio.current_task():
+                    del self._inflight[key]
+                state[1] -= 1
+                if state[1] == 0:
+                    del self._loads[key]
+            # 로드 중에 이 키가 무효화됐으면 이전 상태를 캐시에 다시 넣지 않음
+            if generation == state[0]:
+                self._store(key, CacheEntry(operation, params, value, ttl))
+            return value
+
+        task = asyncio.create_task(load())
+        if background:
+            # 백그라운드 갱신 실패는 기존 stale 값을 유지하면 되므로 예외만 소비
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._inflight[key] = task
+        return task
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, operation, **match):
+        # match로 준 파라미터가 모두 일치하는 항목만 제거 (없으면 해당 operation 전체)
+        def matches(key, params):
+            return key[0] == operation and all(params.get(name) == value for name, value in match.items())
+
+        # 변경 전에 시작된 로드 결과는 캐시에 넣지 않고, 이후 요청이 공유하지 않도록 진행 중인 로드도 분리
+        for key, state in self._loads.items():
+            if matches(key, state[2]):
+                state[0] += 1
+                self._inflight.pop(key, None)
+        for key, entry in list(self._entries.items()):
+            if matches(key, entry.params):
+                del self._entries[key]
+                self.invalidations += 1
+
+    def stats(self):
+        return {
+            "service": self.service,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "refresh_errors": self.refresh_errors,
+            "fallbacks": self.fallbacks,
+        }
@@ -0,0 +1,121 @@
+import asyncio
+import heapq
+import os
+
+# 긴 시간 범위는 구간별로 나눠 앞쪽 몇 개 구간만 동시에 읽고, 구간 안에서는 스트림 접두어별 결과를 시간순으로 병합
+SEARCH_WINDOW_MINUTES = float(os.getenv("SEARCH_WINDOW_MINUTES", "60"))
+SEARCH_CONCURRENCY = int(os.getenv("SEARCH_CONCURRENCY", "4"))
+SEARCH_BUFFER_PAGES = int(os.getenv("SEARCH_BUFFER_PAGES", "2"))
+
+
+def split_windows(start_ms, end_ms, window_ms):
+    windows = []
+    while start_ms < end_ms:
+        windows.append((start_ms, min(start_ms + window_ms, end_ms)))
+        start_ms += window_ms
+    return windows
+
+
+class WindowScan:
+    """한 구간 + 스트림 접두어에 대한 filter_log_events 페이지 조회. 큐 크기로 미리 읽는 페이지 수를 제한"""
+
+    def __init__(self, aws, logs_client, params, buffer_pages):
+        self.aws = aws
+        self.logs_client = logs_client
+        self.params = params
+        self.pages = asyncio.Queue(maxsize=buffer_pages)
+        self.current = iter(())
+        self.task = None
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._fetch())
+
+    async def _fetch(self):
+        params = dict(self.params)
+        try:
+            while True:
+                response = await self.aws.call(self.logs_client.filter_log_events, **params)
+                events = sorted(response['events'], key=lambda event: event['timestamp'])
+                if events:
+                    await self.pages.put(events)
+                if 'nextToken' not in response:
+                    break
+                params['nextToken'] = response['nextToken']
+        except Exception as e:
+            await self.pages.put(e)
+            return
+        await self.pages.put(None)
+
+    async def next(self):
+        while True:
+            event = next(self.current, None)
+            if event is not None:
+                return event
+            page = await self.pages.get()
+            if page is None:
+                self.pages.put_nowait(None)
+                return None
+            if isinstance(page, Exception):
+                raise page
+            self.current = iter(page)
+
+    def cancel(self):
+        if self.task is not None:
+            self.task.cancel()
+
+
+async def merge_scans(scans):
+    # k-way 병합: 스캔마다 다음 이벤트 하나씩만 힙에 두고 가장 이른 것부터 내보냄
+    heap = []
+    for index, scan in enumerate(scans):
+        event = await scan.next()
+        if event is not None:
+            heap.append((event['timestamp'], index, event))
+    heapq.heapify(heap)
+    while heap:
+        _, index, event = heapq.heappop(heap)
+        yield event
+        event = await scans[index].next()
+        if event is not None:
+            heapq.heappush(heap, (event['timestamp'], index, event))
+
+
+async def search_log_events(aws, logs_client, log_group, start_ms, end_ms, filter_pattern=None,
+                            stream_prefixes=None, window_minutes=SEARCH_WINDOW_MINUTES,
+                            concurrency=SEARCH_CONCURRENCY, buffer_pages=SEARCH_BUFFER_PAGES):
+    base = {"logGroupName": log_group}
+    if filter_pattern:
+        base["filterPattern"] = filter_pattern
+    windows = []
+    for window_start, window_end in split_windows(start_ms, end_ms, int(window_minutes * 60 * 1000)):
+        scans = []
+        for prefix in stream_prefixes or [None]:
+            params = dict(base, startTime=window_start, endTime=window_end - 1)
+            if prefix:
+                params["logStreamNamePrefix"] = prefix
+            scans.append(WindowScan(aws, logs_client, params, buffer_pages))
+        windows.append(scans)
+
+    try:
+        for index, scans in enumerate(windows):
+            # 현재 구간을 병합하는 동안 다음 구간들을 미리 읽어둠 (동시에 읽는 구간은 concurrency개)
+            for ahead in windows[index:index + concurrency]:
+                for scan in ahead:
+                    scan.start()
+            # 접두어가 겹치면 같은 이벤트가 두 번 나오므로 같은 timestamp 안에서 eventId로 중복 제거
+            last_timestamp = None
+            seen = set()
+            async for event in merge_scans(scans):
+                if event['timestamp'] != last_timestamp:
+                    last_timestamp = event['timestamp']
+                    seen.clear()
+                if event['eventId'] in seen:
+                    continue
+                seen.add(event['eventId'])
+                yield event
+            windows[index] = None
+    finally:
+        for scans in windows:
+            for scan in scans or ():
+                scan.cancel()
@@ -1,12 +1,20 @@
-from fastapi import FastAPI, Depends, HTTPException
-from fastapi.security import OAuth2PasswordBearer
+from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-import boto3
+from pydantic import BaseModel, Field
 from botocore.exceptions import ClientError
-from datetime import datetime
-import jwt
+from datetime import datetime, timedelta, timezone
+import json
 import os
 
+from auth import verifier, verify_token
+from aws_client import AWSCallLayer, aws_clients, aws_error
+from cache import TTLCache
+from log_search import search_log_events
+from log_tail import LogTailHub
+from metrics import METRIC_DEFAULT_POINTS, MetricSeriesCache, metric_query, downsample
+from telemetry import instrument
+
 app = FastAPI(title="CloudWatch Service")
 
 # CORS 설정
@@ -20,58 +28,42 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
-ALGORITHM = "HS256"
+# 라우트별 응답 시간, AWS 호출, 이벤트 루프 지연을 `/metrics`로 노출
+instrument(app)
+
 AWS_REGION = os.getenv("AWS_DEFAULT_REGION", "ap-northeast-2")
+LOG_GROUPS_CACHE_TTL = float(os.getenv("LOG_GROUPS_CACHE_TTL", "60"))
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "10000"))
+METRIC_MAX_QUERIES = int(os.getenv("METRIC_MAX_QUERIES", "2000"))
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="http://auth-service:8000/api/auth/login")
-
-# boto3 클라이언트 생성
-aws_access_key = os.getenv("AWS_ACCESS_KEY_ID")
-aws_secret_key = os.getenv("AWS_SECRET_ACCESS_KEY")
-
-if aws_access_key and aws_secret_key:
-    logs_client = boto3.client(
-        'logs',
-        region_name=AWS_REGION,
-        aws_access_key_id=aws_access_key,
-        aws_secret_access_key=aws_secret_key
-    )
-    cloudwatch_client = boto3.client(
-        'cloudwatch',
-        region_name=AWS_REGION,
-        aws_access_key_id=aws_access_key,
-        aws_secret_access_key=aws_secret_key
-    )
-else:
-    logs_client = boto3.client('logs', region_name=AWS_REGION)
-    cloudwatch_client = boto3.client('cloudwatch', region_name=AWS_REGION)
-
-
-def verify_token(token: str = Depends(oauth2_scheme)):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+# boto3 클라이언트는 처음 쓸 때(또는 시작 직후 워밍업에서) 공유 세션으로 만듦
+logs_client = aws_clients.lazy('logs', AWS_REGION)
+cloudwatch_client = aws_clients.lazy('cloudwatch', AWS_REGION)
+
+aws = AWSCallLayer("cloudwatch")
+cache = TTLCache("cloudwatch")
+tails = LogTailHub(aws, logs_client)
+metric_cache = MetricSeriesCache()
 
 
 @app.get("/api/cloudwatch/log-groups")
 async def get_log_groups(user=Depends(verify_token)):
-    try:
-        response = logs_client.describe_log_groups()
+    async def load():
+        response = await aws.call(logs_client.describe_log_groups)
         log_groups = [lg['logGroupName'] for lg in response['logGroups']]
         return {"log_groups": log_groups}
+
+    try:
+        return await cache.get("describe_log_groups", load, ttl=LOG_GROUPS_CACHE_TTL)
     except ClientError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise aws_error(e)
 
 
 @app.get("/api/cloudwatch/log-groups/{log_group_name}/streams")
 async def get_log_streams(log_group_name: str, user=Depends(verify_token)):
     try:
-        response = logs_client.describe_log_streams(
+        response = await aws.call(
+            logs_client.describe_log_streams,
             logGroupName=log_group_name,
             orderBy='LastEventTime',
             descending=True,
@@ -80,13 +72,14 @@ async def get_log_streams(log_group_name: str, user=Depends(verify_token)):
         log_streams = [ls['logStreamName'] for ls in response['logStreams']]
         return {"log_streams": log_streams}
     except ClientError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise aws_error(e)
 
 
 @app.get("/api/cloudwatch/log-groups/{log_group_name}/streams/{log_stream_name}/events")
 async def get_log_events(log_group_name: str, log_stream_name: str, user=Depends(verify_token)):
     try:
-        response = logs_client.get_log_events(
+        response = await aws.call(
+            logs_client.get_log_events,
             logGroupName=log_group_name,
             logStreamName=log_stream_name,
             limit=100
@@ -100,13 +93,87 @@ async def get_log_events(log_group_name: str, log_stream_name: str, user=Depends
         ]
         return {"events": events}
     except ClientError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise aws_error(e)
+
+
+@app.get("/api/cloudwatch/log-groups/{log_group_name}/streams/{log_stream_name}/tail")
+async def tail_log_events(log_group_name: str, log_stream_name: str, user=Depends(verify_token)):
+    # SSE 라이브 테일. 같은 스트림을 보는 요청들은 폴러 하나를 공유
+    try:
+        events = await tails.stream(log_group_name, log_stream_name)
+    except ClientError as e:
+        raise aws_error(e)
+    except Exception as e:
+        # 첫 조회가 연결 오류/timeout 등으로 실패한 경우
+        raise HTTPException(status_code=500, detail=str(e) or type(e).__name__)
+    return StreamingResponse(events, media_type="text/event-stream")
+
+
+def epoch_ms(value):
+    # 타임존이 없는 값은 UTC로 간주
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1000)
+
+
+async def stream_search(first_event, events, limit):
+    # 시간순으로 한 줄씩 내보내고, 중간에 실패하면 마지막 timestamp를 남겨서 start로 이어서 검색할 수 있게 함
+    event = first_event
+    count = 0
+    try:
+        while event is not None:
+            yield json.dumps({
+                "timestamp": event['timestamp'],
+                "log_stream": event.get('logStreamName'),
+                "message": event['message'],
+                "event_id": event['eventId']
+            }) + "\n"
+            count += 1
+            if count >= limit:
+                yield json.dumps({"truncated": True, "resume_from": event['timestamp']}) + "\n"
+                return
+            try:
+                event = await anext(events, None)
+            except Exception as e:
+                # 연결 오류 등 ClientError가 아닌 실패도 에러 줄을 남기고 끝냄 (스트림이 그냥 끊기지 않도록)
+                yield json.dumps({"error": str(e) or type(e).__name__, "resume_from": event['timestamp']}) + "\n"
+                return
+    finally:
+        await events.aclose()
+
+
+@app.get("/api/cloudwatch/log-groups/{log_group_name}/search")
+async def search_logs(
+    log_group_name: str,
+    filter_pattern: str = None,
+    start: datetime = None,
+    end: datetime = None,
+    stream_prefix: list[str] = Query(None),
+    limit: int = Query(SEARCH_MAX_RESULTS, ge=1, le=SEARCH_MAX_RESULTS),
+    user=Depends(verify_token)
+):
+    # 기본 범위는 최근 1시간, 결과는 timestamp 순서의 NDJSON
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(hours=1)
+    start_ms, end_ms = epoch_ms(start), epoch_ms(end)
+    if start_ms >= end_ms:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    events = search_log_events(aws, logs_client, log_group_name, start_ms, end_ms, filter_pattern, stream_prefix)
+    try:
+        first_event = await anext(events, None)
+    except ClientError as e:
+        await events.aclose()
+        raise aws_error(e)
+    except Exception as e:
+        await events.aclose()
+        raise HTTPException(status_code=500, detail=str(e) or type(e).__name__)
+    return StreamingResponse(stream_search(first_event, events, limit), media_type="application/x-ndjson")
 
 
 @app.get("/api/cloudwatch/metrics/{namespace}")
 async def get_metrics(namespace: str, user=Depends(verify_token)):
     try:
-        response = cloudwatch_client.list_metrics(Namespace=namespace)
+        response = await aws.call(cloudwatch_client.list_metrics, Namespace=namespace)
         metrics = [
             {
                 "name": metric['MetricName'],
@@ -116,7 +183,70 @@ async def get_metrics(namespace: str, user=Depends(verify_token)):
         ]
         return {"metrics": metrics}
     except ClientError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise aws_error(e)
+
+
+class MetricSpec(BaseModel):
+    namespace: str
+    name: str
+    dimensions: dict = {}
+    stat: str = "Average"
+
+
+class MetricDataRequest(BaseModel):
+    metrics: list[MetricSpec]
+    start: datetime = None
+    end: datetime = None
+    period: int = Field(60, ge=1)
+    points: int = Field(METRIC_DEFAULT_POINTS, ge=1, le=10000)
+
+
+@app.post("/api/cloudwatch/metrics/data")
+async def get_metric_data(request: MetricDataRequest, user=Depends(verify_token)):
+    # 여러 메트릭의 데이터포인트를 한 번에 조회해서 메트릭별로 최대 points개로 줄여서 응답 (기본 범위는 최근 3시간)
+    if not request.metrics or len(request.metrics) > METRIC_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"1 to {METRIC_MAX_QUERIES} metrics are required")
+    end = request.end or datetime.now(timezone.utc)
+    start = request.start or end - timedelta(hours=3)
+    start_ms, end_ms = epoch_ms(start), epoch_ms(end)
+    if start_ms >= end_ms:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    metrics = [metric.model_dump() for metric in request.metrics]
+    queries = [metric_query(f"m{index}", metric, request.period) for index, metric in enumerate(metrics)]
+    try:
+        data = await metric_cache.fetch(aws, cloudwatch_client, queries, start_ms / 1000, end_ms / 1000, request.period)
+    except ClientError as e:
+        raise aws_error(e)
+
+    series = []
+    for query, metric in zip(queries, metrics):
+        timestamps, values = data[query["Id"]]
+        timestamps, minimum, maximum, average = downsample(
+            timestamps, values, start_ms / 1000, end_ms / 1000, request.points
+        )
+        series.append({
+            **metric,
+            "raw_points": len(values),
+            "timestamps": (timestamps * 1000).astype("int64").tolist(),
+            "min": minimum.tolist(),
+            "max": maximum.tolist(),
+            "avg": average.tolist()
+        })
+    return {"start": start_ms, "end": end_ms, "period": request.period, "series": series}
+
+
+@app.on_event("startup")
+async def start_background_tasks():
+    # 로그아웃된 토큰 목록을 auth-service에서 주기적으로 받아옴
+    verifier.start()
+    # boto3 클라이언트 워밍업 (AWS_PRELOAD_CLIENTS)
+    aws_clients.start()
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    await verifier.stop()
+    await aws_clients.stop()
 
 
 @app.get("/health")
@@ -124,7 +254,13 @@ async def health_check():
     return {
         "status": "healthy",
         "service": "cloudwatch-service",
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": datetime.utcnow().isoformat(),
+        "aws_calls": aws.stats(),
+        "aws_clients": aws_clients.stats(),
+        "cache": cache.stats(),
+        "log_tails": tails.stats(),
+        "metric_cache": metric_cache.stats(),
+        "auth": verifier.stats()
     }
 
 
@@ -0,0 +1,230 @@
+import asyncio
+import json
+import math
+import os
+import time
+from collections import OrderedDict, defaultdict
+
+import numpy as np
+
+# get_metric_data 한 번에 최대 500개 쿼리. 결과는 numpy 배열로 모아서 버킷 단위로 줄여 보냄
+MAX_QUERIES_PER_CALL = 500
+METRIC_DEFAULT_POINTS = int(os.getenv("METRIC_DEFAULT_POINTS", "500"))
+METRIC_CACHE_MAX_POINTS = int(os.getenv("METRIC_CACHE_MAX_POINTS", "2000000"))
+# 최근 구간은 CloudWatch에 아직 수집 중일 수 있으므로 이 시간 이전까지만 확정된 데이터로 캐시
+METRIC_SETTLE_SECONDS = float(os.getenv("METRIC_SETTLE_SECONDS", "300"))
+
+
+def metric_query(query_id, metric, period):
+    return {
+        "Id": query_id,
+        "MetricStat": {
+            "Metric": {
+                "Namespace": metric["namespace"],
+                "MetricName": metric["name"],
+                "Dimensions": [{"Name": name, "Value": value} for name, value in metric.get("dimensions", {}).items()],
+            },
+            "Period": period,
+            "Stat": metric.get("stat", "Average"),
+        },
+        "ReturnData": True,
+    }
+
+
+async def fetch_batch(aws, cloudwatch_client, queries, start, end, series):
+    params = {
+        "MetricDataQueries": queries,
+        "StartTime": start,
+        "EndTime": end,
+        "ScanBy": "TimestampAscending",
+    }
+    while True:
+        response = await aws.call(cloudwatch_client.get_metric_data, **params)
+        for result in response['MetricDataResults']:
+            if result['Timestamps']:
+                timestamps = np.array([timestamp.timestamp() for timestamp in result['Timestamps']], dtype=np.float64)
+                series[result['Id']].append((timestamps, np.array(result['Values'], dtype=np.float64)))
+        if 'NextToken' not in response:
+            return
+        params['NextToken'] = response['NextToken']
+
+
+async def fetch_metric_data(aws, cloudwatch_client, queries, start, end):
+    # 500개씩 나눈 배치를 동시에 조회하고, 페이지마다 나뉘어 온 결과를 쿼리 ID별로 이어 붙임
+    series = {query["Id"]: [] for query in queries}
+    batches = [queries[i:i + MAX_QUERIES_PER_CALL] for i in range(0, len(queries), MAX_QUERIES_PER_CALL)]
+    await asyncio.gather(*(fetch_batch(aws, cloudwatch_client, batch, start, end, series) for batch in batches))
+    merged = {}
+    for query_id, chunks in series.items():
+        if not chunks:
+            merged[query_id] = (np.empty(0), np.empty(0))
+            continue
+        timestamps = np.concatenate([chunk[0] for chunk in chunks])
+        values = np.concatenate([chunk[1] for chunk in chunks])
+        order = np.argsort(timestamps, kind="stable")
+        merged[query_id] = (timestamps[order], values[order])
+    return merged
+
+
+def downsample(timestamps, values, start, end, points):
+    # [start, end)를 points개 버킷으로 나눠 버킷별 min/max/avg 계산 (빈 버킷은 생략)
+    # timestamps가 정렬돼 있으므로 버킷 경계 인덱스로 reduceat을 쓰면 반복문 없이 계산됨
+    if len(timestamps) <= points:
+        return timestamps, values, values, values
+    width = (end - start) / points
+    buckets = np.clip(((timestamps - start) // width).astype(np.int64), 0, points - 1)
+    edges = np.flatnonzero(np.diff(buckets, prepend=-1))
+    counts = np.diff(np.append(edges, len(values)))
+    minimum = np.minimum.reduceat(values, edges)
+    maximum = np.maximum.reduceat(values, edges)
+    average = np.add.reduceat(values, edges) / counts
+    return start + buckets[edges] * width, minimum, maximum, average
+
+
+def combine(chunks):
+    # (timestamps, values) 묶음들을 timestamp 순으로 합침. 겹치는 timestamp는 앞쪽 묶음의 값이 남음
+    if len(chunks) == 1:
+        return chunks[0]
+    timestamps, index = np.unique(np.concatenate([chunk[0] for chunk in chunks]), return_index=True)
+    return timestamps, np.concatenate([chunk[1] for chunk in chunks])[index]
+
+
+class SeriesEntry:
+    __slots__ = ("timestamps", "values", "start", "end")
+
+    def __init__(self, timestamps, values, start, end):
+        self.timestamps = timestamps
+        self.values = values
+        self.start = start
+        self.end = end
+
+
+class MetricSeriesCache:
+    """메트릭 + 통계 + period별 시계열 캐시. [start, end) 구간의 데이터를 정렬된 배열로 보관하고
+    요청 구간 중 비어 있는 앞/뒤 구간만 조회해서 이어 붙임. 전체 데이터포인트 수로 LRU 정리"""
+
+    def __init__(self, max_points=METRIC_CACHE_MAX_POINTS, settle_seconds=METRIC_SETTLE_SECONDS):
+        self.max_points = max_points
+        self.settle_seconds = settle_seconds
+        self._entries = OrderedDict()
+        self.points = 0
+        self.hits = 0
+        self.partial = 0
+        self.misses = 0
+        self.fetched_points = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(query):
+        return json.dumps(query["MetricStat"], sort_keys=True)
+
+    def _missing(self, key, start, end):
+        entry = self._entries.get(key)
+        if entry is None or end < entry.start or start > entry.end:
+            return [(start, end)]
+        ranges = []
+        if start < entry.start:
+            ranges.append((start, entry.start))
+        if end > entry.end:
+            ranges.append((entry.end, end))
+        return ranges
+
+    def _merge(self, key, start, end, timestamps, values):
+        entry = self._entries.get(key)
+        if entry is None or end < entry.start or start > entry.end:
+            # 기존 구간과 이어지지 않으면 새 구간으로 교체 (캐시 구간에는 빈틈이 없도록 유지)
+            if entry is not None:
+                self.points -= len(entry.timestamps)
+            entry = SeriesEntry(timestamps, values, start, end)
+            self.points += len(timestamps)
+        else:
+            self.points -= len(entry.timestamps)
+            # 새로 받은 값을 앞에 둬서 겹치는 timestamp는 새 값이 남도록 함
+            entry.timestamps, entry.values = combine([(timestamps, values), (entry.timestamps, entry.values)])
+            entry.start = min(entry.start, start)
+            entry.end = max(entry.end, end)
+            self.points += len(entry.timestamps)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+
+    def _settle(self, key, settled):
+        # 아직 확정되지 않은 최근 구간은 응답에만 쓰고 캐시에서는 잘라내서 다음 요청 때 다시 조회
+        entry = self._entries.get(key)
+        if entry is None or entry.end <= settled:
+            return
+        if settled <= entry.start:
+            self.points -= len(entry.timestamps)
+            del self._entries[key]
+            return
+        keep = int(np.searchsorted(entry.timestamps, settled))
+        self.points -= len(entry.timestamps) - keep
+        entry.timestamps = entry.timestamps[:keep]
+        entry.values = entry.values[:keep]
+        entry.end = settled
+
+    async def fetch(self, aws, cloudwatch_client, queries, start, end, period):
+        # 구간 경계를 period 배수로 맞춰서 이어 붙인 구간에 빈틈이나 어긋난 데이터포인트가 생기지 않도록 함
+        start = math.floor(start / period) * period
+        end = math.ceil(end / period) * period
+        keys = {query["Id"]: self.make_key(query) for query in queries}
+        # 빠진 구간이 같은 시계열끼리 묶어서 get_metric_data 배치로 조회 (대시보드 새로고침은 보통 한 묶음)
+        # 같은 시계열이 요청에 여러 번 있어도 한 번만 조회
+        groups = defaultdict(dict)
+        # 조회를 기다리는 동안 다른 요청이 같은 항목을 정리/교체할 수 있으므로 캐시에 있던 배열을 미리 잡아둠
+        chunks = {}
+        for query in {keys[query["Id"]]: query for query in queries}.values():
+            key = keys[query["Id"]]
+            ranges = self._missing(key, start, end)
+            chunks[key] = []
+            if not ranges:
+                self.hits += 1
+            elif ranges == [(start, end)]:
+                self.misses += 1
+            else:
+                self.partial += 1
+            if ranges != [(start, end)]:
+                entry = self._entries[key]
+                chunks[key].append((entry.timestamps, entry.values))
+            for missing in ranges:
+                groups[missing][key] = query
+        groups = list(groups.items())
+        results = await asyncio.gather(*(
+            fetch_metric_data(aws, cloudwatch_client, list(batch.values()), missing_start, missing_end)
+            for (missing_start, missing_end), batch in groups
+        ))
+        for ((missing_start, missing_end), batch), data in zip(groups, results):
+            for key, query in batch.items():
+                timestamps, values = data[query["Id"]]
+                self.fetched_points += len(timestamps)
+                chunks[key].insert(0, (timestamps, values))
+                self._merge(key, missing_start, missing_end, timestamps, values)
+
+        settled = math.floor((time.time() - self.settle_seconds) / period) * period
+        combined = {key: combine(parts) for key, parts in chunks.items()}
+        series = {}
+        for query in queries:
+            timestamps, values = combined[keys[query["Id"]]]
+            first, last = np.searchsorted(timestamps, [start, end])
+            series[query["Id"]] = (timestamps[first:last], values[first:last])
+        for key in set(keys.values()):
+            self._settle(key, settled)
+        self._evict()
+        return series
+
+    def _evict(self):
+        while self.points > self.max_points and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self.points -= len(entry.timestamps)
+            self.evictions += 1
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "points": self.points,
+            "max_points": self.max_points,
+            "hits": self.hits,
+            "partial": self.partial,
+            "misses": self.misses,
+            "fetched_points": self.fetched_points,
+            "evictions": self.evictions,
+        }
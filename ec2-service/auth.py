@@ -0,0 +1,209 @@
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+
+import jwt
+import requests
+from fastapi import Depends, HTTPException, Request
+from fastapi.security import OAuth2PasswordBearer
+
+from telemetry import JWT_DECODE_LATENCY
+
+# 토큰은 auth-service의 JWKS 공개키로 검증. SECRET_KEY는 설정된 경우에만 이전 HS256 토큰 검증에 사용 (전환 기간용)
+SECRET_KEY = os.getenv("SECRET_KEY")
+AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL", "http://auth-service:8000")
+JWKS_REFRESH_SECONDS = float(os.getenv("JWKS_REFRESH_SECONDS", "300"))
+# 모르는 kid가 들어와도 JWKS를 너무 자주 다시 받지 않도록 최소 간격을 둠
+JWKS_MIN_REFRESH_SECONDS = 10
+# 같은 토큰이 만료 전까지 수백 번 들어오므로 검증 결과를 캐시 (0이면 캐시하지 않음)
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+REVOCATION_POLL_SECONDS = float(os.getenv("REVOCATION_POLL_SECONDS", "5"))
+# auth-service의 폐기 목록은 같은 SERVICE_TOKEN을 가진 서비스에만 내려줌
+SERVICE_TOKEN = os.getenv("SERVICE_TOKEN")
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="http://auth-service:8000/api/auth/login")
+
+
+class TokenRevoked(jwt.InvalidTokenError):
+    pass
+
+
+class UnknownSigningKey(jwt.InvalidTokenError):
+    pass
+
+
+class TokenVerifier:
+    """검증된 토큰의 claims를 토큰 해시 기준 LRU로 보관. exp가 지난 항목은 캐시에 있어도 만료 처리하고,
+    auth-service에서 로그아웃된 토큰(jti)과 JWKS 공개키는 주기적으로 받아옴"""
+
+    def __init__(self, max_entries=TOKEN_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.public_keys = {}
+        self.keys_fetched_at = 0.0
+        self._keys_refresh = None
+        self.revoked = {}
+        self.revocation_seq = 0
+        self.sync_error = None
+        self._task = None
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+
+    def verify(self, token):
+        key = hashlib.sha256(token.encode()).digest()
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            started = time.perf_counter()
+            claims = self._decode(token)
+            JWT_DECODE_LATENCY.observe(time.perf_counter() - started)
+            exp = claims.get("exp")
+        else:
+            self.hits += 1
+            claims, exp = entry
+            if exp is not None and exp <= time.time():
+                del self._entries[key]
+                raise jwt.ExpiredSignatureError("Signature has expired")
+        if claims.get("jti") in self.revoked:
+            self._entries.pop(key, None)
+            raise TokenRevoked("Token has been revoked")
+        if entry is not None:
+            self._entries.move_to_end(key)
+        elif self.max_entries > 0:
+            self._entries[key] = (claims, exp)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return claims
+
+    def _decode(self, token):
+        kid = jwt.get_unverified_header(token).get("kid")
+        if kid is None:
+            if not SECRET_KEY:
+                raise jwt.InvalidTokenError("Token has no key id")
+            claims = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+            # jti가 없는 이전 토큰은 토큰 해시를 jti로 써서 auth-service의 로그아웃 목록과 맞춤
+            claims.setdefault("jti", hashlib.sha256(token.encode()).hexdigest())
+            return claims
+        if kid not in self.public_keys:
+            raise UnknownSigningKey(kid)
+        key, algorithm = self.public_keys[kid]
+        return jwt.decode(token, key, algorithms=[algorithm])
+
+    async def refresh_keys(self, force=False):
+        # 동시에 들어온 요청들은 진행 중인 JWKS 조회 하나를 같이 기다림
+        if self._keys_refresh is None:
+            if not force and time.monotonic() - self.keys_fetched_at < JWKS_MIN_REFRESH_SECONDS:
+                return
+            self._keys_refresh = asyncio.create_task(self._fetch_keys())
+        task = self._keys_refresh
+        try:
+            await asyncio.shield(task)
+        finally:
+            if self._keys_refresh is task and task.done():
+                self._keys_refresh = None
+
+    async def _fetch_keys(self):
+        self.keys_fetched_at = time.monotonic()
+        try:
+            response = await asyncio.to_thread(
+                requests.get, f"{AUTH_SERVICE_URL}/api/auth/.well-known/jwks.json", timeout=5
+            )
+            response.raise_for_status()
+            keys = {}
+            for jwk in response.json()["keys"]:
+                try:
+                    keys[jwk["kid"]] = (jwt.PyJWK(jwk).key, jwk["alg"])
+                except (jwt.PyJWKError, KeyError):
+                    continue
+            # JWKS에서 빠진 키(교체 후 정리된 키)는 더 이상 허용하지 않음
+            self.public_keys = keys
+        except (requests.RequestException, ValueError, KeyError) as e:
+            self.sync_error = str(e)
+
+    def revoke(self, jti, exp):
+        self.revoked[jti] = exp
+
+    def _prune(self):
+        # 만료된 토큰은 어차피 거부되므로 폐기 목록에서도 정리
+        now = time.time()
+        for jti in [jti for jti, exp in self.revoked.items() if exp is not None and exp <= now]:
+            del self.revoked[jti]
+
+    async def sync(self):
+        # 폐기 목록은 REVOCATION_POLL_SECONDS마다, JWKS는 JWKS_REFRESH_SECONDS마다 갱신
+        while True:
+            if time.monotonic() - self.keys_fetched_at >= JWKS_REFRESH_SECONDS or not self.public_keys:
+                await self.refresh_keys(force=True)
+            try:
+                response = await asyncio.to_thread(
+                    requests.get,
+                    f"{AUTH_SERVICE_URL}/api/auth/revocations",
+                    params={"since": self.revocation_seq},
+                    headers={"Authorization": f"Bearer {SERVICE_TOKEN}"} if SERVICE_TOKEN else {},
+                    timeout=5
+                )
+                response.raise_for_status()
+                data = response.json()
+                for item in data["revoked"]:
+                    self.revoke(item["jti"], item["exp"])
+                # auth-service DB가 새로 만들어지면 seq가 작아지므로 받은 값을 그대로 따라감
+                self.revocation_seq = data["seq"]
+                self.sync_error = None
+            except (requests.RequestException, ValueError, KeyError) as e:
+                self.sync_error = str(e)
+            self._prune()
+            await asyncio.sleep(REVOCATION_POLL_SECONDS)
+
+    def start(self):
+        if REVOCATION_POLL_SECONDS > 0 and self._task is None:
+            self._task = asyncio.create_task(self.sync())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self):
+        return {
+            "cached_tokens": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "rejected": self.rejected,
+            "public_keys": sorted(self.public_keys),
+            "revoked": len(self.revoked),
+            "revocation_seq": self.revocation_seq,
+            "sync_error": self.sync_error,
+        }
+
+
+verifier = TokenVerifier()
+
+
+async def verify_token(request: Request, token: str = Depends(oauth2_scheme)):
+    # async로 둬서 스레드풀을 거치지 않고, 같은 요청 안에서는 검증 결과를 재사용
+    user = getattr(request.state, "user", None)
+    if user is not None:
+        return user
+    try:
+        try:
+            user = verifier.verify(token)
+        except UnknownSigningKey:
+            # 키 교체 직후에는 새 kid를 아직 모르므로 JWKS를 다시 받아서 한 번 더 시도
+            await verifier.refresh_keys()
+            user = verifier.verify(token)
+    except TokenRevoked:
+        verifier.rejected += 1
+        raise HTTPException(status_code=401, detail="Token revoked")
+    except jwt.ExpiredSignatureError:
+        verifier.rejected += 1
+        raise HTTPException(status_code=401, detail="Token expired")
+    except jwt.InvalidTokenError:
+        verifier.rejected += 1
+        raise HTTPException(status_code=401, detail="Invalid token")
+    request.state.user = user
+    return user
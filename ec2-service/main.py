@@ -1,12 +1,20 @@
-from fastapi import FastAPI, Depends, HTTPException
-from fastapi.security import OAuth2PasswordBearer
+from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-import boto3
+from pydantic import BaseModel
 from botocore.exceptions import ClientError
 from datetime import datetime
-import jwt
+from typing import List
+import asyncio
+import json
 import os
 
+from auth import verifier, verify_token
+from aws_client import AWSCallLayer, aws_clients, aws_error
+from cache import TTLCache
+from inventory import INVENTORY_SEARCH_LIMIT, InventoryIndex, search_response
+from telemetry import instrument
+
 app = FastAPI(title="EC2 Service")
 
 # CORS 설정
@@ -20,83 +28,378 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
-ALGORITHM = "HS256"
+# 라우트별 응답 시간, AWS 호출, 이벤트 루프 지연을 `/metrics`로 노출
+instrument(app)
+
 AWS_REGION = os.getenv("AWS_DEFAULT_REGION", "ap-northeast-2")
+INSTANCES_CACHE_TTL = float(os.getenv("INSTANCES_CACHE_TTL", "10"))
+STATUS_CACHE_TTL = float(os.getenv("STATUS_CACHE_TTL", "5"))
+# 인스턴스 목록을 조회할 리전 목록 (쉼표 구분, 기본은 AWS_REGION 하나)
+EC2_REGIONS = [r.strip() for r in os.getenv("EC2_REGIONS", AWS_REGION).split(",") if r.strip()]
+# 배치 요청 시 AWS 호출 한 번에 넣을 인스턴스 ID 수 (DescribeInstanceStatus는 최대 100개)
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "100"))
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="http://auth-service:8000/api/auth/login")
+# boto3 클라이언트는 처음 쓸 때(또는 시작 직후 워밍업에서) 공유 세션으로 만듦
+ec2_client = aws_clients.lazy('ec2', AWS_REGION)
+# 목록 조회 대상 리전의 클라이언트도 워밍업 때 함께 만듦
+ec2_clients = {region: aws_clients.lazy('ec2', region) for region in EC2_REGIONS}
 
-# boto3 클라이언트 생성
-aws_access_key = os.getenv("AWS_ACCESS_KEY_ID")
-aws_secret_key = os.getenv("AWS_SECRET_ACCESS_KEY")
+aws = AWSCallLayer("ec2")
+cache = TTLCache("ec2")
+
+
+class BatchRequest(BaseModel):
+    instance_ids: List[str] = []
+    region: str = None
+
+
+def check_region(region):
+    # 요청으로 받은 리전은 설정한 리전이나 botocore가 아는 리전만 허용. 임의 문자열마다 클라이언트가 쌓이지 않도록 함
+    if region == AWS_REGION or region in ec2_clients:
+        return region
+    if region not in aws_clients.available_regions('ec2'):
+        raise HTTPException(status_code=400, detail=f"Unknown region: {region}")
+    return region
+
+
+def regional_client(region):
+    if region == AWS_REGION:
+        return ec2_client
+    check_region(region)
+    client = ec2_clients.get(region)
+    if client is None:
+        client = ec2_clients[region] = aws_clients.lazy('ec2', region)
+    return client
+
+
+def instance_filters(state, instance_type, tags):
+    # 조회 후 걸러내지 않고 AWS에 Filters로 넘겨서 필요한 인스턴스만 받아옴
+    filters = []
+    if state:
+        filters.append({"Name": "instance-state-name", "Values": state.split(",")})
+    if instance_type:
+        filters.append({"Name": "instance-type", "Values": instance_type.split(",")})
+    for tag in tags:
+        key, _, value = tag.partition("=")
+        if value:
+            filters.append({"Name": f"tag:{key}", "Values": value.split(",")})
+        else:
+            filters.append({"Name": "tag-key", "Values": [key]})
+    return filters
+
+
+def instance_info(instance, region):
+    tags = {tag['Key']: tag['Value'] for tag in instance.get('Tags', [])}
+    return {
+        "id": instance['InstanceId'],
+        "name": tags.get('Name'),
+        "type": instance['InstanceType'],
+        "state": instance['State']['Name'],
+        "launch_time": instance['LaunchTime'].isoformat(),
+        "region": region,
+        "tags": tags
+    }
+
+
+async def describe_region(region, filters):
+    client = regional_client(region)
+    params = {"MaxResults": 1000}
+    if filters:
+        params["Filters"] = filters
+    while True:
+        response = await aws.call(client.describe_instances, **params)
+        yield [
+            instance_info(instance, region)
+            for reservation in response['Reservations']
+            for instance in reservation['Instances']
+        ]
+        if not response.get('NextToken'):
+            return
+        params["NextToken"] = response['NextToken']
 
-if aws_access_key and aws_secret_key:
-    ec2_client = boto3.client(
-        'ec2',
-        region_name=AWS_REGION,
-        aws_access_key_id=aws_access_key,
-        aws_secret_access_key=aws_secret_key
-    )
-else:
-    ec2_client = boto3.client('ec2', region_name=AWS_REGION)
 
+async def describe_regions(regions, filters):
+    # 리전별 페이지네이션을 동시에 돌리고 도착하는 순서대로 페이지를 합침
+    # 전체 지연 시간은 리전 합계가 아니라 가장 느린 리전에 맞춰짐
+    queue = asyncio.Queue(maxsize=len(regions) * 2)
 
-def verify_token(token: str = Depends(oauth2_scheme)):
+    async def pump(region):
+        try:
+            async for page in describe_region(region, filters):
+                await queue.put(("page", region, page))
+        except Exception as e:
+            # 연결 실패/타임아웃 등도 리전 에러로 알려서 빈 결과와 구분되게 함
+            await queue.put(("error", region, str(e) or type(e).__name__))
+        finally:
+            await queue.put(("done", region, None))
+
+    tasks = [asyncio.create_task(pump(region)) for region in regions]
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+        remaining = len(tasks)
+        while remaining:
+            kind, region, value = await queue.get()
+            if kind == "done":
+                remaining -= 1
+            else:
+                yield kind, region, value
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def stream_instances(regions, filters):
+    async for kind, region, value in describe_regions(regions, filters):
+        if kind == "error":
+            yield json.dumps({"error": value, "region": region}) + "\n"
+            continue
+        for instance in value:
+            yield json.dumps(instance) + "\n"
 
 
 @app.get("/api/ec2/instances")
-async def list_instances(user=Depends(verify_token)):
-    try:
-        response = ec2_client.describe_instances()
+async def list_instances(
+    regions: str = None,
+    state: str = None,
+    instance_type: str = None,
+    tag: List[str] = Query([]),
+    stream: bool = False,
+    user=Depends(verify_token)
+):
+    region_list = [check_region(r.strip()) for r in regions.split(",") if r.strip()] if regions else EC2_REGIONS
+    filters = instance_filters(state, instance_type, tag)
+
+    if stream:
+        return StreamingResponse(stream_instances(region_list, filters), media_type="application/x-ndjson")
+
+    async def load():
         instances = []
-        for reservation in response['Reservations']:
-            for instance in reservation['Instances']:
-                instances.append({
-                    "id": instance['InstanceId'],
-                    "type": instance['InstanceType'],
-                    "state": instance['State']['Name'],
-                    "launch_time": instance['LaunchTime'].isoformat()
-                })
-        return {"instances": instances}
-    except ClientError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        errors = {}
+        async for kind, region, value in describe_regions(region_list, filters):
+            if kind == "error":
+                errors[region] = value
+            else:
+                instances.extend(value)
+        if errors and len(errors) == len(region_list):
+            raise HTTPException(status_code=500, detail="; ".join(errors.values()))
+        result = {"instances": instances}
+        if errors:
+            # 일부 리전만 실패하면 나머지 결과와 함께 리전별 에러를 돌려줌
+            result["errors"] = errors
+        return result
+
+    return await cache.get(
+        "describe_instances",
+        load,
+        ttl=INSTANCES_CACHE_TTL,
+        regions=region_list,
+        filters=filters
+    )
+
+
+def invalidate_instance(instance_id):
+    # 상태가 바뀌는 요청 이후에는 캐시된 목록/상태를 버려서 바로 반영되도록 함
+    cache.invalidate("describe_instances")
+    cache.invalidate("describe_instance_status", instance_id=instance_id)
+    inventory.wake()
 
 
 @app.post("/api/ec2/instances/{instance_id}/start")
-async def start_instance(instance_id: str, user=Depends(verify_token)):
+async def start_instance(instance_id: str, region: str = None, user=Depends(verify_token)):
     try:
-        ec2_client.start_instances(InstanceIds=[instance_id])
+        await aws.call(regional_client(region or AWS_REGION).start_instances, InstanceIds=[instance_id])
+        invalidate_instance(instance_id)
         return {"message": f"Instance {instance_id} starting"}
     except ClientError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise aws_error(e)
 
 
 @app.post("/api/ec2/instances/{instance_id}/stop")
-async def stop_instance(instance_id: str, user=Depends(verify_token)):
+async def stop_instance(instance_id: str, region: str = None, user=Depends(verify_token)):
     try:
-        ec2_client.stop_instances(InstanceIds=[instance_id])
+        await aws.call(regional_client(region or AWS_REGION).stop_instances, InstanceIds=[instance_id])
+        invalidate_instance(instance_id)
         return {"message": f"Instance {instance_id} stopping"}
     except ClientError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise aws_error(e)
 
 
 @app.get("/api/ec2/instances/{instance_id}/status")
-async def get_instance_status(instance_id: str, user=Depends(verify_token)):
-    try:
-        response = ec2_client.describe_instance_status(InstanceIds=[instance_id])
+async def get_instance_status(instance_id: str, region: str = None, user=Depends(verify_token)):
+    region = region or AWS_REGION
+
+    async def load():
+        response = await aws.call(regional_client(region).describe_instance_status, InstanceIds=[instance_id])
         if response['InstanceStatuses']:
             status = response['InstanceStatuses'][0]
             return {"status": status['InstanceState']['Name']}
         return {"status": "unknown"}
+
+    try:
+        return await cache.get(
+            "describe_instance_status",
+            load,
+            ttl=STATUS_CACHE_TTL,
+            instance_id=instance_id,
+            region=region
+        )
     except ClientError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise aws_error(e)
+
+
+# 묶음 전체를 실패시키는 잘못된 ID 관련 에러. 이 경우에만 묶음을 나눠 다시 시도해서 문제 ID를 찾아냄
+PER_INSTANCE_ERRORS = ("InvalidInstanceID", "IncorrectInstanceState", "UnsupportedOperation")
+
+
+async def call_in_chunks(fn, instance_ids, collect, **params):
+    results = {}
+    errors = {}
+
+    async def run(ids):
+        try:
+            response = await aws.call(fn, InstanceIds=ids, **params)
+        except ClientError as e:
+            code = e.response.get('Error', {}).get('Code', '')
+            if len(ids) > 1 and code.startswith(PER_INSTANCE_ERRORS):
+                middle = len(ids) // 2
+                await asyncio.gather(run(ids[:middle]), run(ids[middle:]))
+            else:
+                errors.update({instance_id: str(e) for instance_id in ids})
+            return
+        except Exception as e:
+            # 연결 오류/timeout 등은 이 묶음의 ID만 실패로 기록 (다른 묶음 결과와 이후 캐시 무효화는 그대로 진행)
+            errors.update({instance_id: str(e) or type(e).__name__ for instance_id in ids})
+            return
+        results.update(collect(response))
+
+    ids = list(dict.fromkeys(instance_ids))
+    await asyncio.gather(*(run(ids[i:i + BATCH_CHUNK_SIZE]) for i in range(0, len(ids), BATCH_CHUNK_SIZE)))
+    return {"results": results, "errors": errors}
+
+
+def state_changes(key):
+    def collect(response):
+        return {
+            change['InstanceId']: {
+                "previous_state": change['PreviousState']['Name'],
+                "current_state": change['CurrentState']['Name']
+            }
+            for change in response.get(key, [])
+        }
+    return collect
+
+
+def status_info(status):
+    return {
+        "state": status['InstanceState']['Name'],
+        "availability_zone": status.get('AvailabilityZone'),
+        "system_status": status.get('SystemStatus', {}).get('Status'),
+        "instance_status": status.get('InstanceStatus', {}).get('Status')
+    }
+
+
+def collect_statuses(response):
+    return {status['InstanceId']: status_info(status) for status in response['InstanceStatuses']}
+
+
+@app.post("/api/ec2/batch/start")
+async def batch_start_instances(request: BatchRequest, user=Depends(verify_token)):
+    client = regional_client(request.region or AWS_REGION)
+    result = await call_in_chunks(client.start_instances, request.instance_ids, state_changes('StartingInstances'))
+    cache.invalidate("describe_instances")
+    cache.invalidate("describe_instance_status")
+    inventory.wake()
+    return result
+
+
+@app.post("/api/ec2/batch/stop")
+async def batch_stop_instances(request: BatchRequest, user=Depends(verify_token)):
+    client = regional_client(request.region or AWS_REGION)
+    result = await call_in_chunks(client.stop_instances, request.instance_ids, state_changes('StoppingInstances'))
+    cache.invalidate("describe_instances")
+    cache.invalidate("describe_instance_status")
+    inventory.wake()
+    return result
+
+
+@app.post("/api/ec2/batch/status")
+async def batch_instance_status(request: BatchRequest, user=Depends(verify_token)):
+    # IncludeAllInstances로 중지된 인스턴스까지 포함. ID를 비우면 리전 전체를 페이지네이션으로 조회
+    client = regional_client(request.region or AWS_REGION)
+    if request.instance_ids:
+        return await call_in_chunks(
+            client.describe_instance_status,
+            request.instance_ids,
+            collect_statuses,
+            IncludeAllInstances=True
+        )
+
+    results = {}
+    params = {"IncludeAllInstances": True, "MaxResults": 1000}
+    try:
+        while True:
+            response = await aws.call(client.describe_instance_status, **params)
+            results.update(collect_statuses(response))
+            if not response.get('NextToken'):
+                break
+            params["NextToken"] = response['NextToken']
+    except ClientError as e:
+        raise aws_error(e)
+    return {"results": results, "errors": {}}
+
+
+async def list_instance_summaries():
+    # describe_instances 응답에 태그까지 있으므로 리소스별 상세 조회 없이 목록만으로 색인
+    instances = {}
+    listed = set()
+    async for kind, region, value in describe_regions(EC2_REGIONS, []):
+        if kind == "error":
+            # 일부 리전만 실패해도 그 리전 인스턴스가 삭제된 것으로 기록되지 않도록 이번 주기를 건너뜀
+            raise RuntimeError(f"{region}: {value}")
+        listed.add(region)
+        for instance in value:
+            instances[instance["id"]] = instance
+    # 성공한 리전은 인스턴스가 없어도 빈 페이지를 하나 내므로, 페이지가 없는 리전은 목록을 끝까지 받지 못한 것
+    missing = set(EC2_REGIONS) - listed
+    if missing:
+        raise RuntimeError(f"No listing from {', '.join(sorted(missing))}")
+    return instances
+
+
+inventory = InventoryIndex("ec2:instance", list_instance_summaries)
+
+
+@app.get("/api/ec2/search")
+async def search_inventory(
+    q: str = None,
+    tag: List[str] = Query([]),
+    limit: int = Query(INVENTORY_SEARCH_LIMIT, ge=1, le=1000),
+    user=Depends(verify_token)
+):
+    # 백그라운드 색인만 읽으므로 AWS를 부르지 않음. q는 단어 접두사, tag는 key 또는 key=value (여러 개면 모두 만족)
+    return search_response(inventory, q, tag, limit)
+
+
+@app.get("/api/ec2/changes")
+async def inventory_changes(since: int = 0, user=Depends(verify_token)):
+    # 이전에 받은 마지막 seq를 since로 넘기면 그 뒤의 생성/삭제/변경 이벤트만 받음
+    return inventory.changes_since(since)
+
+
+@app.on_event("startup")
+async def start_background_tasks():
+    # 로그아웃된 토큰 목록을 auth-service에서 주기적으로 받아옴
+    verifier.start()
+    # boto3 클라이언트 워밍업 (AWS_PRELOAD_CLIENTS)
+    aws_clients.start()
+    inventory.start()
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    await verifier.stop()
+    await inventory.stop()
+    await aws_clients.stop()
 
 
 @app.get("/health")
@@ -104,7 +407,12 @@ async def health_check():
     return {
         "status": "healthy",
         "service": "ec2-service",
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": datetime.utcnow().isoformat(),
+        "aws_calls": aws.stats(),
+        "aws_clients": aws_clients.stats(),
+        "inventory": inventory.stats(),
+        "cache": cache.stats(),
+        "auth": verifier.stats()
     }
 
 
@@ -0,0 +1,133 @@
+import asyncio
+import os
+import time
+
+from fastapi import Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, GCCollector, Histogram, PlatformCollector,
+    ProcessCollector, generate_latest
+)
+
+# 0이면 미들웨어/`/metrics`를 붙이지 않음
+TELEMETRY_ENABLED = os.getenv("TELEMETRY_ENABLED", "1") != "0"
+EVENT_LOOP_LAG_INTERVAL = float(os.getenv("EVENT_LOOP_LAG_INTERVAL", "0.5"))
+
+# 기본 레지스트리 대신 모듈마다 레지스트리를 둬서 벤치마크처럼 한 프로세스에서 서비스를 여러 번 로드해도 충돌하지 않음
+registry = CollectorRegistry()
+ProcessCollector(registry=registry)
+PlatformCollector(registry=registry)
+GCCollector(registry=registry)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency (streaming responses: until the last chunk)",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS, registry=registry
+)
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being handled", ["method"], registry=registry)
+AWS_CALL_LATENCY = Histogram(
+    "aws_call_duration_seconds", "boto3 call latency per attempt, excluding queueing",
+    ["operation", "outcome"], buckets=LATENCY_BUCKETS, registry=registry
+)
+AWS_CALL_RETRIES = Counter("aws_call_retries", "Attempts retried after throttling or a transient error",
+                           ["operation"], registry=registry)
+AWS_CALL_THROTTLED = Counter("aws_call_throttled", "Attempts that failed with a throttling error", ["operation"],
+                             registry=registry)
+AWS_CALL_REJECTED = Counter("aws_call_rejected", "Calls failed fast without calling AWS while the circuit was open",
+                            ["operation"], registry=registry)
+JWT_DECODE_LATENCY = Histogram(
+    "jwt_decode_duration_seconds", "JWT signature verification on token cache misses",
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01), registry=registry
+)
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds", "Delay of a periodic timer beyond its scheduled time",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5), registry=registry
+)
+
+
+def record_aws_call(operation, seconds, outcome):
+    # aws_client.AWSCallLayer에서 시도마다 호출 (outcome: ok / throttled / error)
+    if outcome == "throttled":
+        AWS_CALL_THROTTLED.labels(operation).inc()
+    AWS_CALL_LATENCY.labels(operation, outcome).observe(seconds)
+
+
+def record_aws_retry(operation):
+    AWS_CALL_RETRIES.labels(operation).inc()
+
+
+def record_aws_rejected(operation):
+    AWS_CALL_REJECTED.labels(operation).inc()
+
+
+class MetricsMiddleware:
+    """라우트별 응답 시간과 처리 중인 요청 수 기록. BaseHTTPMiddleware보다 가벼운 순수 ASGI 미들웨어"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight = REQUESTS_IN_FLIGHT.labels(method)
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_flight.dec()
+            # 라우터가 매칭한 라우트를 scope에 넣어주므로 경로 파라미터 대신 템플릿으로 집계 (매칭 안 된 경로는 한 값으로)
+            route = scope.get("route")
+            REQUEST_LATENCY.labels(method, route.path if route else "unmatched", status).observe(
+                time.perf_counter() - started
+            )
+
+
+class EventLoopMonitor:
+    """주기적으로 sleep해서 예정 시각보다 늦게 깨어난 시간을 기록. 동기 호출이 루프를 막으면 여기서 드러남"""
+
+    def __init__(self, interval=EVENT_LOOP_LAG_INTERVAL):
+        self.interval = interval
+        self._task = None
+
+    async def run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            EVENT_LOOP_LAG.observe(max(0.0, time.perf_counter() - started - self.interval))
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+loop_monitor = EventLoopMonitor()
+
+
+async def metrics():
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+
+def instrument(app):
+    if not TELEMETRY_ENABLED:
+        return
+    app.add_middleware(MetricsMiddleware)
+    app.add_api_route("/metrics", metrics, include_in_schema=False)
+    app.add_event_handler("startup", loop_monitor.start)
+    app.add_event_handler("shutdown", loop_monitor.stop)
@@ -0,0 +1,193 @@
+from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi.middleware.cors import CORSMiddleware
+from datetime import datetime
+from typing import List
+import asyncio
+import httpx
+import os
+import time
+
+from auth import oauth2_scheme, verifier, verify_token
+from telemetry import instrument
+
+app = FastAPI(title="Gateway Service")
+
+# CORS 설정
+allowed_origins = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000").split(",")
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=allowed_origins,
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# 라우트별 응답 시간, AWS 호출, 이벤트 루프 지연을 `/metrics`로 노출
+instrument(app)
+
+# 백엔드별 기본 응답 대기 시간. 넘으면 그 항목만 timeout으로 표시하고 나머지 결과를 먼저 돌려줌
+OVERVIEW_TIMEOUT = float(os.getenv("OVERVIEW_TIMEOUT", "3"))
+# 백엔드마다 keep-alive 연결을 유지해서 요청마다 연결을 새로 맺지 않음
+GATEWAY_MAX_CONNECTIONS = int(os.getenv("GATEWAY_MAX_CONNECTIONS", "100"))
+GATEWAY_KEEPALIVE_CONNECTIONS = int(os.getenv("GATEWAY_KEEPALIVE_CONNECTIONS", "20"))
+
+
+def backend(name, path, default_url, search_path=None):
+    # URL은 {NAME}_SERVICE_URL, 대기 시간은 OVERVIEW_TIMEOUT_{NAME}으로 서비스별로 바꿀 수 있음
+    return {
+        "url": os.getenv(f"{name.upper()}_SERVICE_URL", default_url).rstrip("/"),
+        "path": path,
+        "search_path": search_path,
+        "timeout": float(os.getenv(f"OVERVIEW_TIMEOUT_{name.upper()}", str(OVERVIEW_TIMEOUT)))
+    }
+
+
+BACKENDS = {
+    "s3": backend("s3", "/api/s3/buckets", "http://s3-service:8000", "/api/s3/search"),
+    "ec2": backend("ec2", "/api/ec2/instances", "http://ec2-service:8000", "/api/ec2/search"),
+    "rds": backend("rds", "/api/rds/instances", "http://rds-service:8000", "/api/rds/search"),
+    "lambda": backend("lambda", "/api/lambda/functions", "http://lambda-service:8000", "/api/lambda/search"),
+    "cloudwatch": backend("cloudwatch", "/api/cloudwatch/log-groups", "http://cloudwatch-service:8000"),
+}
+SEARCHABLE = [name for name, config in BACKENDS.items() if config["search_path"]]
+
+client = None
+backend_stats = {name: {"ok": 0, "error": 0, "timeout": 0, "last_elapsed_ms": None} for name in BACKENDS}
+
+
+def build_client():
+    limits = httpx.Limits(
+        max_connections=GATEWAY_MAX_CONNECTIONS,
+        max_keepalive_connections=GATEWAY_KEEPALIVE_CONNECTIONS
+    )
+    return httpx.AsyncClient(limits=limits)
+
+
+async def fetch_section(name, token, path=None, params=None):
+    # 실패/지연은 예외로 올리지 않고 항목 상태로 돌려줘서 다른 백엔드 결과에 영향을 주지 않음
+    config = BACKENDS[name]
+    stats = backend_stats[name]
+    started = time.perf_counter()
+    try:
+        response = await asyncio.wait_for(
+            client.get(
+                config["url"] + (path or config["path"]), params=params, headers={"Authorization": f"Bearer {token}"}
+            ),
+            timeout=config["timeout"]
+        )
+        if response.status_code >= 400:
+            try:
+                body = response.json()
+            except ValueError:
+                body = None
+            # FastAPI 오류는 {"detail": ...} 형태지만 프록시/로드밸런서 오류 본문은 형식이 제각각
+            detail = body.get("detail") if isinstance(body, dict) else None
+            if detail is None:
+                detail = response.text or f"HTTP {response.status_code}"
+            section = {"status": "error", "status_code": response.status_code, "detail": detail}
+        else:
+            section = {"status": "ok", "data": response.json()}
+    except asyncio.TimeoutError:
+        section = {"status": "timeout", "detail": f"No response within {config['timeout']}s"}
+    except (httpx.HTTPError, ValueError) as e:
+        section = {"status": "error", "detail": str(e) or type(e).__name__}
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+    stats[section["status"]] += 1
+    stats["last_elapsed_ms"] = elapsed_ms
+    section["elapsed_ms"] = elapsed_ms
+    return section
+
+
+def selected_sections(sections, available):
+    names = [name.strip() for name in sections.split(",") if name.strip()] if sections else available
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown sections: {', '.join(unknown)}")
+    return names
+
+
+@app.get("/api/overview")
+async def overview(
+    sections: str = Query(None, description="쉼표로 구분한 항목 (기본: 전체)"),
+    user=Depends(verify_token),
+    token: str = Depends(oauth2_scheme)
+):
+    # 토큰은 여기서 한 번 검증하고 그대로 각 백엔드에 전달. 모든 백엔드를 동시에 호출하므로 응답 시간은 가장 느린 백엔드(최대 timeout) 기준
+    names = selected_sections(sections, list(BACKENDS))
+    started = time.perf_counter()
+    results = await asyncio.gather(*(fetch_section(name, token) for name in names))
+    return {
+        "sections": dict(zip(names, results)),
+        "partial": any(result["status"] != "ok" for result in results),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+@app.get("/api/search")
+async def search(
+    q: str = None,
+    tag: List[str] = Query([]),
+    sections: str = Query(None, description="쉼표로 구분한 서비스 (기본: s3,ec2,rds,lambda)"),
+    limit: int = Query(100, ge=1, le=1000),
+    user=Depends(verify_token),
+    token: str = Depends(oauth2_scheme)
+):
+    # 각 서비스가 백그라운드로 만들어둔 인벤토리 색인을 동시에 검색해서 합침. 요청 경로에서 AWS는 부르지 않음
+    names = selected_sections(sections, SEARCHABLE)
+    params = {"tag": tag, "limit": limit}
+    if q:
+        params["q"] = q
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(fetch_section(name, token, BACKENDS[name]["search_path"], params) for name in names)
+    )
+    matches = []
+    summary = {}
+    for name, section in zip(names, results):
+        data = section.pop("data", None)
+        if data is not None:
+            matches.extend(data["results"])
+            section.update(total=data["total"], indexed_at=data["indexed_at"])
+        summary[name] = section
+    matches.sort(key=lambda doc: (str(doc.get("name") or ""), doc["id"]))
+    return {
+        "total": sum(section.get("total", 0) for section in summary.values()),
+        "results": matches[:limit],
+        "sections": summary,
+        "partial": any(section["status"] != "ok" for section in summary.values()),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+    }
+
+
+@app.on_event("startup")
+async def start_background_tasks():
+    global client
+    client = build_client()
+    verifier.start()
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    await client.aclose()
+    await verifier.stop()
+
+
+@app.get("/health")
+async def health_check():
+    return {
+        "status": "healthy",
+        "service": "gateway-service",
+        "timestamp": datetime.utcnow().isoformat(),
+        "backends": {
+            name: {"url": config["url"], "timeout_seconds": config["timeout"], **backend_stats[name]}
+            for name, config in BACKENDS.items()
+        },
+        "auth": verifier.stats()
+    }
+
+
+@app.get("/")
+async def root():
+    return {"message": "Gateway Service", "version": "1.0.0"}
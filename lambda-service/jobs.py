@@ -0,0 +1,133 @@
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+LAMBDA_FUNCTION_CONCURRENCY = int(os.getenv("LAMBDA_FUNCTION_CONCURRENCY", "10"))
+LAMBDA_MAX_QUEUED = int(os.getenv("LAMBDA_MAX_QUEUED", "10000"))
+JOB_RETENTION = int(os.getenv("JOB_RETENTION", "1000"))
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, function_name, payload):
+        self.id = uuid.uuid4().hex
+        self.function_name = function_name
+        self.payload = payload
+        self.status = "queued"
+        self.created_at = datetime.utcnow().isoformat()
+        self.started_at = None
+        self.finished_at = None
+        self.duration_ms = None
+        self.status_code = None
+        self.result = None
+        self.function_error = None
+        self.error = None
+        self.done = asyncio.Event()
+        # 상태가 바뀔 때마다 set되고 새 Event로 교체됨 (SSE 스트림이 폴링 없이 기다림)
+        self.changed = asyncio.Event()
+
+    def set_status(self, status):
+        self.status = status
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "function_name": self.function_name,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration_ms": self.duration_ms,
+            "status_code": self.status_code,
+            "result": self.result,
+            "function_error": self.function_error,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """비동기 Lambda 호출 작업 관리. 함수별 동시 실행 수를 제한하고 완료된 작업은 최근 JOB_RETENTION개만 보관"""
+
+    def __init__(self, invoke, function_concurrency=LAMBDA_FUNCTION_CONCURRENCY,
+                 max_queued=LAMBDA_MAX_QUEUED, retention=JOB_RETENTION):
+        # invoke(function_name, payload) -> (status_code, result, function_error) 코루틴
+        self.invoke = invoke
+        self.function_concurrency = function_concurrency
+        self.max_queued = max_queued
+        self.retention = retention
+        self.jobs = OrderedDict()
+        self._function_slots = {}
+        self._tasks = set()
+        self.pending = 0
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+
+    def submit(self, function_name, payload):
+        if self.pending >= self.max_queued:
+            raise QueueFull(f"{self.pending} jobs pending")
+        job = Job(function_name, payload)
+        self.jobs[job.id] = job
+        self.pending += 1
+        self.submitted += 1
+        task = asyncio.create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        self._trim()
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    async def _run(self, job):
+        slots = self._function_slots.setdefault(
+            job.function_name, asyncio.Semaphore(self.function_concurrency)
+        )
+        try:
+            async with slots:
+                job.set_status("running")
+                job.started_at = datetime.utcnow().isoformat()
+                started = time.perf_counter()
+                try:
+                    job.status_code, job.result, job.function_error = await self.invoke(job.function_name, job.payload)
+                    job.set_status("failed" if job.function_error else "succeeded")
+                except Exception as e:
+                    job.error = str(e)
+                    job.set_status("failed")
+                job.duration_ms = round((time.perf_counter() - started) * 1000, 2)
+        finally:
+            self.pending -= 1
+            job.payload = None
+            job.finished_at = datetime.utcnow().isoformat()
+            if job.status == "succeeded":
+                self.succeeded += 1
+            else:
+                self.failed += 1
+            job.done.set()
+            job.changed.set()
+
+    def _trim(self):
+        # 오래된 완료 작업부터 정리 (진행 중인 작업은 보관 개수와 관계없이 유지)
+        excess = len(self.jobs) - self.retention
+        if excess <= 0:
+            return
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.done.is_set()][:excess]:
+            del self.jobs[job_id]
+
+    def stats(self):
+        return {
+            "pending": self.pending,
+            "submitted": self.submitted,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retained": len(self.jobs),
+            "function_concurrency": self.function_concurrency,
+        }
@@ -0,0 +1,187 @@
+import asyncio
+import json
+import os
+from collections import deque
+
+# 같은 로그 스트림을 보는 구독자들은 업스트림 폴러 하나를 공유하고, 폴러가 받은 이벤트를 각 구독자 큐로 나눠줌
+TAIL_POLL_INTERVAL = float(os.getenv("TAIL_POLL_INTERVAL", "2"))
+TAIL_BACKFILL = int(os.getenv("TAIL_BACKFILL", "100"))
+TAIL_SUBSCRIBER_BUFFER = int(os.getenv("TAIL_SUBSCRIBER_BUFFER", "1000"))
+TAIL_MAX_BACKOFF = 30.0
+KEEPALIVE_SECONDS = 15
+
+
+class Subscriber:
+    def __init__(self, tail, buffer):
+        self.tail = tail
+        self.queue = asyncio.Queue(maxsize=buffer)
+        self.dropped = False
+
+    def push(self, item):
+        if self.dropped:
+            return False
+        try:
+            self.queue.put_nowait(item)
+            return True
+        except asyncio.QueueFull:
+            # 못 따라오는 구독자는 밀린 이벤트를 버리고 끊음 (폴러와 다른 구독자는 기다리지 않음)
+            self.dropped = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(("dropped", {"reason": f"More than {self.queue.maxsize} events behind"}))
+            return False
+
+
+class LogTail:
+    def __init__(self, hub, log_group, log_stream):
+        self.hub = hub
+        self.log_group = log_group
+        self.log_stream = log_stream
+        self.recent = deque(maxlen=hub.backfill)
+        self.subscribers = set()
+        self.refs = 0
+        self.ready = asyncio.Event()
+        self.error = None
+        self.polls = 0
+        self.events = 0
+        self.task = asyncio.create_task(self._poll())
+        self.task.add_done_callback(self._finished)
+
+    async def _poll(self):
+        token = None
+        failures = 0
+        while True:
+            params = {"logGroupName": self.log_group, "logStreamName": self.log_stream}
+            if token is None:
+                # 처음에는 최근 이벤트 backfill개, 이후에는 nextForwardToken으로 이어서 읽음
+                params.update(startFromHead=False, limit=self.hub.backfill)
+            else:
+                params.update(startFromHead=True, nextToken=token)
+            try:
+                response = await self.hub.aws.call(self.hub.logs_client.get_log_events, **params)
+            except Exception as e:
+                # ClientError뿐 아니라 재시도 후에도 남은 연결 오류/timeout도 같은 경로로 처리
+                if not self.ready.is_set():
+                    # 첫 조회 실패는 구독 요청에 바로 에러로 돌려줌
+                    self.error = e
+                    self.ready.set()
+                    return
+                failures += 1
+                self._broadcast(("error", {"error": str(e) or type(e).__name__}))
+                await asyncio.sleep(min(self.hub.interval * 2 ** failures, TAIL_MAX_BACKOFF))
+                continue
+            failures = 0
+            self.polls += 1
+            for event in response['events']:
+                event = {"timestamp": event['timestamp'], "message": event['message']}
+                self.recent.append(event)
+                self.events += 1
+                self._broadcast(("log", event))
+            self.ready.set()
+            next_token = response['nextForwardToken']
+            # 새 이벤트가 없으면 같은 토큰이 돌아오므로 그때만 쉬고, 밀린 이벤트가 있으면 바로 다음 조회
+            if next_token == token or not response['events']:
+                await asyncio.sleep(self.hub.interval)
+            token = next_token
+
+    def _finished(self, task):
+        # 폴러가 어떤 이유로든 끝나면 허브에서 빼서 다음 구독 때 새 폴러를 띄움
+        key = (self.log_group, self.log_stream)
+        if self.hub.tails.get(key) is self:
+            del self.hub.tails[key]
+        if task.cancelled() or task.exception() is None:
+            return
+        # 예상하지 못한 예외로 끝난 경우: 기다리는 구독 요청은 에러로, 이미 붙은 구독자는 closed 이벤트로 끝냄
+        error = task.exception()
+        if not self.ready.is_set():
+            self.error = error
+            self.ready.set()
+        self._broadcast(("closed", {"error": str(error) or type(error).__name__}))
+
+    def _broadcast(self, item):
+        for subscriber in list(self.subscribers):
+            if not subscriber.push(item):
+                self.subscribers.discard(subscriber)
+                self.hub.dropped += 1
+
+
+class LogTailHub:
+    """(로그 그룹, 스트림)별 라이브 테일 폴러 관리. 마지막 구독자가 나가면 폴러도 정리함"""
+
+    def __init__(self, aws, logs_client, interval=TAIL_POLL_INTERVAL, backfill=TAIL_BACKFILL,
+                 buffer=TAIL_SUBSCRIBER_BUFFER):
+        self.aws = aws
+        self.logs_client = logs_client
+        self.interval = interval
+        self.backfill = backfill
+        self.buffer = buffer
+        self.tails = {}
+        self.subscribed = 0
+        self.dropped = 0
+
+    async def subscribe(self, log_group, log_stream):
+        key = (log_group, log_stream)
+        tail = self.tails.get(key)
+        if tail is None:
+            tail = self.tails[key] = LogTail(self, log_group, log_stream)
+        tail.refs += 1
+        subscriber = Subscriber(tail, self.buffer)
+        try:
+            await tail.ready.wait()
+        except asyncio.CancelledError:
+            self.unsubscribe(subscriber)
+            raise
+        if tail.error is not None:
+            self.unsubscribe(subscriber)
+            raise tail.error
+        # await 없이 최근 이벤트 복사와 구독 등록을 같이 해서 중복/누락이 없도록 함
+        for event in tail.recent:
+            subscriber.push(("log", event))
+        self.subscribed += 1
+        if subscriber.dropped:
+            self.dropped += 1
+        else:
+            tail.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        tail = subscriber.tail
+        tail.subscribers.discard(subscriber)
+        tail.refs -= 1
+        if tail.refs == 0:
+            tail.task.cancel()
+            if self.tails.get((tail.log_group, tail.log_stream)) is tail:
+                del self.tails[(tail.log_group, tail.log_stream)]
+
+    async def stream(self, log_group, log_stream):
+        # 첫 조회까지 기다린 뒤 SSE 생성기를 돌려줌 (첫 조회 실패는 여기서 에러로 올라옴)
+        events = self._events(log_group, log_stream)
+        await events.__anext__()
+        return events
+
+    async def _events(self, log_group, log_stream):
+        # SSE: 로그 이벤트는 log, 업스트림 에러는 error, 느려서 끊긴 경우 dropped, 폴러가 죽은 경우 closed 이벤트 후 종료
+        # 구독을 생성기 안에서 하므로 응답이 시작되지 않고 버려져도 생성기가 정리될 때 구독이 해제됨
+        subscriber = await self.subscribe(log_group, log_stream)
+        try:
+            yield None
+            while True:
+                try:
+                    kind, data = await asyncio.wait_for(subscriber.queue.get(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {kind}\ndata: {json.dumps(data, default=str)}\n\n"
+                if kind in ("dropped", "closed"):
+                    return
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self):
+        return {
+            "tails": len(self.tails),
+            "subscribers": sum(len(tail.subscribers) for tail in self.tails.values()),
+            "subscribed": self.subscribed,
+            "dropped": self.dropped,
+            "polls": sum(tail.polls for tail in self.tails.values()),
+        }
@@ -1,13 +1,23 @@
-from fastapi import FastAPI, Depends, HTTPException
-from fastapi.security import OAuth2PasswordBearer
+from fastapi import FastAPI, Depends, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-import boto3
 import json
 from botocore.exceptions import ClientError
 from datetime import datetime
-import jwt
+from typing import List
+import asyncio
+import random
 import os
+import tempfile
+
+from auth import verifier, verify_token
+from aws_client import AWSCallLayer, aws_clients, aws_error, is_throttling
+from cache import TTLCache
+from inventory import INVENTORY_SEARCH_LIMIT, InventoryIndex, search_response
+from jobs import JobManager, QueueFull
+from log_tail import LogTailHub
+from telemetry import instrument
 
 app = FastAPI(title="Lambda Service")
 
@@ -22,52 +32,43 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
-ALGORITHM = "HS256"
-AWS_REGION = os.getenv("AWS_DEFAULT_REGION", "ap-northeast-2")
+# 라우트별 응답 시간, AWS 호출, 이벤트 루프 지연을 `/metrics`로 노출
+instrument(app)
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="http://auth-service:8000/api/auth/login")
+AWS_REGION = os.getenv("AWS_DEFAULT_REGION", "ap-northeast-2")
+FUNCTIONS_CACHE_TTL = float(os.getenv("FUNCTIONS_CACHE_TTL", "60"))
+# Lambda 호출 전용 동시 실행 수. 오래 걸리는 호출이 목록/로그 조회용 스레드를 점유하지 않도록 따로 둠
+LAMBDA_MAX_INFLIGHT = int(os.getenv("LAMBDA_MAX_INFLIGHT", "64"))
+# 최대 15분짜리 함수의 동기 응답을 기다릴 수 있도록 읽기 타임아웃을 늘림
+LAMBDA_READ_TIMEOUT = int(os.getenv("LAMBDA_READ_TIMEOUT", "900"))
+BATCH_INVOKE_CONCURRENCY = int(os.getenv("BATCH_INVOKE_CONCURRENCY", "16"))
+BATCH_MAX_RETRIES = int(os.getenv("BATCH_MAX_RETRIES", "5"))
+BATCH_SPOOL_BYTES = int(os.getenv("BATCH_SPOOL_KB", "1024")) * 1024
+# Invoke는 목록/로그 조회 API보다 호출 한도가 훨씬 높으므로 따로 둠
+LAMBDA_INVOKE_RATE_LIMIT = float(os.getenv("LAMBDA_INVOKE_RATE_LIMIT", "500"))
 
-# boto3 클라이언트 생성
-aws_access_key = os.getenv("AWS_ACCESS_KEY_ID")
-aws_secret_key = os.getenv("AWS_SECRET_ACCESS_KEY")
+# boto3 클라이언트는 처음 쓸 때(또는 시작 직후 워밍업에서) 공유 세션으로 만듦
+lambda_client = aws_clients.lazy(
+    'lambda', AWS_REGION, read_timeout=LAMBDA_READ_TIMEOUT, max_pool_connections=LAMBDA_MAX_INFLIGHT
+)
+logs_client = aws_clients.lazy('logs', AWS_REGION)
 
-if aws_access_key and aws_secret_key:
-    lambda_client = boto3.client(
-        'lambda',
-        region_name=AWS_REGION,
-        aws_access_key_id=aws_access_key,
-        aws_secret_access_key=aws_secret_key
-    )
-    logs_client = boto3.client(
-        'logs',
-        region_name=AWS_REGION,
-        aws_access_key_id=aws_access_key,
-        aws_secret_access_key=aws_secret_key
-    )
-else:
-    lambda_client = boto3.client('lambda', region_name=AWS_REGION)
-    logs_client = boto3.client('logs', region_name=AWS_REGION)
+aws = AWSCallLayer("lambda")
+# Invoke는 멱등이 아니므로 호출 계층에서 재시도하지 않음 (스로틀링 재시도는 일괄 호출에서만)
+invoke_layer = AWSCallLayer(
+    "lambda-invoke", max_concurrency=LAMBDA_MAX_INFLIGHT, rate_limit=LAMBDA_INVOKE_RATE_LIMIT, max_retries=0
+)
+cache = TTLCache("lambda")
 
 
 class InvokeRequest(BaseModel):
     payload: dict
 
 
-def verify_token(token: str = Depends(oauth2_scheme)):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-
 @app.get("/api/lambda/functions")
 async def list_functions(user=Depends(verify_token)):
-    try:
-        response = lambda_client.list_functions()
+    async def load():
+        response = await aws.call(lambda_client.list_functions)
         functions = []
         for func in response['Functions']:
             functions.append({
@@ -76,32 +77,226 @@ async def list_functions(user=Depends(verify_token)):
                 "last_modified": func['LastModified']
             })
         return {"functions": functions}
+
+    try:
+        return await cache.get("list_functions", load, ttl=FUNCTIONS_CACHE_TTL)
     except ClientError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise aws_error(e)
+
+
+async def run_invoke(function_name, payload):
+    # Invoke API는 호출 한도(LAMBDA_INVOKE_RATE_LIMIT)를 거치고, 회로 차단은 함수별로 따로 둠
+    # (한 함수의 장애가 다른 함수 호출까지 막지 않도록). 응답 본문 읽기는 API 호출이 아니므로 제한 없이 따로 실행
+    response = await invoke_layer.call_scoped(
+        function_name,
+        lambda_client.invoke,
+        FunctionName=function_name,
+        InvocationType='RequestResponse',
+        Payload=json.dumps(payload)
+    )
+    body = await invoke_layer.call(response['Payload'].read)
+    return response['StatusCode'], json.loads(body) if body else None, response.get('FunctionError')
+
+
+jobs = JobManager(run_invoke)
+tails = LogTailHub(aws, logs_client)
 
 
 @app.post("/api/lambda/functions/{function_name}/invoke")
-async def invoke_function(function_name: str, request: InvokeRequest, user=Depends(verify_token)):
+async def invoke_function(
+    function_name: str,
+    request: InvokeRequest,
+    mode: str = Query("sync", pattern="^(sync|async|event)$"),
+    user=Depends(verify_token)
+):
+    # sync: 결과까지 기다림 / async: 작업 ID를 바로 돌려주고 백그라운드에서 실행 / event: Lambda 비동기 호출(fire-and-forget)
+    if mode == "async":
+        try:
+            job = jobs.submit(function_name, request.payload)
+        except QueueFull as e:
+            raise HTTPException(status_code=429, detail=str(e))
+        return JSONResponse(status_code=202, content={
+            "job_id": job.id,
+            "status": job.status,
+            "poll_url": f"/api/lambda/jobs/{job.id}",
+            "events_url": f"/api/lambda/jobs/{job.id}/events"
+        })
+
     try:
-        response = lambda_client.invoke(
-            FunctionName=function_name,
-            InvocationType='RequestResponse',
-            Payload=json.dumps(request.payload)
-        )
-        result = json.loads(response['Payload'].read())
+        if mode == "event":
+            response = await invoke_layer.call_scoped(
+                function_name,
+                lambda_client.invoke,
+                FunctionName=function_name,
+                InvocationType='Event',
+                Payload=json.dumps(request.payload)
+            )
+            return {
+                "status_code": response['StatusCode'],
+                "request_id": response['ResponseMetadata'].get('RequestId')
+            }
+
+        status_code, result, _ = await run_invoke(function_name, request.payload)
         return {
-            "status_code": response['StatusCode'],
+            "status_code": status_code,
             "result": result
         }
     except ClientError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise aws_error(e)
+
+
+async def invoke_with_retry(function_name, payload):
+    # 스로틀링 에러는 지수 백오프 + 지터로 재시도, 그 외 에러는 바로 실패 처리
+    for attempt in range(1, BATCH_MAX_RETRIES + 2):
+        try:
+            status_code, result, function_error = await run_invoke(function_name, payload)
+            return {"status_code": status_code, "result": result, "function_error": function_error, "attempts": attempt}
+        except ClientError as e:
+            if not is_throttling(e) or attempt > BATCH_MAX_RETRIES:
+                return {"error": str(e), "attempts": attempt}
+            await asyncio.sleep(random.uniform(0, min(20.0, 0.1 * 2 ** attempt)))
+        except Exception as e:
+            # 연결 실패, 읽기 타임아웃, 회로 차단 등도 해당 payload만 실패로 기록하고 다음 payload를 계속 처리
+            return {"error": str(e) or type(e).__name__, "attempts": attempt}
+
+
+async def json_payloads(payloads):
+    for payload in payloads:
+        yield payload
+
+
+async def spool_body(request):
+    # StreamingResponse가 연결 종료 감지를 위해 receive를 읽으므로 응답 전에 본문을 다 받아둠
+    # 큰 본문은 디스크로 넘겨서 메모리는 BATCH_SPOOL_BYTES 이내
+    spool = tempfile.SpooledTemporaryFile(max_size=BATCH_SPOOL_BYTES)
+    async for chunk in request.stream():
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+
+async def ndjson_payloads(spool):
+    # 한 줄에 payload 하나, 줄 단위로 읽어서 바로 워커에 넘김
+    try:
+        for line in spool:
+            if line.strip():
+                yield json.loads(line)
+    finally:
+        spool.close()
+
+
+async def fan_out(function_name, payloads, concurrency):
+    # 워커 concurrency개가 입력 큐에서 payload를 꺼내 호출하고, 끝나는 순서대로 결과를 NDJSON으로 내보냄
+    inputs = asyncio.Queue(maxsize=concurrency * 2)
+    results = asyncio.Queue()
+
+    async def produce():
+        index = 0
+        try:
+            async for payload in payloads:
+                await inputs.put((index, payload))
+                index += 1
+        except ValueError as e:
+            await results.put({"index": index, "error": f"Invalid payload: {e}"})
+        finally:
+            for _ in range(concurrency):
+                await inputs.put(None)
+
+    async def work():
+        # 워커가 어떻게 끝나든 종료 표시를 넣어야 결과 스트림이 끝남
+        try:
+            while True:
+                item = await inputs.get()
+                if item is None:
+                    break
+                index, payload = item
+                await results.put({"index": index, **await invoke_with_retry(function_name, payload)})
+        finally:
+            results.put_nowait(None)
+
+    tasks = [asyncio.create_task(produce())] + [asyncio.create_task(work()) for _ in range(concurrency)]
+    try:
+        remaining = concurrency
+        while remaining:
+            result = await results.get()
+            if result is None:
+                remaining -= 1
+                continue
+            yield json.dumps(result, default=str) + "\n"
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class BatchInvokeRequest(BaseModel):
+    payloads: list
+
+
+@app.post("/api/lambda/functions/{function_name}/batch-invoke")
+async def batch_invoke(
+    function_name: str,
+    request: Request,
+    concurrency: int = Query(BATCH_INVOKE_CONCURRENCY, ge=1, le=LAMBDA_MAX_INFLIGHT),
+    user=Depends(verify_token)
+):
+    # 본문은 {"payloads": [...]} JSON 또는 한 줄에 payload 하나인 NDJSON (Content-Type: application/x-ndjson)
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        payloads = ndjson_payloads(await spool_body(request))
+    else:
+        try:
+            payloads = json_payloads(BatchInvokeRequest(**await request.json()).payloads)
+        except (ValueError, TypeError) as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    return StreamingResponse(fan_out(function_name, payloads, concurrency), media_type="application/x-ndjson")
+
+
+@app.get("/api/lambda/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = Query(0, ge=0, le=60), user=Depends(verify_token)):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if wait and not job.done.is_set():
+        # 롱 폴링: 완료되거나 wait초가 지날 때까지 기다렸다가 응답
+        try:
+            await asyncio.wait_for(job.done.wait(), wait)
+        except asyncio.TimeoutError:
+            pass
+    return job.to_dict()
+
+
+async def job_events(job):
+    # SSE: 상태가 바뀔 때마다 status 이벤트를 보내고, 완료되면 최종 결과를 result 이벤트로 보냄
+    last_status = None
+    while True:
+        # 상태를 읽기 전에 Event를 잡아둬야 yield 중에 바뀐 상태도 놓치지 않음
+        changed = job.changed
+        if job.done.is_set():
+            break
+        if job.status != last_status:
+            last_status = job.status
+            yield f"event: status\ndata: {json.dumps({'job_id': job.id, 'status': job.status})}\n\n"
+        try:
+            await asyncio.wait_for(changed.wait(), 15)
+        except asyncio.TimeoutError:
+            yield ": keep-alive\n\n"
+    yield f"event: result\ndata: {json.dumps(job.to_dict(), default=str)}\n\n"
+
+
+@app.get("/api/lambda/jobs/{job_id}/events")
+async def stream_job(job_id: str, user=Depends(verify_token)):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return StreamingResponse(job_events(job), media_type="text/event-stream")
 
 
 @app.get("/api/lambda/functions/{function_name}/logs")
 async def get_logs(function_name: str, user=Depends(verify_token)):
     try:
         log_group_name = f"/aws/lambda/{function_name}"
-        response = logs_client.describe_log_streams(
+        response = await aws.call(
+            logs_client.describe_log_streams,
             logGroupName=log_group_name,
             orderBy='LastEventTime',
             descending=True,
@@ -110,7 +305,8 @@ async def get_logs(function_name: str, user=Depends(verify_token)):
         
         if response['logStreams']:
             log_stream = response['logStreams'][0]['logStreamName']
-            events_response = logs_client.get_log_events(
+            events_response = await aws.call(
+                logs_client.get_log_events,
                 logGroupName=log_group_name,
                 logStreamName=log_stream,
                 limit=50
@@ -119,7 +315,100 @@ async def get_logs(function_name: str, user=Depends(verify_token)):
             return {"logs": logs}
         return {"logs": []}
     except ClientError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise aws_error(e)
+
+
+@app.get("/api/lambda/functions/{function_name}/logs/tail")
+async def tail_logs(function_name: str, log_stream: str = None, user=Depends(verify_token)):
+    # SSE 라이브 테일. log_stream을 생략하면 가장 최근 로그 스트림을 따라감
+    log_group_name = f"/aws/lambda/{function_name}"
+    try:
+        if log_stream is None:
+            response = await aws.call(
+                logs_client.describe_log_streams,
+                logGroupName=log_group_name,
+                orderBy='LastEventTime',
+                descending=True,
+                limit=1
+            )
+            if not response['logStreams']:
+                raise HTTPException(status_code=404, detail="No log streams")
+            log_stream = response['logStreams'][0]['logStreamName']
+    except ClientError as e:
+        raise aws_error(e)
+    try:
+        events = await tails.stream(log_group_name, log_stream)
+    except ClientError as e:
+        raise aws_error(e)
+    except Exception as e:
+        # 첫 조회가 연결 오류/timeout 등으로 실패한 경우
+        raise HTTPException(status_code=500, detail=str(e) or type(e).__name__)
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"X-Log-Stream": log_stream}
+    )
+
+
+async def list_function_summaries():
+    functions = {}
+    params = {}
+    while True:
+        response = await aws.call(lambda_client.list_functions, **params)
+        for func in response['Functions']:
+            functions[func['FunctionName']] = {
+                "id": func['FunctionName'],
+                "name": func['FunctionName'],
+                "arn": func['FunctionArn'],
+                "runtime": func.get('Runtime'),
+                "last_modified": func['LastModified'],
+                "code_sha256": func.get('CodeSha256')
+            }
+        if not response.get('NextMarker'):
+            return functions
+        params["Marker"] = response['NextMarker']
+
+
+async def describe_function(summary):
+    # 태그는 목록 API에 없으므로 새로 생기거나 배포된 함수와 주기적인 전체 갱신 때만 함수별로 조회
+    response = await aws.call(lambda_client.list_tags, Resource=summary["arn"])
+    return {"tags": response.get('Tags', {})}
+
+
+inventory = InventoryIndex("lambda:function", list_function_summaries, describe_function)
+
+
+@app.get("/api/lambda/search")
+async def search_inventory(
+    q: str = None,
+    tag: List[str] = Query([]),
+    limit: int = Query(INVENTORY_SEARCH_LIMIT, ge=1, le=1000),
+    user=Depends(verify_token)
+):
+    # 백그라운드 색인만 읽으므로 AWS를 부르지 않음. q는 단어 접두사, tag는 key 또는 key=value (여러 개면 모두 만족)
+    return search_response(inventory, q, tag, limit)
+
+
+@app.get("/api/lambda/changes")
+async def inventory_changes(since: int = 0, user=Depends(verify_token)):
+    # 이전에 받은 마지막 seq를 since로 넘기면 그 뒤의 생성/삭제/변경 이벤트만 받음
+    return inventory.changes_since(since)
+
+
+@app.on_event("startup")
+async def start_background_tasks():
+    # 로그아웃된 토큰 목록을 auth-service에서 주기적으로 받아옴
+    verifier.start()
+    # boto3 클라이언트 워밍업 (AWS_PRELOAD_CLIENTS)
+    aws_clients.start()
+    inventory.start()
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    await verifier.stop()
+    await inventory.stop()
+    await aws_clients.stop()
 
 
 @app.get("/health")
@@ -127,7 +416,15 @@ async def health_check():
     return {
         "status": "healthy",
         "service": "lambda-service",
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": datetime.utcnow().isoformat(),
+        "aws_calls": aws.stats(),
+        "aws_clients": aws_clients.stats(),
+        "inventory": inventory.stats(),
+        "cache": cache.stats(),
+        "invoke_calls": invoke_layer.stats(),
+        "jobs": jobs.stats(),
+        "log_tails": tails.stats(),
+        "auth": verifier.stats()
     }
 
 
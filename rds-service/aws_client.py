@@ -0,0 +1,420 @@
+import asyncio
+import math
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from botocore.config import Config
+from botocore.exceptions import ClientError, ConnectionError as EndpointUnreachable
+from fastapi import HTTPException
+
+from telemetry import record_aws_call, record_aws_rejected, record_aws_retry
+
+# boto3 호출은 동기 방식이라 async 핸들러에서 직접 부르면 이벤트 루프 전체가 멈춤
+# 서비스별 전용 스레드풀에서 실행하고, 세마포어로 동시 호출 수를 제한
+AWS_MAX_CONCURRENCY = int(os.getenv("AWS_MAX_CONCURRENCY", "32"))
+# API별(리전별) 초당 호출 수와 순간 허용량. 특정 API만 바꾸려면 AWS_RATE_LIMITS="filter_log_events=5,get_metric_data=25"
+AWS_RATE_LIMIT = float(os.getenv("AWS_RATE_LIMIT", "20"))
+AWS_RATE_BURST = float(os.getenv("AWS_RATE_BURST", "20"))
+AWS_RATE_LIMITS = {
+    name.strip(): float(rate)
+    for name, rate in (item.split("=") for item in os.getenv("AWS_RATE_LIMITS", "").split(",") if "=" in item)
+}
+# 스로틀링/일시적 오류 재시도 횟수. 재시도는 여기서만 하고 botocore 자체 재시도는 끔 (스로틀링을 바로 알아야 속도를 줄일 수 있음)
+AWS_MAX_RETRIES = int(os.getenv("AWS_MAX_RETRIES", "3"))
+AWS_MAX_BACKOFF = float(os.getenv("AWS_MAX_BACKOFF", "5"))
+AWS_BREAKER_FAILURES = int(os.getenv("AWS_BREAKER_FAILURES", "5"))
+AWS_BREAKER_RESET_SECONDS = float(os.getenv("AWS_BREAKER_RESET_SECONDS", "30"))
+
+AWS_RETRY_CONFIG = Config(retries={"mode": "standard", "total_max_attempts": 1})
+
+AWS_REGION = os.getenv("AWS_DEFAULT_REGION", "ap-northeast-2")
+# botocore 기본 연결 풀(10개)은 동시 호출 수보다 작아서 넘친 연결은 매번 새로 맺고(TLS 포함) 버려짐
+AWS_MAX_POOL_CONNECTIONS = int(os.getenv("AWS_MAX_POOL_CONNECTIONS", str(AWS_MAX_CONCURRENCY)))
+AWS_TCP_KEEPALIVE = os.getenv("AWS_TCP_KEEPALIVE", "1") != "0"
+# 1이면 시작 직후 백그라운드에서 클라이언트를 미리 만들어서 첫 요청이 생성 비용을 내지 않음 (준비 상태는 기다리지 않음)
+AWS_PRELOAD_CLIENTS = os.getenv("AWS_PRELOAD_CLIENTS", "1") != "0"
+
+THROTTLING_ERRORS = {
+    "Throttling", "ThrottlingException", "ThrottledException", "RequestLimitExceeded", "TooManyRequestsException",
+    "ProvisionedThroughputExceededException", "RequestThrottled", "RequestThrottledException", "SlowDown",
+}
+
+
+class ClientFactory:
+    """프로세스당 boto3 세션 하나를 두고 클라이언트를 (서비스, 리전, 설정)별로 처음 쓸 때 만들어 재사용.
+    boto3 import와 서비스 모델 로드가 모듈 로드(파드 시작) 시간의 대부분이라 실제로 쓸 때까지 미룸"""
+
+    def __init__(self, region=AWS_REGION):
+        self.region = region
+        self._session = None
+        self._clients = {}
+        self._proxies = {}
+        self._regions = {}
+        # 세션/클라이언트 생성은 스레드 안전하지 않고, 스레드풀 안에서도 클라이언트를 처음 쓸 수 있음
+        self._lock = threading.Lock()
+        self._preload_task = None
+        self.create_seconds = 0.0
+        self.preload_error = None
+
+    def _session_locked(self):
+        if self._session is None:
+            import boto3
+
+            access_key = os.getenv("AWS_ACCESS_KEY_ID")
+            secret_key = os.getenv("AWS_SECRET_ACCESS_KEY")
+            if access_key and secret_key:
+                self._session = boto3.session.Session(
+                    aws_access_key_id=access_key, aws_secret_access_key=secret_key, region_name=self.region
+                )
+            else:
+                self._session = boto3.session.Session(region_name=self.region)
+        return self._session
+
+    def _key(self, service, region, options):
+        return service, region or self.region, repr(sorted(options.items()))
+
+    def client(self, service, region=None, **options):
+        # options는 botocore Config 인자 (read_timeout 등). 기본 재시도/연결 풀 설정 위에 덮어씀
+        key = self._key(service, region, options)
+        client = self._clients.get(key)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(key)
+                if client is None:
+                    started = time.perf_counter()
+                    config = Config(
+                        max_pool_connections=AWS_MAX_POOL_CONNECTIONS, tcp_keepalive=AWS_TCP_KEEPALIVE
+                    ).merge(AWS_RETRY_CONFIG).merge(Config(**options))
+                    client = self._session_locked().client(service, region_name=key[1], config=config)
+                    self._clients[key] = client
+                    self.create_seconds += time.perf_counter() - started
+        return client
+
+    def available_regions(self, service):
+        # 요청으로 받은 리전 검증용. 공유 세션의 엔드포인트 데이터(모든 파티션)에서 처음 물어볼 때 한 번만 만듦
+        regions = self._regions.get(service)
+        if regions is None:
+            with self._lock:
+                session = self._session_locked()
+                regions = self._regions[service] = frozenset(
+                    region
+                    for partition in session.get_available_partitions()
+                    for region in session.get_available_regions(service, partition_name=partition)
+                )
+        return regions
+
+    def lazy(self, service, region=None, **options):
+        # 모듈 변수로 둘 대리 객체. 같은 설정이면 같은 객체를 돌려주고, 워밍업 때 만들 목록에도 올라감
+        key = self._key(service, region, options)
+        proxy = self._proxies.get(key)
+        if proxy is None:
+            proxy = self._proxies[key] = LazyClient(self, service, region, options)
+        return proxy
+
+    def preload(self):
+        for proxy in list(self._proxies.values()):
+            proxy.resolve()
+
+    async def _preload(self):
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self.preload)
+        except Exception as e:
+            # 워밍업 실패는 첫 요청에서 다시 시도되므로 기록만 함
+            self.preload_error = str(e) or type(e).__name__
+
+    def start(self):
+        if AWS_PRELOAD_CLIENTS and self._preload_task is None:
+            self._preload_task = asyncio.create_task(self._preload())
+
+    async def stop(self):
+        if self._preload_task is not None:
+            await asyncio.gather(self._preload_task, return_exceptions=True)
+            self._preload_task = None
+
+    def stats(self):
+        return {
+            "max_pool_connections": AWS_MAX_POOL_CONNECTIONS,
+            "clients": [f"{service}/{region}" for service, region, _ in self._clients],
+            "pending": [
+                f"{service}/{region}" for (service, region, _), proxy in self._proxies.items() if proxy._client is None
+            ],
+            "create_ms": round(self.create_seconds * 1000, 1),
+            "preload_error": self.preload_error,
+        }
+
+
+class LazyClient:
+    """처음 속성에 접근할 때 실제 boto3 클라이언트를 만드는 대리 객체.
+    메서드는 실제 클라이언트에 묶인 그대로 돌려주므로 호출 계층이 보는 API 이름과 리전도 같음"""
+
+    def __init__(self, factory, service, region, options):
+        self._factory = factory
+        self._service = service
+        self._region = region
+        self._options = options
+        self._client = None
+
+    def resolve(self):
+        if self._client is None:
+            self._client = self._factory.client(self._service, self._region, **self._options)
+        return self._client
+
+    def __getattr__(self, name):
+        return getattr(self.resolve(), name)
+
+
+aws_clients = ClientFactory()
+
+
+class CircuitOpen(ClientError):
+    # 기존 ClientError 처리 경로를 그대로 타도록 ClientError로 만듦
+    def __init__(self, operation, retry_after):
+        super().__init__(
+            {
+                "Error": {"Code": "CircuitOpen", "Message": f"Upstream is failing, retry after {math.ceil(retry_after)}s"},
+                "ResponseMetadata": {"HTTPStatusCode": 503},
+            },
+            operation
+        )
+        self.retry_after = retry_after
+
+
+def error_code(e):
+    return e.response.get("Error", {}).get("Code") if isinstance(e, ClientError) else None
+
+
+def is_throttling(e):
+    return error_code(e) in THROTTLING_ERRORS
+
+
+def is_degraded(e):
+    # 업스트림 상태 문제로 보는 오류. 4xx 요청 오류(권한, 없는 리소스 등)는 재시도/회로 차단에 반영하지 않음
+    # 요청이 나가지 못한 연결 오류만 포함하고, 읽기 timeout은 이미 실행됐을 수 있으므로 재시도하지 않음
+    if isinstance(e, EndpointUnreachable):
+        return True
+    return isinstance(e, ClientError) and e.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0) >= 500
+
+
+def aws_error(e):
+    # 회로 차단/스로틀링은 잠시 후 다시 시도하면 되는 상태이므로 500 대신 503 + Retry-After
+    if isinstance(e, CircuitOpen):
+        return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))})
+    if is_throttling(e):
+        return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    return HTTPException(status_code=500, detail=str(e))
+
+
+class TokenBucket:
+    """API별 호출 속도 제한. 스로틀링이 나면 속도를 절반으로 줄이고, 성공할 때마다 설정값까지 조금씩 되돌림"""
+
+    def __init__(self, rate, burst):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        # 속도가 줄어든 동안에는 쌓을 수 있는 양도 같은 비율로 줄여서 한 번에 몰리지 않도록 함
+        capacity = max(1.0, self.burst * self.rate / self.max_rate)
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def throttled(self):
+        self._refill()
+        self.rate = max(self.max_rate / 20, self.rate / 2)
+        self.tokens = 0.0
+
+    def succeeded(self):
+        if self.rate < self.max_rate:
+            self._refill()
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class CircuitBreaker:
+    """연속으로 AWS_BREAKER_FAILURES번 실패하면 열어서 AWS를 부르지 않고 바로 실패시키고,
+    AWS_BREAKER_RESET_SECONDS 뒤에는 호출 하나만 시험으로 보내서 성공하면 닫음"""
+
+    def __init__(self, failures=AWS_BREAKER_FAILURES, reset_seconds=AWS_BREAKER_RESET_SECONDS):
+        self.max_failures = failures
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.opened = 0
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if self.probing else "open"
+
+    def check(self, operation):
+        if self.opened_at is None:
+            return
+        remaining = self.opened_at + self.reset_seconds - time.monotonic()
+        if remaining > 0 or self.probing:
+            raise CircuitOpen(operation, max(remaining, 1.0))
+        self.probing = True
+
+    def succeeded(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def failed(self):
+        self.failures += 1
+        if self.probing or self.failures >= self.max_failures:
+            if self.opened_at is None or self.probing:
+                self.opened += 1
+            self.opened_at = time.monotonic()
+            self.probing = False
+
+    def abandoned(self):
+        # 시험 호출이 결과 없이 끝나면(취소, 재시도 대기) 다른 호출이 다시 시험할 수 있도록 함
+        self.probing = False
+
+
+class AWSCallLayer:
+    def __init__(self, service: str, max_concurrency: int = AWS_MAX_CONCURRENCY, rate_limit: float = AWS_RATE_LIMIT,
+                 max_retries: int = AWS_MAX_RETRIES):
+        self.service = service
+        self.max_concurrency = max_concurrency
+        self.rate_limit = rate_limit
+        self.max_retries = max_retries
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency,
+            thread_name_prefix=f"{service}-aws",
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._limiters = {}
+        self._breakers = {}
+        self.in_flight = 0
+        self.queued = 0
+        self.max_queued = 0
+        self.completed = 0
+        self.errors = 0
+        self.retries = 0
+        self.throttled = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+
+    def _limiter(self, key, operation):
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            rate = AWS_RATE_LIMITS.get(operation, self.rate_limit)
+            limiter = self._limiters[key] = TokenBucket(rate, max(1.0, min(AWS_RATE_BURST, rate)))
+        return limiter
+
+    async def call(self, fn, *args, **kwargs):
+        return await self.call_scoped(None, fn, *args, **kwargs)
+
+    async def call_scoped(self, scope, fn, *args, **kwargs):
+        # boto3 클라이언트 메서드 이름이 곧 API 이름 (list_buckets 등)
+        operation = getattr(fn, "__name__", "call")
+        # 호출 한도와 장애는 리전마다 따로이므로 boto3 클라이언트의 리전까지 키에 넣음.
+        # 클라이언트 메서드가 아닌 호출(응답 본문 읽기, 여러 호출을 묶은 함수)은 API 호출 수와 맞지 않으므로 속도 제한 없이 회로 차단만 적용
+        region = getattr(getattr(getattr(fn, "__self__", None), "meta", None), "region_name", None)
+        key = f"{region}/{operation}" if region else operation
+        limiter = self._limiter(key, operation) if region else None
+        # scope(예: Lambda 함수 이름)를 주면 속도 제한은 API 단위로 공유하고 회로 차단만 scope별로 따로 둠
+        breaker = self._breakers.setdefault(f"{key}/{scope}" if scope else key, CircuitBreaker())
+        for attempt in range(self.max_retries + 1):
+            try:
+                breaker.check(operation)
+            except CircuitOpen:
+                self.rejected += 1
+                record_aws_rejected(operation)
+                raise
+            try:
+                if limiter is not None:
+                    await limiter.acquire()
+                response = await self._run(operation, fn, args, kwargs)
+            except Exception as e:
+                if is_throttling(e):
+                    self.throttled += 1
+                    if limiter is not None:
+                        limiter.throttled()
+                if not (is_throttling(e) or is_degraded(e)):
+                    # 요청 자체의 오류(4xx)는 업스트림이 응답했다는 뜻이므로 정상으로 봄
+                    if isinstance(e, ClientError):
+                        breaker.succeeded()
+                    else:
+                        breaker.abandoned()
+                    raise
+                if attempt == self.max_retries:
+                    # 스로틀링은 호출 속도로 대응하고 회로 차단은 업스트림 오류에만 반영
+                    if is_throttling(e):
+                        breaker.abandoned()
+                    else:
+                        breaker.failed()
+                    raise
+                breaker.abandoned()
+                self.retries += 1
+                record_aws_retry(operation)
+                await asyncio.sleep(random.uniform(0, min(AWS_MAX_BACKOFF, 0.1 * 2 ** attempt)))
+                continue
+            except BaseException:
+                breaker.abandoned()
+                raise
+            breaker.succeeded()
+            if limiter is not None:
+                limiter.succeeded()
+            return response
+
+    async def _run(self, operation, fn, args, kwargs):
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+        self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(self._executor, partial(fn, *args, **kwargs))
+            record_aws_call(operation, time.perf_counter() - started, "ok")
+            return response
+        except Exception as e:
+            self.errors += 1
+            record_aws_call(operation, time.perf_counter() - started, "throttled" if is_throttling(e) else "error")
+            raise
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self.total_seconds += time.perf_counter() - started
+            self._semaphore.release()
+
+    def stats(self):
+        return {
+            "service": self.service,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "completed": self.completed,
+            "errors": self.errors,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "rejected": self.rejected,
+            "avg_ms": round(self.total_seconds / self.completed * 1000, 2) if self.completed else 0.0,
+            # 설정보다 느려진 API와 닫혀 있지 않은 회로만 표시
+            "rate_limited": {
+                key: round(limiter.rate, 2) for key, limiter in self._limiters.items() if limiter.rate < limiter.max_rate
+            },
+            "circuits": {key: breaker.state for key, breaker in self._breakers.items() if breaker.state != "closed"},
+        }
@@ -0,0 +1,252 @@
+import asyncio
+import os
+import sqlite3
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+from urllib.parse import urlparse, unquote
+
+# DB 드라이버는 엔진별로 필요할 때만 import (설치되지 않은 드라이버는 해당 엔진 사용 시에만 에러)
+POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "5"))
+POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+POOL_IDLE_SECONDS = float(os.getenv("DB_POOL_IDLE_SECONDS", "300"))
+POOL_ACQUIRE_TIMEOUT = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", "10"))
+STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+DB_EXECUTOR_THREADS = int(os.getenv("DB_EXECUTOR_THREADS", "32"))
+
+# 커넥션은 스레드에서만 사용하므로 DB 작업 전용 스레드풀을 따로 둠 (AWS 호출과 서로 막지 않도록)
+db_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_THREADS, thread_name_prefix="db")
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class DriverNotAvailable(Exception):
+    pass
+
+
+async def run_db(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, partial(fn, *args, **kwargs))
+
+
+class PostgresDriver:
+    def __init__(self, host, port, dbname, user, password, timeout_ms):
+        try:
+            import psycopg2
+        except ImportError:
+            raise DriverNotAvailable("psycopg2 is not installed")
+        self._connect = partial(
+            psycopg2.connect,
+            host=host,
+            port=port,
+            dbname=dbname,
+            user=user,
+            password=password,
+            connect_timeout=10,
+            options=f"-c statement_timeout={timeout_ms}"
+        )
+
+    def connect(self):
+        conn = self._connect()
+        conn.autocommit = True
+        return conn
+
+    def cursor(self, conn, streaming):
+        # 기본 커서는 결과 전체를 클라이언트 메모리로 받아오므로 스트리밍 시 서버 측 커서 사용
+        if streaming:
+            return conn.cursor(name="rds_service_stream", withhold=True)
+        return conn.cursor()
+
+    def before_execute(self, conn):
+        pass
+
+
+class MySQLDriver:
+    def __init__(self, host, port, dbname, user, password, timeout_ms):
+        try:
+            import pymysql
+            import pymysql.cursors
+        except ImportError:
+            raise DriverNotAvailable("PyMySQL is not installed")
+        self._unbuffered_cursor = pymysql.cursors.SSCursor
+        self._connect = partial(
+            pymysql.connect,
+            host=host,
+            port=port,
+            database=dbname,
+            user=user,
+            password=password,
+            connect_timeout=10,
+            autocommit=True,
+            init_command=f"SET SESSION MAX_EXECUTION_TIME={timeout_ms}"
+        )
+
+    def connect(self):
+        return self._connect()
+
+    def cursor(self, conn, streaming):
+        return conn.cursor(self._unbuffered_cursor) if streaming else conn.cursor()
+
+    def before_execute(self, conn):
+        pass
+
+
+class SQLiteDriver:
+    # 로컬 테스트/벤치마크용. statement timeout은 progress handler로 구현
+    def __init__(self, path, timeout_ms):
+        self.path = path
+        self.timeout = timeout_ms / 1000
+
+    def connect(self):
+        return sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+
+    def cursor(self, conn, streaming):
+        return conn.cursor()
+
+    def before_execute(self, conn):
+        deadline = time.monotonic() + self.timeout
+        conn.set_progress_handler(lambda: 1 if time.monotonic() > deadline else 0, 10000)
+
+
+def driver_for(engine, host, port, dbname, user, password, timeout_ms=STATEMENT_TIMEOUT_MS):
+    if "postgres" in engine:
+        return PostgresDriver(host, port or 5432, dbname, user, password, timeout_ms)
+    if "mysql" in engine or "mariadb" in engine:
+        return MySQLDriver(host, port or 3306, dbname, user, password, timeout_ms)
+    if engine == "sqlite":
+        return SQLiteDriver(dbname, timeout_ms)
+    raise DriverNotAvailable(f"Unsupported engine: {engine}")
+
+
+def driver_from_dsn(dsn, timeout_ms=STATEMENT_TIMEOUT_MS):
+    # postgresql://user:pw@host:5432/db, mysql://..., sqlite:///path/to.db
+    url = urlparse(dsn)
+    if url.scheme == "sqlite":
+        return SQLiteDriver(url.path or ":memory:", timeout_ms)
+    return driver_for(
+        url.scheme,
+        url.hostname,
+        url.port,
+        url.path.lstrip("/"),
+        unquote(url.username or ""),
+        unquote(url.password or ""),
+        timeout_ms
+    )
+
+
+class ConnectionPool:
+    """인스턴스별 DB 커넥션 풀. 최대 크기 제한, 유휴 커넥션 정리, 최소 개수 예열을 지원"""
+
+    def __init__(self, name, driver, max_size=POOL_MAX_SIZE, min_size=POOL_MIN_SIZE,
+                 idle_seconds=POOL_IDLE_SECONDS, acquire_timeout=POOL_ACQUIRE_TIMEOUT):
+        self.name = name
+        self.driver = driver
+        self.max_size = max_size
+        self.min_size = min(min_size, max_size)
+        self.idle_seconds = idle_seconds
+        self.acquire_timeout = acquire_timeout
+        self._idle = deque()
+        self._slots = asyncio.Semaphore(max_size)
+        self.size = 0
+        self.in_use = 0
+        self.waiting = 0
+        self.created = 0
+        self.discarded = 0
+        self.evicted = 0
+
+    async def warm_up(self):
+        while self.size < self.min_size:
+            conn = await self._open()
+            self._idle.append((conn, time.monotonic()))
+
+    async def _open(self):
+        self.size += 1
+        try:
+            conn = await run_db(self.driver.connect)
+        except Exception:
+            self.size -= 1
+            raise
+        self.created += 1
+        return conn
+
+    async def _close(self, conn):
+        self.size -= 1
+        try:
+            await run_db(conn.close)
+        except Exception:
+            pass
+
+    @asynccontextmanager
+    async def connection(self):
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.acquire_timeout)
+        except asyncio.TimeoutError:
+            raise PoolTimeout(f"No free connection for {self.name} within {self.acquire_timeout}s")
+        finally:
+            self.waiting -= 1
+
+        conn = None
+        healthy = False
+        try:
+            conn = self._idle.pop()[0] if self._idle else await self._open()
+            self.in_use += 1
+            yield conn
+            healthy = True
+        finally:
+            if conn is not None:
+                self.in_use -= 1
+                # 실행 중 에러가 난 커넥션은 상태를 알 수 없으므로 재사용하지 않음
+                if healthy:
+                    self._idle.append((conn, time.monotonic()))
+                else:
+                    self.discarded += 1
+                    await self._close(conn)
+            self._slots.release()
+
+    async def evict_idle(self):
+        # 가장 오래 쉰 커넥션부터 정리하되 최소 개수는 유지
+        now = time.monotonic()
+        while len(self._idle) > 0 and self.size > self.min_size and now - self._idle[0][1] > self.idle_seconds:
+            conn, _ = self._idle.popleft()
+            self.evicted += 1
+            await self._close(conn)
+
+    async def close(self):
+        while self._idle:
+            conn, _ = self._idle.popleft()
+            await self._close(conn)
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "idle": len(self._idle),
+            "in_use": self.in_use,
+            "waiting": self.waiting,
+            "max_size": self.max_size,
+            "created": self.created,
+            "discarded": self.discarded,
+            "evicted": self.evicted,
+        }
+
+
+def execute(driver, conn, query, streaming=False):
+    cursor = driver.cursor(conn, streaming)
+    driver.before_execute(conn)
+    cursor.execute(query)
+    return cursor
+
+
+def fetch_rows(cursor, size):
+    # 서버 측 커서(psycopg2 named cursor)는 execute 때 DECLARE만 하므로 첫 fetch 이후에야 description이 채워짐
+    # → 이름 있는 커서는 먼저 fetch하고, 일반 커서는 결과가 없는 문장(UPDATE 등)에서 fetch하지 않도록 description 확인
+    if getattr(cursor, "name", None) or cursor.description:
+        rows = cursor.fetchmany(size)
+    else:
+        rows = []
+    columns = [column[0] for column in cursor.description] if cursor.description else []
+    return columns, [dict(zip(columns, row)) for row in rows]
@@ -0,0 +1,105 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+
+PROBE_INTERVAL = float(os.getenv("PROBE_INTERVAL", "30"))
+PROBE_CONCURRENCY = int(os.getenv("PROBE_CONCURRENCY", "20"))
+PROBE_TIMEOUT = float(os.getenv("PROBE_TIMEOUT", "3"))
+
+
+async def tcp_latency(host, port, timeout=PROBE_TIMEOUT):
+    # 스레드 없이 이벤트 루프에서 바로 TCP 연결만 맺고 끊어서 왕복 시간을 잼
+    started = time.perf_counter()
+    _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    latency = (time.perf_counter() - started) * 1000
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return round(latency, 2)
+
+
+class HealthProber:
+    """RDS 인스턴스 상태 테이블. 백그라운드에서 describe 결과와 TCP 연결 지연을 주기적으로 갱신하고
+    API는 이 테이블을 그대로 읽어서 응답함"""
+
+    def __init__(self, describe, interval=PROBE_INTERVAL, concurrency=PROBE_CONCURRENCY):
+        # describe(instance_id=None) -> DBInstances 목록 (코루틴)
+        self.describe = describe
+        self.interval = interval
+        self.concurrency = concurrency
+        self.table = {}
+        self.rounds = 0
+        self.last_round_ms = 0.0
+        self.last_error = None
+
+    def _update(self, db):
+        endpoint = db.get('Endpoint') or {}
+        entry = self.table.setdefault(db['DBInstanceIdentifier'], {})
+        entry.update({
+            "id": db['DBInstanceIdentifier'],
+            "engine": db['Engine'],
+            "status": db['DBInstanceStatus'],
+            "endpoint": endpoint.get('Address'),
+            "port": endpoint.get('Port'),
+        })
+        return entry
+
+    async def _connect(self, entry, semaphore):
+        async with semaphore:
+            try:
+                if not entry["endpoint"]:
+                    raise OSError("No endpoint")
+                entry["tcp_latency_ms"] = await tcp_latency(entry["endpoint"], entry["port"])
+                entry["reachable"] = True
+                entry["error"] = None
+            except (OSError, asyncio.TimeoutError) as e:
+                entry["tcp_latency_ms"] = None
+                entry["reachable"] = False
+                entry["error"] = str(e) or type(e).__name__
+            entry["last_checked"] = datetime.utcnow().isoformat()
+
+    async def probe_all(self):
+        started = time.perf_counter()
+        instances = await self.describe()
+        seen = set()
+        entries = []
+        for db in instances:
+            seen.add(db['DBInstanceIdentifier'])
+            entries.append(self._update(db))
+        # 삭제된 인스턴스는 테이블에서 제거
+        for instance_id in set(self.table) - seen:
+            del self.table[instance_id]
+        semaphore = asyncio.Semaphore(self.concurrency)
+        await asyncio.gather(*(self._connect(entry, semaphore) for entry in entries))
+        self.rounds += 1
+        self.last_round_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    async def probe(self, instance_id):
+        instances = await self.describe(instance_id)
+        if not instances:
+            self.table.pop(instance_id, None)
+            return None
+        entry = self._update(instances[0])
+        await self._connect(entry, asyncio.Semaphore(1))
+        return entry
+
+    async def run(self):
+        while True:
+            try:
+                await self.probe_all()
+                self.last_error = None
+            except Exception as e:
+                # describe 실패 시 기존 테이블은 그대로 두고 다음 주기에 다시 시도
+                self.last_error = str(e)
+            await asyncio.sleep(self.interval)
+
+    def stats(self):
+        return {
+            "instances": len(self.table),
+            "rounds": self.rounds,
+            "last_round_ms": self.last_round_ms,
+            "last_error": self.last_error,
+        }
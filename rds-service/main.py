@@ -1,13 +1,27 @@
-from fastapi import FastAPI, Depends, HTTPException
-from fastapi.security import OAuth2PasswordBearer
+from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-import boto3
 from botocore.exceptions import ClientError
+from contextlib import AsyncExitStack
 from datetime import datetime
-import jwt
+from typing import List
+from starlette.background import BackgroundTask
+import asyncio
+import json
 import os
 
+from auth import verifier, verify_token
+from aws_client import AWSCallLayer, aws_clients, aws_error
+from cache import TTLCache
+from health_prober import HealthProber
+from inventory import INVENTORY_SEARCH_LIMIT, InventoryIndex, search_response
+from db_pool import (
+    ConnectionPool, DriverNotAvailable, PoolTimeout,
+    driver_for, driver_from_dsn, execute, fetch_rows, run_db
+)
+from telemetry import instrument
+
 app = FastAPI(title="RDS Service")
 
 # CORS 설정
@@ -21,45 +35,40 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
-ALGORITHM = "HS256"
+# 라우트별 응답 시간, AWS 호출, 이벤트 루프 지연을 `/metrics`로 노출
+instrument(app)
+
 AWS_REGION = os.getenv("AWS_DEFAULT_REGION", "ap-northeast-2")
+INSTANCES_CACHE_TTL = float(os.getenv("INSTANCES_CACHE_TTL", "30"))
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="http://auth-service:8000/api/auth/login")
+# 쿼리 실행용 DB 접속 정보. RDS_LOCAL_DSN을 주면 모든 인스턴스 대신 해당 DB(로컬 Postgres/SQLite 등)에 연결
+DB_USER = os.getenv("DB_USER", "")
+DB_PASSWORD = os.getenv("DB_PASSWORD", "")
+DB_NAME = os.getenv("DB_NAME", "")
+RDS_LOCAL_DSN = os.getenv("RDS_LOCAL_DSN")
+QUERY_MAX_ROWS = int(os.getenv("QUERY_MAX_ROWS", "1000"))
+QUERY_FETCH_SIZE = int(os.getenv("QUERY_FETCH_SIZE", "500"))
+POOL_EVICT_INTERVAL = float(os.getenv("DB_POOL_EVICT_INTERVAL", "60"))
 
-# boto3 클라이언트 생성
-aws_access_key = os.getenv("AWS_ACCESS_KEY_ID")
-aws_secret_key = os.getenv("AWS_SECRET_ACCESS_KEY")
+# boto3 클라이언트는 처음 쓸 때(또는 시작 직후 워밍업에서) 공유 세션으로 만듦
+rds_client = aws_clients.lazy('rds', AWS_REGION)
 
-if aws_access_key and aws_secret_key:
-    rds_client = boto3.client(
-        'rds',
-        region_name=AWS_REGION,
-        aws_access_key_id=aws_access_key,
-        aws_secret_access_key=aws_secret_key
-    )
-else:
-    rds_client = boto3.client('rds', region_name=AWS_REGION)
+aws = AWSCallLayer("rds")
+cache = TTLCache("rds")
+
+pools = {}
+# 인스턴스별로 진행 중인 풀 생성 작업. 같은 인스턴스의 동시 요청만 하나를 기다리고 다른 인스턴스는 막지 않음
+pool_loads = {}
 
 
 class QueryRequest(BaseModel):
     query: str
 
 
-def verify_token(token: str = Depends(oauth2_scheme)):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-
 @app.get("/api/rds/instances")
 async def list_instances(user=Depends(verify_token)):
-    try:
-        response = rds_client.describe_db_instances()
+    async def load():
+        response = await aws.call(rds_client.describe_db_instances)
         instances = []
         for db in response['DBInstances']:
             instances.append({
@@ -69,29 +78,224 @@ async def list_instances(user=Depends(verify_token)):
                 "endpoint": db.get('Endpoint', {}).get('Address', 'N/A')
             })
         return {"instances": instances}
+
+    try:
+        return await cache.get("describe_db_instances", load, ttl=INSTANCES_CACHE_TTL)
     except ClientError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise aws_error(e)
+
+
+async def describe_instances(instance_id=None):
+    if instance_id:
+        try:
+            response = await aws.call(rds_client.describe_db_instances, DBInstanceIdentifier=instance_id)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') == 'DBInstanceNotFound':
+                return []
+            raise
+        return response['DBInstances']
+
+    instances = []
+    params = {}
+    while True:
+        response = await aws.call(rds_client.describe_db_instances, **params)
+        instances.extend(response['DBInstances'])
+        if not response.get('Marker'):
+            return instances
+        params["Marker"] = response['Marker']
+
+
+prober = HealthProber(describe_instances)
+
+
+def db_summary(db):
+    return {
+        "id": db['DBInstanceIdentifier'],
+        "name": db['DBInstanceIdentifier'],
+        "engine": db['Engine'],
+        "engine_version": db.get('EngineVersion'),
+        "instance_class": db.get('DBInstanceClass'),
+        "status": db['DBInstanceStatus'],
+        "endpoint": (db.get('Endpoint') or {}).get('Address'),
+        "tags": {tag['Key']: tag['Value'] for tag in db.get('TagList', [])}
+    }
+
+
+async def list_db_summaries():
+    # describe_db_instances 응답에 TagList가 있으므로 목록만으로 색인
+    return {db['DBInstanceIdentifier']: db_summary(db) for db in await describe_instances()}
+
+
+inventory = InventoryIndex("rds:db", list_db_summaries)
+
+
+@app.get("/api/rds/instances/status")
+async def get_status_table(user=Depends(verify_token)):
+    return {"instances": list(prober.table.values())}
+
+
+@app.get("/api/rds/search")
+async def search_inventory(
+    q: str = None,
+    tag: List[str] = Query([]),
+    limit: int = Query(INVENTORY_SEARCH_LIMIT, ge=1, le=1000),
+    user=Depends(verify_token)
+):
+    # 백그라운드 색인만 읽으므로 AWS를 부르지 않음. q는 단어 접두사, tag는 key 또는 key=value (여러 개면 모두 만족)
+    return search_response(inventory, q, tag, limit)
+
+
+@app.get("/api/rds/changes")
+async def inventory_changes(since: int = 0, user=Depends(verify_token)):
+    # 이전에 받은 마지막 seq를 since로 넘기면 그 뒤의 생성/삭제/변경 이벤트만 받음
+    return inventory.changes_since(since)
 
 
 @app.post("/api/rds/instances/{instance_id}/test")
-async def test_connection(instance_id: str, user=Depends(verify_token)):
+async def test_connection(instance_id: str, fresh: bool = False, user=Depends(verify_token)):
+    # 백그라운드 프로버가 채워둔 상태 테이블에서 바로 응답. fresh=true이거나 아직 없으면 즉시 확인
+    entry = prober.table.get(instance_id)
+    if fresh or entry is None or "last_checked" not in entry:
+        try:
+            entry = await prober.probe(instance_id)
+        except ClientError as e:
+            raise aws_error(e)
+    if entry is None:
+        return {"status": "error", "message": "Instance not found"}
+    if entry["status"] != 'available':
+        return {"status": "error", "message": "Instance not available", "details": entry}
+    if not entry["reachable"]:
+        return {"status": "error", "message": "Endpoint not reachable", "details": entry}
+    return {"status": "success", "message": "Connection available", "details": entry}
+
+
+async def resolve_driver(instance_id):
+    if RDS_LOCAL_DSN:
+        return driver_from_dsn(RDS_LOCAL_DSN)
+    instances = await describe_instances(instance_id)
+    if not instances:
+        raise HTTPException(status_code=404, detail=f"Instance {instance_id} not found")
+    db = instances[0]
+    endpoint = db.get('Endpoint') or {}
+    if not endpoint.get('Address'):
+        raise DriverNotAvailable(f"Instance {instance_id} has no endpoint yet")
+    return driver_for(
+        db['Engine'],
+        endpoint['Address'],
+        endpoint.get('Port'),
+        DB_NAME or db.get('DBName') or "",
+        DB_USER or db.get('MasterUsername', ""),
+        DB_PASSWORD
+    )
+
+
+async def open_pool(instance_id):
     try:
-        response = rds_client.describe_db_instances(DBInstanceIdentifier=instance_id)
-        if response['DBInstances']:
-            db = response['DBInstances'][0]
-            if db['DBInstanceStatus'] == 'available':
-                return {"status": "success", "message": "Connection available"}
-        return {"status": "error", "message": "Instance not available"}
-    except ClientError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        pool = ConnectionPool(instance_id, await resolve_driver(instance_id))
+        await pool.warm_up()
+        pools[instance_id] = pool
+        return pool
+    finally:
+        del pool_loads[instance_id]
+
+
+async def get_pool(instance_id):
+    pool = pools.get(instance_id)
+    if pool is not None:
+        return pool
+    task = pool_loads.get(instance_id)
+    if task is None:
+        task = pool_loads[instance_id] = asyncio.create_task(open_pool(instance_id))
+        # 기다리던 요청이 모두 취소돼도 실패가 처리되지 않은 예외로 남지 않도록 소비
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    # 요청 하나가 취소돼도 같은 풀을 기다리는 다른 요청에는 영향이 없도록 shield
+    return await asyncio.shield(task)
+
+
+async def evict_idle_connections():
+    while True:
+        await asyncio.sleep(POOL_EVICT_INTERVAL)
+        for pool in list(pools.values()):
+            await pool.evict_idle()
+
+
+@app.on_event("startup")
+async def start_background_tasks():
+    app.state.pool_evictor = asyncio.create_task(evict_idle_connections())
+    app.state.prober = asyncio.create_task(prober.run())
+    verifier.start()
+    aws_clients.start()
+    inventory.start()
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    app.state.pool_evictor.cancel()
+    app.state.prober.cancel()
+    await verifier.stop()
+    await inventory.stop()
+    await aws_clients.stop()
+    for pool in pools.values():
+        await pool.close()
+
+
+async def open_query_stream(pool, query):
+    # 커넥션을 잡고 쿼리를 먼저 실행해서 에러는 HTTP 상태 코드로 돌려주고, 행은 응답 본문에서 나눠 읽음
+    stack = AsyncExitStack()
+    conn = await stack.enter_async_context(pool.connection())
+    try:
+        cursor = await run_db(execute, pool.driver, conn, query, streaming=True)
+    except BaseException as e:
+        await stack.__aexit__(type(e), e, e.__traceback__)
+        raise
+    stack.push_async_callback(run_db, cursor.close)
+
+    async def rows():
+        async with stack:
+            while True:
+                columns, batch = await run_db(fetch_rows, cursor, QUERY_FETCH_SIZE)
+                if not batch:
+                    return
+                for row in batch:
+                    yield json.dumps(row, default=str) + "\n"
+
+    return rows(), stack
 
 
 @app.post("/api/rds/instances/{instance_id}/query")
-async def execute_query(instance_id: str, request: QueryRequest, user=Depends(verify_token)):
-    # 실제 구현에서는 RDS Data API 또는 직접 연결 필요
+async def execute_query(instance_id: str, request: QueryRequest, stream: bool = False, user=Depends(verify_token)):
+    try:
+        pool = await get_pool(instance_id)
+        if stream:
+            rows, stack = await open_query_stream(pool, request.query)
+            # 클라이언트가 본문을 읽기 전에 끊어도 커넥션이 반환되도록 응답 종료 후 한 번 더 정리
+            return StreamingResponse(
+                rows,
+                media_type="application/x-ndjson",
+                background=BackgroundTask(stack.aclose)
+            )
+
+        async with pool.connection() as conn:
+            cursor = await run_db(execute, pool.driver, conn, request.query)
+            columns, rows = await run_db(fetch_rows, cursor, QUERY_MAX_ROWS + 1)
+            await run_db(cursor.close)
+    except HTTPException:
+        raise
+    except ClientError as e:
+        raise aws_error(e)
+    except DriverNotAvailable as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    except PoolTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        # DB 드라이버마다 예외 계층이 달라서 쿼리 실행 에러는 한 번에 처리
+        raise HTTPException(status_code=400, detail=str(e))
+
     return {
         "status": "success",
-        "rows": [{"id": 1, "name": "Sample Data"}],
+        "columns": columns,
+        "rows": rows[:QUERY_MAX_ROWS],
+        "truncated": len(rows) > QUERY_MAX_ROWS,
         "query": request.query
     }
 
@@ -101,7 +305,14 @@ async def health_check():
     return {
         "status": "healthy",
         "service": "rds-service",
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": datetime.utcnow().isoformat(),
+        "aws_calls": aws.stats(),
+        "aws_clients": aws_clients.stats(),
+        "inventory": inventory.stats(),
+        "cache": cache.stats(),
+        "db_pools": {instance_id: pool.stats() for instance_id, pool in pools.items()},
+        "prober": prober.stats(),
+        "auth": verifier.stats()
     }
 
 
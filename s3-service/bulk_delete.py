@@ -0,0 +1,261 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime
+
+# DeleteObjects는 호출 한 번에 최대 1000개 키
+DELETE_BATCH_SIZE = 1000
+DELETE_CONCURRENCY = int(os.getenv("DELETE_CONCURRENCY", "4"))
+DELETE_EVENT_BUFFER = int(os.getenv("DELETE_EVENT_BUFFER", "10000"))
+DELETE_JOB_RETENTION = int(os.getenv("DELETE_JOB_RETENTION", "100"))
+# 키 목록으로 요청할 때 한 번에 받을 수 있는 키 수 (더 많으면 prefix로 지우거나 나눠서 요청)
+DELETE_MAX_KEYS = int(os.getenv("DELETE_MAX_KEYS", "100000"))
+KEEPALIVE_SECONDS = 15
+
+
+class DeleteJob:
+    def __init__(self, bucket, keys=None, prefix=None, start_after=None):
+        self.id = uuid.uuid4().hex
+        self.bucket = bucket
+        self.keys = keys
+        self.prefix = prefix
+        self.start_after = start_after
+        self.status = "queued"
+        self.created_at = datetime.utcnow().isoformat()
+        self.finished_at = None
+        self.duration_ms = None
+        self.listed = 0
+        self.deleted = 0
+        self.failed_keys = 0
+        self.batches = 0
+        # 이 키(prefix 모드) 또는 개수(키 목록 모드)까지는 앞쪽 배치가 모두 끝났으므로 여기서부터 다시 시작하면 됨
+        self.resume_after = start_after
+        self.resume_offset = 0
+        self.error = None
+        self.cancel_requested = False
+        self.seq = 0
+        self.events = deque(maxlen=DELETE_EVENT_BUFFER)
+        self.changed = asyncio.Event()
+        self.done = asyncio.Event()
+        self.task = None
+
+    def emit(self, event, data):
+        self.seq += 1
+        self.events.append((self.seq, event, data))
+        # 기다리는 스트림을 모두 깨우고 다음 이벤트를 위해 새 Event로 바꿈
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "bucket": self.bucket,
+            "prefix": self.prefix,
+            "status": self.status,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "duration_ms": self.duration_ms,
+            "listed": self.listed,
+            "deleted": self.deleted,
+            "failed_keys": self.failed_keys,
+            "batches": self.batches,
+            "resume_after": self.resume_after,
+            "resume_offset": self.resume_offset,
+            "error": self.error,
+        }
+
+
+class DeleteJobManager:
+    """키 목록이나 prefix 아래 객체를 DeleteObjects 배치(1000개)로 나눠 지우는 백그라운드 작업.
+    요청 연결이 끊겨도 작업은 계속되고, 진행 이벤트는 seq 번호로 이어 받을 수 있음"""
+
+    def __init__(self, concurrency=DELETE_CONCURRENCY, retention=DELETE_JOB_RETENTION, on_batch=None):
+        self.concurrency = concurrency
+        self.retention = retention
+        # on_batch(bucket) -> 배치가 끝날 때마다 호출 (목록 캐시 무효화 등)
+        self.on_batch = on_batch
+        self.jobs = OrderedDict()
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+
+    def submit(self, aws, s3_client, bucket, keys=None, prefix=None, start_after=None):
+        job = DeleteJob(bucket, keys=keys, prefix=prefix, start_after=start_after)
+        self.jobs[job.id] = job
+        self.submitted += 1
+        job.task = asyncio.create_task(self._run(job, aws, s3_client))
+        self._trim()
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    async def _key_batches(self, job, aws, s3_client):
+        if job.keys is not None:
+            for start in range(0, len(job.keys), DELETE_BATCH_SIZE):
+                batch = job.keys[start:start + DELETE_BATCH_SIZE]
+                job.listed += len(batch)
+                yield batch
+            return
+        # prefix 아래 키를 1000개씩 페이지로 받아서 그대로 배치로 씀 (전체 목록을 메모리에 모으지 않음)
+        params = {"Bucket": job.bucket, "Prefix": job.prefix, "MaxKeys": DELETE_BATCH_SIZE}
+        if job.start_after:
+            params["StartAfter"] = job.start_after
+        while True:
+            response = await aws.call(s3_client.list_objects_v2, **params)
+            batch = [obj['Key'] for obj in response.get('Contents', [])]
+            if batch:
+                job.listed += len(batch)
+                yield batch
+            if not response.get('IsTruncated'):
+                return
+            params["ContinuationToken"] = response['NextContinuationToken']
+
+    async def _delete_batch(self, job, aws, s3_client, batch):
+        response = await aws.call(
+            s3_client.delete_objects,
+            Bucket=job.bucket,
+            # Quiet 모드에서는 실패한 키만 응답에 들어옴
+            Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True}
+        )
+        errors = [
+            {"key": error.get('Key'), "code": error.get('Code'), "message": error.get('Message')}
+            for error in response.get('Errors', [])
+        ]
+        job.batches += 1
+        job.deleted += len(batch) - len(errors)
+        job.failed_keys += len(errors)
+        if self.on_batch is not None:
+            self.on_batch(job.bucket)
+        return errors
+
+    async def _run(self, job, aws, s3_client):
+        job.status = "running"
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = set()
+        failure = None
+        # 배치는 순서 없이 끝나므로 앞에서부터 연속으로 끝난 배치까지만 재개 위치로 씀
+        finished = set()
+        committed = 0
+        offsets = []
+        last_keys = []
+
+        def commit():
+            nonlocal committed
+            while committed in finished:
+                finished.discard(committed)
+                job.resume_offset = offsets[committed]
+                if job.keys is None:
+                    job.resume_after = last_keys[committed]
+                committed += 1
+
+        async def run_batch(number, batch):
+            nonlocal failure
+            try:
+                errors = await self._delete_batch(job, aws, s3_client, batch)
+            except Exception as e:
+                failure = failure or e
+                return
+            finally:
+                semaphore.release()
+            finished.add(number)
+            commit()
+            job.emit("progress", {"batch": number, "keys": len(batch), "errors": errors, **self._counters(job)})
+
+        try:
+            try:
+                number = 0
+                async for batch in self._key_batches(job, aws, s3_client):
+                    # 동시에 도는 배치 수만큼만 미리 받아두므로 키 목록 메모리는 배치 크기 * (동시 실행 수 + 1) 이내
+                    await semaphore.acquire()
+                    if failure is not None or job.cancel_requested:
+                        semaphore.release()
+                        break
+                    offsets.append((offsets[-1] if offsets else 0) + len(batch))
+                    last_keys.append(batch[-1])
+                    task = asyncio.create_task(run_batch(number, batch))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                    number += 1
+            finally:
+                # 목록 조회가 실패해도 이미 보낸 배치는 끝까지 기다려서 진행 상황을 맞춤 (취소된 경우는 아래에서 정리)
+                if tasks and not asyncio.current_task().cancelling():
+                    await asyncio.gather(*tasks)
+            if failure is not None:
+                raise failure
+            job.status = "cancelled" if job.cancel_requested else "succeeded"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+        except Exception as e:
+            # 배치 전체가 실패하면(권한, 회로 차단 등) 멈추고 resume_after/resume_offset부터 다시 시작할 수 있게 함
+            job.status = "failed"
+            job.error = str(e) or type(e).__name__
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            job.keys = None
+            job.duration_ms = round((time.perf_counter() - started) * 1000, 2)
+            job.finished_at = datetime.utcnow().isoformat()
+            if job.status == "succeeded":
+                self.succeeded += 1
+            elif job.status == "failed":
+                self.failed += 1
+            job.emit("done", job.to_dict())
+            job.done.set()
+
+    @staticmethod
+    def _counters(job):
+        return {
+            "listed": job.listed,
+            "deleted": job.deleted,
+            "failed_keys": job.failed_keys,
+            "resume_after": job.resume_after,
+            "resume_offset": job.resume_offset,
+        }
+
+    async def cancel(self, job):
+        # 새 배치만 멈추고 이미 보낸 배치는 끝까지 기다려서 집계를 맞춤
+        job.cancel_requested = True
+        await job.done.wait()
+
+    async def events(self, job, after=0):
+        # SSE. 각 이벤트의 id가 seq이므로 연결이 끊기면 Last-Event-ID(또는 after)로 이어서 받음
+        yield f"event: status\ndata: {json.dumps(job.to_dict())}\n\n"
+        if job.events and job.events[0][0] > after + 1:
+            yield f"event: truncated\ndata: {json.dumps({'oldest_seq': job.events[0][0]})}\n\n"
+        while True:
+            changed = job.changed
+            for seq, event, data in list(job.events):
+                if seq > after:
+                    after = seq
+                    yield f"id: {seq}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+                    if event == "done":
+                        return
+            if job.done.is_set() and after >= job.seq:
+                return
+            try:
+                await asyncio.wait_for(changed.wait(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+
+    def _trim(self):
+        excess = len(self.jobs) - self.retention
+        if excess <= 0:
+            return
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.done.is_set()][:excess]:
+            del self.jobs[job_id]
+
+    def stats(self):
+        return {
+            "running": sum(not job.done.is_set() for job in self.jobs.values()),
+            "submitted": self.submitted,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retained": len(self.jobs),
+            "concurrency": self.concurrency,
+        }
@@ -0,0 +1,74 @@
+import asyncio
+import re
+
+from botocore.exceptions import ClientError
+
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    # 단일 범위만 지원 (bytes=a-b, bytes=a-, bytes=-n). 여러 범위 요청은 전체 객체로 응답
+    match = RANGE_PATTERN.match(header.strip()) if header else None
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first == "":
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise RangeNotSatisfiable(header)
+    return start, end
+
+
+async def stream_body(aws, body, chunk_size):
+    # StreamingBody.read도 소켓에서 읽는 블로킹 호출이라 스레드풀에서 실행, 메모리는 chunk_size 이내
+    try:
+        while True:
+            chunk = await aws.call(body.read, chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        body.close()
+
+
+async def fetch_range(aws, s3_client, bucket, key, etag, start, end):
+    def read():
+        response = s3_client.get_object(
+            Bucket=bucket,
+            Key=key,
+            Range=f"bytes={start}-{end}",
+            IfMatch=etag
+        )
+        return response['Body'].read()
+    return await aws.call(read)
+
+
+async def stream_parallel(aws, s3_client, bucket, key, etag, start, end, part_size, concurrency):
+    # 범위를 part_size 단위로 나눠 최대 concurrency개를 미리 받아두고 순서대로 내보냄
+    # IfMatch로 ETag를 고정해서 다운로드 도중 객체가 바뀌면 섞이지 않고 실패하도록 함
+    ranges = [(offset, min(offset + part_size, end + 1) - 1) for offset in range(start, end + 1, part_size)]
+    pending = []
+    try:
+        for part_start, part_end in ranges:
+            pending.append(asyncio.create_task(
+                fetch_range(aws, s3_client, bucket, key, etag, part_start, part_end)
+            ))
+            if len(pending) >= concurrency:
+                yield await pending.pop(0)
+        while pending:
+            yield await pending.pop(0)
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+def client_error_status(error: ClientError):
+    return error.response.get('ResponseMetadata', {}).get('HTTPStatusCode')
@@ -0,0 +1,276 @@
+import asyncio
+import bisect
+import os
+import re
+import time
+from collections import deque
+from datetime import datetime
+from itertools import islice
+
+from fastapi import HTTPException
+
+# 리소스 목록을 백그라운드에서 주기적으로 받아 메모리 색인에 반영하고, 검색 요청은 색인만 읽어서 AWS를 부르지 않음
+INVENTORY_ENABLED = os.getenv("INVENTORY_ENABLED", "1") != "0"
+INVENTORY_REFRESH_INTERVAL = float(os.getenv("INVENTORY_REFRESH_INTERVAL", "60"))
+# 목록에서 바뀌지 않은 리소스의 상세 정보(태그 등)는 이 주기(회)마다 한 번만 다시 조회
+INVENTORY_DETAIL_REFRESH_EVERY = int(os.getenv("INVENTORY_DETAIL_REFRESH_EVERY", "10"))
+INVENTORY_CHANGES_BUFFER = int(os.getenv("INVENTORY_CHANGES_BUFFER", "1000"))
+INVENTORY_SEARCH_LIMIT = 100
+
+TOKEN_PATTERN = re.compile(r"[0-9a-z]+")
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(str(text).lower())
+
+
+def document_tokens(doc):
+    # 문자열 필드 값과 태그 키/값을 모두 단어로 나눠 색인 (my-app-prod → my, app, prod)
+    tokens = set()
+    for field, value in doc.items():
+        if field == "tags" or value is None or isinstance(value, (dict, list)):
+            continue
+        tokens.update(tokenize(value))
+    for key, value in doc.get("tags", {}).items():
+        tokens.update(tokenize(key))
+        tokens.update(tokenize(value))
+    return tokens
+
+
+def document_tags(doc):
+    tags = set()
+    for key, value in doc.get("tags", {}).items():
+        tags.add((key.lower(), None))
+        tags.add((key.lower(), str(value).lower()))
+    return tags
+
+
+def sort_key(doc):
+    return str(doc.get("name") or ""), doc["id"]
+
+
+class InventoryIndex:
+    """서비스 리소스 목록의 메모리 역색인과 변경 이벤트 기록.
+
+    list_resources() -> {id: 요약} 는 매 주기 호출하고 (목록 API 몇 번), describe(요약) -> 상세 필드(태그 등)는
+    새로 생기거나 요약이 바뀐 리소스에만 호출해서 주기마다 리소스 수만큼 AWS를 부르지 않음.
+    이전 스냅샷과 비교한 생성/삭제/변경을 순번(seq)이 붙은 이벤트로 남김 (첫 스냅샷은 기준점이라 이벤트 없음)"""
+
+    def __init__(self, kind, list_resources, describe=None, interval=INVENTORY_REFRESH_INTERVAL,
+                 detail_every=INVENTORY_DETAIL_REFRESH_EVERY, buffer=INVENTORY_CHANGES_BUFFER):
+        self.kind = kind
+        self.list_resources = list_resources
+        self.describe = describe
+        self.interval = interval
+        self.detail_every = max(1, detail_every)
+        self.documents = {}
+        self._summaries = {}
+        self._details = {}
+        self._pending_details = set()
+        self._postings = {}
+        self._tag_postings = {}
+        self._vocabulary = []
+        self._vocabulary_dirty = False
+        self._sort_keys = {}
+        self._ordered = []
+        self._ordered_dirty = False
+        self.changes = deque(maxlen=buffer)
+        self.seq = 0
+        self.rounds = 0
+        self.indexed_at = None
+        self.last_round_ms = 0.0
+        self.last_error = None
+        self.detail_calls = 0
+        self.detail_errors = 0
+        self._wake = asyncio.Event()
+        self._task = None
+
+    @property
+    def ready(self):
+        return self.indexed_at is not None
+
+    async def _describe(self, resource_id, summary):
+        self.detail_calls += 1
+        try:
+            self._details[resource_id] = await self.describe(summary)
+            self._pending_details.discard(resource_id)
+        except Exception:
+            # 상세 조회에 실패한 리소스는 이전 상세 정보(없으면 요약만)로 색인하고 다음 주기에 다시 조회
+            self.detail_errors += 1
+            self._pending_details.add(resource_id)
+
+    async def refresh(self):
+        started = time.perf_counter()
+        summaries = await self.list_resources()
+        if self.describe is not None:
+            full = self.rounds % self.detail_every == 0
+            targets = [
+                resource_id for resource_id, summary in summaries.items()
+                if full or resource_id in self._pending_details or self._summaries.get(resource_id) != summary
+            ]
+            await asyncio.gather(*(self._describe(resource_id, summaries[resource_id]) for resource_id in targets))
+        for resource_id in set(self._details) - set(summaries):
+            del self._details[resource_id]
+        self._pending_details &= set(summaries)
+        self._summaries = summaries
+
+        documents = {
+            resource_id: {"kind": self.kind, **summary, **self._details.get(resource_id, {})}
+            for resource_id, summary in summaries.items()
+        }
+        self._apply(documents)
+        self.rounds += 1
+        self.indexed_at = datetime.utcnow()
+        self.last_round_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    def _apply(self, documents):
+        # 바뀐 문서만 색인에서 빼고 다시 넣음
+        baseline = not self.ready
+        at = datetime.utcnow().isoformat()
+        for resource_id in set(self.documents) - set(documents):
+            old = self.documents.pop(resource_id)
+            self._unindex(resource_id, old)
+            self._emit("deleted", old, at)
+        for resource_id, doc in documents.items():
+            old = self.documents.get(resource_id)
+            if old == doc:
+                continue
+            if old is not None:
+                self._unindex(resource_id, old)
+            self.documents[resource_id] = doc
+            self._index(resource_id, doc)
+            if baseline:
+                continue
+            if old is None:
+                self._emit("created", doc, at)
+            else:
+                changed = sorted(field for field in set(old) | set(doc) if old.get(field) != doc.get(field))
+                self._emit("modified", doc, at, changed=changed)
+
+    def _emit(self, change, doc, at, **extra):
+        self.seq += 1
+        self.changes.append({
+            "seq": self.seq, "change": change, "kind": self.kind, "id": doc["id"], "name": doc.get("name"),
+            "at": at, **extra
+        })
+
+    def _index(self, resource_id, doc):
+        self._sort_keys[resource_id] = sort_key(doc)
+        self._ordered_dirty = True
+        for token in document_tokens(doc):
+            ids = self._postings.get(token)
+            if ids is None:
+                ids = self._postings[token] = set()
+                self._vocabulary_dirty = True
+            ids.add(resource_id)
+        for tag in document_tags(doc):
+            self._tag_postings.setdefault(tag, set()).add(resource_id)
+
+    def _unindex(self, resource_id, doc):
+        self._sort_keys.pop(resource_id, None)
+        self._ordered_dirty = True
+        for token in document_tokens(doc):
+            ids = self._postings.get(token)
+            if ids is not None:
+                ids.discard(resource_id)
+                if not ids:
+                    del self._postings[token]
+                    self._vocabulary_dirty = True
+        for tag in document_tags(doc):
+            ids = self._tag_postings.get(tag)
+            if ids is not None:
+                ids.discard(resource_id)
+                if not ids:
+                    del self._tag_postings[tag]
+
+    def _prefix_match(self, prefix):
+        # 정렬된 단어 목록에서 접두사 범위를 이분 탐색 (prod → prod, production ...)
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(self._postings)
+            self._vocabulary_dirty = False
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        end = bisect.bisect_left(self._vocabulary, prefix + "\uffff")
+        if end - start == 1:
+            return self._postings[self._vocabulary[start]]
+        return set().union(*(self._postings[token] for token in self._vocabulary[start:end]))
+
+    def search(self, query=None, tags=(), limit=INVENTORY_SEARCH_LIMIT):
+        # 검색어의 모든 단어(접두사)와 모든 태그 조건(key 또는 key=value)을 만족하는 리소스
+        # 결과가 가장 작은 조건부터 교집합을 구해서 중간 집합을 작게 유지
+        matches = []
+        for tag in tags:
+            key, _, value = tag.partition("=")
+            matches.append(self._tag_postings.get((key.strip().lower(), value.strip().lower() or None), set()))
+        for token in tokenize(query or ""):
+            matches.append(self._prefix_match(token))
+        if matches:
+            matches.sort(key=len)
+            candidates = matches[0].intersection(*matches[1:])
+        else:
+            candidates = self.documents
+        if len(candidates) <= limit * 4:
+            ids = sorted(candidates, key=self._sort_keys.__getitem__)[:limit]
+        else:
+            # 결과가 많으면 미리 정렬해둔 전체 순서를 앞에서부터 훑어 limit개만 고름
+            if self._ordered_dirty:
+                self._ordered = sorted(self._sort_keys, key=self._sort_keys.__getitem__)
+                self._ordered_dirty = False
+            ids = list(islice((resource_id for resource_id in self._ordered if resource_id in candidates), limit))
+        return {"total": len(candidates), "results": [self.documents[resource_id] for resource_id in ids]}
+
+    def changes_since(self, since=0):
+        events = [event for event in self.changes if event["seq"] > since]
+        # 버퍼에서 밀려난 이벤트가 있으면 클라이언트는 전체 목록을 다시 받아야 함
+        truncated = bool(self.changes) and self.changes[0]["seq"] > since + 1
+        return {"seq": self.seq, "truncated": truncated, "changes": events}
+
+    def wake(self):
+        # 리소스를 바꾸는 요청 뒤에 다음 주기를 기다리지 않고 바로 다시 색인
+        self._wake.set()
+
+    async def run(self):
+        while True:
+            # 색인 중에 들어온 wake()는 지우지 않고 끝나자마자 한 번 더 색인
+            self._wake.clear()
+            try:
+                await self.refresh()
+                self.last_error = None
+            except Exception as e:
+                # 목록 조회 실패 시 기존 색인은 그대로 두고 다음 주기에 다시 시도
+                self.last_error = str(e) or type(e).__name__
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if INVENTORY_ENABLED and self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self):
+        return {
+            "resources": len(self.documents),
+            "tokens": len(self._postings),
+            "rounds": self.rounds,
+            "seq": self.seq,
+            "indexed_at": self.indexed_at.isoformat() if self.indexed_at else None,
+            "last_round_ms": self.last_round_ms,
+            "detail_calls": self.detail_calls,
+            "detail_errors": self.detail_errors,
+            "last_error": self.last_error,
+        }
+
+
+def search_response(index, query, tags, limit):
+    # 첫 색인이 끝나기 전에는 빈 결과 대신 503으로 알려서 게이트웨이가 부분 결과로 표시하도록 함
+    if not index.ready:
+        raise HTTPException(
+            status_code=503, detail=index.last_error or "Inventory is not indexed yet", headers={"Retry-After": "5"}
+        )
+    return {**index.search(query, tags, limit), "indexed_at": index.indexed_at.isoformat()}
@@ -1,12 +1,23 @@
-from fastapi import FastAPI, Depends, UploadFile, File, HTTPException
-from fastapi.security import OAuth2PasswordBearer
+from fastapi import FastAPI, Depends, UploadFile, File, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-import boto3
-from botocore.exceptions import ClientError
-from datetime import datetime
-import jwt
+from pydantic import BaseModel
+from botocore.exceptions import BotoCoreError, ClientError
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import List, Optional
+import json
 import os
 
+from auth import verifier, verify_token
+from aws_client import AWSCallLayer, aws_clients, aws_error, error_code
+from bulk_delete import DELETE_MAX_KEYS, DeleteJobManager
+from cache import TTLCache
+from downloads import RangeNotSatisfiable, client_error_status, parse_range, stream_body, stream_parallel
+from inventory import INVENTORY_SEARCH_LIMIT, InventoryIndex, search_response
+from telemetry import instrument
+from uploads import MultipartStreamUpload, contiguous_parts, list_uploaded_parts, MIN_PART_SIZE
+
 app = FastAPI(title="S3 Service")
 
 # CORS 설정
@@ -20,82 +31,402 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
-ALGORITHM = "HS256"
-AWS_REGION = os.getenv("AWS_DEFAULT_REGION", "ap-northeast-2")
-
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="http://auth-service:8000/api/auth/login")
+# 라우트별 응답 시간, AWS 호출, 이벤트 루프 지연을 `/metrics`로 노출
+instrument(app)
 
-# boto3 클라이언트 생성
-aws_access_key = os.getenv("AWS_ACCESS_KEY_ID")
-aws_secret_key = os.getenv("AWS_SECRET_ACCESS_KEY")
-
-if aws_access_key and aws_secret_key:
-    s3_client = boto3.client(
-        's3',
-        region_name=AWS_REGION,
-        aws_access_key_id=aws_access_key,
-        aws_secret_access_key=aws_secret_key
-    )
-else:
-    s3_client = boto3.client('s3', region_name=AWS_REGION)
+AWS_REGION = os.getenv("AWS_DEFAULT_REGION", "ap-northeast-2")
+BUCKETS_CACHE_TTL = float(os.getenv("BUCKETS_CACHE_TTL", "60"))
+OBJECTS_CACHE_TTL = float(os.getenv("OBJECTS_CACHE_TTL", "10"))
+UPLOAD_PART_SIZE_MB = int(os.getenv("UPLOAD_PART_SIZE_MB", "8"))
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "4"))
+DOWNLOAD_CHUNK_SIZE_KB = int(os.getenv("DOWNLOAD_CHUNK_SIZE_KB", "1024"))
+DOWNLOAD_PART_SIZE_MB = int(os.getenv("DOWNLOAD_PART_SIZE_MB", "8"))
+DOWNLOAD_CONCURRENCY = int(os.getenv("DOWNLOAD_CONCURRENCY", "4"))
+# S3 객체 API는 prefix당 초당 수천 건까지 허용되므로 다른 서비스의 기본 한도(AWS_RATE_LIMIT)보다 높게 둠
+S3_RATE_LIMIT = float(os.getenv("S3_RATE_LIMIT", "500"))
 
+# boto3 클라이언트는 처음 쓸 때(또는 시작 직후 워밍업에서) 공유 세션으로 만듦
+s3_client = aws_clients.lazy('s3', AWS_REGION)
 
-def verify_token(token: str = Depends(oauth2_scheme)):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+aws = AWSCallLayer("s3", rate_limit=S3_RATE_LIMIT)
+cache = TTLCache("s3")
 
 
 @app.get("/api/s3/buckets")
 async def list_buckets(user=Depends(verify_token)):
-    try:
-        response = s3_client.list_buckets()
+    async def load():
+        response = await aws.call(s3_client.list_buckets)
         buckets = [bucket['Name'] for bucket in response['Buckets']]
         return {"buckets": buckets}
+
+    try:
+        return await cache.get("list_buckets", load, ttl=BUCKETS_CACHE_TTL)
     except ClientError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise aws_error(e)
+
+
+def object_info(obj):
+    return {
+        "key": obj['Key'],
+        "size": obj['Size'],
+        "last_modified": obj['LastModified'].isoformat()
+    }
+
+
+async def list_objects_page(bucket_name, prefix, delimiter, page_size, continuation_token):
+    params = {"Bucket": bucket_name, "MaxKeys": page_size}
+    if prefix:
+        params["Prefix"] = prefix
+    if delimiter:
+        params["Delimiter"] = delimiter
+    if continuation_token:
+        params["ContinuationToken"] = continuation_token
+    return await aws.call(s3_client.list_objects_v2, **params)
+
+
+async def stream_objects(first_page, bucket_name, prefix, delimiter, page_size):
+    # 페이지 단위로 받아서 바로 내보내므로 버킷 크기와 관계없이 메모리 사용량이 일정함
+    page = first_page
+    while True:
+        for cp in page.get('CommonPrefixes', []):
+            yield json.dumps({"prefix": cp['Prefix']}) + "\n"
+        for obj in page.get('Contents', []):
+            yield json.dumps(object_info(obj)) + "\n"
+        token = page.get('NextContinuationToken')
+        if not page.get('IsTruncated') or not token:
+            return
+        try:
+            page = await list_objects_page(bucket_name, prefix, delimiter, page_size, token)
+        except ClientError as e:
+            # 스트리밍이 시작된 뒤에는 상태 코드를 바꿀 수 없으므로 마지막 줄에 에러와 재개 토큰을 남김
+            yield json.dumps({"error": str(e), "continuation_token": token}) + "\n"
+            return
 
 
 @app.get("/api/s3/buckets/{bucket_name}/objects")
-async def list_objects(bucket_name: str, user=Depends(verify_token)):
+async def list_objects(
+    bucket_name: str,
+    prefix: str = "",
+    delimiter: str = "",
+    page_size: int = Query(1000, ge=1, le=1000),
+    continuation_token: str = None,
+    stream: bool = False,
+    user=Depends(verify_token)
+):
+    if stream:
+        try:
+            response = await list_objects_page(bucket_name, prefix, delimiter, page_size, continuation_token)
+        except ClientError as e:
+            raise aws_error(e)
+        return StreamingResponse(
+            stream_objects(response, bucket_name, prefix, delimiter, page_size),
+            media_type="application/x-ndjson"
+        )
+
+    async def load():
+        response = await list_objects_page(bucket_name, prefix, delimiter, page_size, continuation_token)
+        return {
+            "objects": [object_info(obj) for obj in response.get('Contents', [])],
+            "common_prefixes": [cp['Prefix'] for cp in response.get('CommonPrefixes', [])],
+            "next_continuation_token": response.get('NextContinuationToken') if response.get('IsTruncated') else None
+        }
+
     try:
-        response = s3_client.list_objects_v2(Bucket=bucket_name)
-        objects = []
-        if 'Contents' in response:
-            objects = [
-                {
-                    "key": obj['Key'],
-                    "size": obj['Size'],
-                    "last_modified": obj['LastModified'].isoformat()
-                }
-                for obj in response['Contents']
-            ]
-        return {"objects": objects}
+        return await cache.get(
+            "list_objects_v2",
+            load,
+            ttl=OBJECTS_CACHE_TTL,
+            bucket=bucket_name,
+            prefix=prefix,
+            delimiter=delimiter,
+            page_size=page_size,
+            continuation_token=continuation_token
+        )
     except ClientError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise aws_error(e)
 
 
 @app.post("/api/s3/buckets/{bucket_name}/upload")
 async def upload_file(bucket_name: str, file: UploadFile = File(...), user=Depends(verify_token)):
     try:
-        s3_client.upload_fileobj(file.file, bucket_name, file.filename)
+        await aws.call(s3_client.upload_fileobj, file.file, bucket_name, file.filename)
+        cache.invalidate("list_objects_v2", bucket=bucket_name)
         return {"message": "File uploaded successfully", "key": file.filename}
     except ClientError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise aws_error(e)
+
+
+@app.put("/api/s3/buckets/{bucket_name}/multipart/{object_key:path}")
+async def stream_upload(
+    bucket_name: str,
+    object_key: str,
+    request: Request,
+    part_size_mb: int = Query(None, ge=MIN_PART_SIZE // (1024 * 1024), le=5 * 1024),
+    concurrency: int = Query(None, ge=1, le=32),
+    upload_id: str = None,
+    user=Depends(verify_token)
+):
+    # 요청 본문(raw bytes)을 그대로 파트로 잘라 올림. upload_id를 주면 완료된 파트 뒤부터 이어서 업로드
+    upload = MultipartStreamUpload(
+        aws,
+        s3_client,
+        bucket_name,
+        object_key,
+        part_size=(part_size_mb or UPLOAD_PART_SIZE_MB) * 1024 * 1024,
+        concurrency=concurrency or UPLOAD_CONCURRENCY,
+        upload_id=upload_id
+    )
+    try:
+        await upload.start()
+        result = await upload.upload(request.stream())
+        cache.invalidate("list_objects_v2", bucket=bucket_name)
+        return result
+    except ClientError as e:
+        error = aws_error(e)
+    except ValueError as e:
+        # 파트 수 초과처럼 요청 값 때문에 실패한 경우
+        error = HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        # 재시도 후에도 남은 S3 연결 오류/timeout은 잠시 후 이어서 올리면 되므로 503, 그 밖(클라이언트 연결 끊김 등)은 500
+        if isinstance(e, BotoCoreError):
+            error = HTTPException(status_code=503, detail=str(e) or type(e).__name__, headers={"Retry-After": "1"})
+        else:
+            error = HTTPException(status_code=500, detail=str(e) or type(e).__name__)
+    # 업로드는 중단하지 않고 남겨두므로 upload_id로 재개 오프셋을 조회해 이어서 올릴 수 있음 (시작 전에 실패했으면 없음)
+    if upload.upload_id:
+        error.detail = {"error": error.detail, "upload_id": upload.upload_id}
+    raise error
+
+
+@app.get("/api/s3/buckets/{bucket_name}/multipart/{object_key:path}")
+async def get_upload_status(bucket_name: str, object_key: str, upload_id: str, user=Depends(verify_token)):
+    try:
+        parts = await list_uploaded_parts(aws, s3_client, bucket_name, object_key, upload_id)
+    except ClientError as e:
+        raise aws_error(e)
+    # 재개 시 클라이언트는 resume_offset 바이트부터 본문을 다시 보내면 됨
+    completed = contiguous_parts(parts)
+    return {
+        "upload_id": upload_id,
+        "parts": len(completed),
+        "resume_offset": sum(part['Size'] for part in completed)
+    }
+
+
+@app.delete("/api/s3/buckets/{bucket_name}/multipart/{object_key:path}")
+async def abort_upload(bucket_name: str, object_key: str, upload_id: str, user=Depends(verify_token)):
+    try:
+        await aws.call(s3_client.abort_multipart_upload, Bucket=bucket_name, Key=object_key, UploadId=upload_id)
+        return {"message": "Upload aborted", "upload_id": upload_id}
+    except ClientError as e:
+        raise aws_error(e)
+
+
+def object_headers(response):
+    headers = {"Accept-Ranges": "bytes"}
+    if response.get('ETag'):
+        headers["ETag"] = response['ETag']
+    if response.get('LastModified'):
+        headers["Last-Modified"] = format_datetime(response['LastModified'].astimezone(timezone.utc), usegmt=True)
+    return headers
+
+
+@app.get("/api/s3/buckets/{bucket_name}/objects/{object_key:path}")
+async def download_object(
+    bucket_name: str,
+    object_key: str,
+    request: Request,
+    parallel: bool = False,
+    concurrency: int = Query(None, ge=1, le=32),
+    user=Depends(verify_token)
+):
+    range_header = request.headers.get("range")
+    if_none_match = request.headers.get("if-none-match")
+    conditional = {"IfNoneMatch": if_none_match} if if_none_match else {}
+    try:
+        if parallel:
+            # 큰 객체는 여러 구간을 동시에 받아 순서대로 이어 붙임
+            head = await aws.call(s3_client.head_object, Bucket=bucket_name, Key=object_key, **conditional)
+            size = head['ContentLength']
+            byte_range = parse_range(range_header, size) if size else None
+            start, end = byte_range or (0, size - 1)
+            headers = object_headers(head)
+            headers["Content-Length"] = str(end - start + 1)
+            if byte_range:
+                headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            body = stream_parallel(
+                aws, s3_client, bucket_name, object_key, head['ETag'], start, end,
+                part_size=DOWNLOAD_PART_SIZE_MB * 1024 * 1024,
+                concurrency=concurrency or DOWNLOAD_CONCURRENCY
+            ) if size else iter([])
+            return StreamingResponse(
+                body,
+                status_code=206 if byte_range else 200,
+                media_type=head.get('ContentType', "application/octet-stream"),
+                headers=headers
+            )
+
+        params = dict(conditional)
+        if range_header:
+            params["Range"] = range_header
+        response = await aws.call(s3_client.get_object, Bucket=bucket_name, Key=object_key, **params)
+        headers = object_headers(response)
+        headers["Content-Length"] = str(response['ContentLength'])
+        if response.get('ContentRange'):
+            headers["Content-Range"] = response['ContentRange']
+        return StreamingResponse(
+            stream_body(aws, response['Body'], DOWNLOAD_CHUNK_SIZE_KB * 1024),
+            status_code=206 if response.get('ContentRange') else 200,
+            media_type=response.get('ContentType', "application/octet-stream"),
+            headers=headers
+        )
+    except RangeNotSatisfiable:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    except ClientError as e:
+        status = client_error_status(e)
+        if status == 304:
+            return Response(status_code=304, headers={"ETag": if_none_match})
+        if status in (404, 412, 416):
+            raise HTTPException(status_code=status, detail=str(e))
+        raise aws_error(e)
 
 
 @app.delete("/api/s3/buckets/{bucket_name}/objects/{object_key}")
 async def delete_object(bucket_name: str, object_key: str, user=Depends(verify_token)):
     try:
-        s3_client.delete_object(Bucket=bucket_name, Key=object_key)
+        await aws.call(s3_client.delete_object, Bucket=bucket_name, Key=object_key)
+        cache.invalidate("list_objects_v2", bucket=bucket_name)
         return {"message": "Object deleted successfully"}
     except ClientError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise aws_error(e)
+
+
+def invalidate_objects(bucket_name):
+    cache.invalidate("list_objects_v2", bucket=bucket_name)
+
+
+delete_jobs = DeleteJobManager(on_batch=invalidate_objects)
+
+
+class BulkDeleteRequest(BaseModel):
+    keys: Optional[List[str]] = None
+    prefix: Optional[str] = None
+    start_after: Optional[str] = None
+
+
+@app.post("/api/s3/buckets/{bucket_name}/delete")
+async def bulk_delete(
+    bucket_name: str,
+    request: BulkDeleteRequest,
+    stream: bool = False,
+    user=Depends(verify_token)
+):
+    # 키 목록 또는 prefix 아래 객체를 1000개씩 DeleteObjects로 지움. 작업은 백그라운드에서 돌고 연결이 끊겨도 계속됨
+    # stream=true면 진행 상황을 바로 SSE로 받고, 끊기면 events_url에 Last-Event-ID를 붙여 이어 받음
+    if (request.keys is None) == (request.prefix is None):
+        raise HTTPException(status_code=422, detail="Specify either keys or prefix")
+    if request.prefix is not None and not request.prefix:
+        raise HTTPException(status_code=422, detail="prefix must not be empty")
+    if request.keys is not None and len(request.keys) > DELETE_MAX_KEYS:
+        raise HTTPException(status_code=422, detail=f"At most {DELETE_MAX_KEYS} keys per request, use prefix instead")
+    job = delete_jobs.submit(
+        aws, s3_client, bucket_name, keys=request.keys, prefix=request.prefix, start_after=request.start_after
+    )
+    if stream:
+        return StreamingResponse(delete_jobs.events(job), media_type="text/event-stream", headers={"X-Job-Id": job.id})
+    return JSONResponse(status_code=202, content={
+        "job_id": job.id,
+        "status": job.status,
+        "poll_url": f"/api/s3/delete-jobs/{job.id}",
+        "events_url": f"/api/s3/delete-jobs/{job.id}/events"
+    })
+
+
+def get_delete_job(job_id):
+    job = delete_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.get("/api/s3/delete-jobs/{job_id}")
+async def delete_job_status(job_id: str, user=Depends(verify_token)):
+    return get_delete_job(job_id).to_dict()
+
+
+@app.get("/api/s3/delete-jobs/{job_id}/events")
+async def delete_job_events(
+    job_id: str,
+    after: int = 0,
+    last_event_id: int = Header(None),
+    user=Depends(verify_token)
+):
+    # 마지막으로 받은 이벤트 id(Last-Event-ID 헤더 또는 after) 뒤부터 보냄
+    job = get_delete_job(job_id)
+    return StreamingResponse(delete_jobs.events(job, last_event_id or after), media_type="text/event-stream")
+
+
+@app.delete("/api/s3/delete-jobs/{job_id}")
+async def cancel_delete_job(job_id: str, user=Depends(verify_token)):
+    # 진행 중인 배치는 끝까지 처리하고 다음 배치부터 멈춤
+    job = get_delete_job(job_id)
+    await delete_jobs.cancel(job)
+    return job.to_dict()
+
+
+async def list_bucket_summaries():
+    response = await aws.call(s3_client.list_buckets)
+    return {
+        bucket['Name']: {"id": bucket['Name'], "name": bucket['Name'], "created": bucket['CreationDate'].isoformat()}
+        for bucket in response['Buckets']
+    }
+
+
+async def describe_bucket(summary):
+    # 태그는 목록 API에 없으므로 새 버킷과 주기적인 전체 갱신 때만 버킷별로 조회
+    try:
+        response = await aws.call(s3_client.get_bucket_tagging, Bucket=summary["id"])
+    except ClientError as e:
+        if error_code(e) != 'NoSuchTagSet':
+            raise
+        return {"tags": {}}
+    return {"tags": {tag['Key']: tag['Value'] for tag in response['TagSet']}}
+
+
+inventory = InventoryIndex("s3:bucket", list_bucket_summaries, describe_bucket)
+
+
+@app.get("/api/s3/search")
+async def search_inventory(
+    q: str = None,
+    tag: List[str] = Query([]),
+    limit: int = Query(INVENTORY_SEARCH_LIMIT, ge=1, le=1000),
+    user=Depends(verify_token)
+):
+    # 백그라운드 색인만 읽으므로 AWS를 부르지 않음. q는 단어 접두사, tag는 key 또는 key=value (여러 개면 모두 만족)
+    return search_response(inventory, q, tag, limit)
+
+
+@app.get("/api/s3/changes")
+async def inventory_changes(since: int = 0, user=Depends(verify_token)):
+    # 이전에 받은 마지막 seq를 since로 넘기면 그 뒤의 생성/삭제/변경 이벤트만 받음
+    return inventory.changes_since(since)
+
+
+@app.on_event("startup")
+async def start_background_tasks():
+    # 로그아웃된 토큰 목록을 auth-service에서 주기적으로 받아옴
+    verifier.start()
+    # boto3 클라이언트 워밍업 (AWS_PRELOAD_CLIENTS)
+    aws_clients.start()
+    inventory.start()
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    await verifier.stop()
+    await inventory.stop()
+    await aws_clients.stop()
 
 
 @app.get("/health")
@@ -103,7 +434,13 @@ async def health_check():
     return {
         "status": "healthy",
         "service": "s3-service",
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": datetime.utcnow().isoformat(),
+        "aws_calls": aws.stats(),
+        "aws_clients": aws_clients.stats(),
+        "inventory": inventory.stats(),
+        "delete_jobs": delete_jobs.stats(),
+        "cache": cache.stats(),
+        "auth": verifier.stats()
     }
 
 
@@ -0,0 +1,128 @@
+import asyncio
+import time
+
+# S3 멀티파트 업로드 제한: 마지막 파트를 제외한 모든 파트는 5MiB 이상, 파트 번호는 최대 10000
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PARTS = 10000
+
+
+class MultipartStreamUpload:
+    """요청 본문을 임시 파일 없이 파트 단위로 잘라 S3에 병렬 업로드"""
+
+    def __init__(self, aws, s3_client, bucket, key, part_size, concurrency, upload_id=None):
+        self.aws = aws
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.concurrency = concurrency
+        self.upload_id = upload_id
+        self.parts = {}
+        self.resumed_bytes = 0
+        self.uploaded_bytes = 0
+
+    async def start(self):
+        if self.upload_id:
+            parts = await list_uploaded_parts(self.aws, self.s3_client, self.bucket, self.key, self.upload_id)
+            for part in contiguous_parts(parts):
+                self.parts[part['PartNumber']] = part['ETag']
+                self.resumed_bytes += part['Size']
+        else:
+            response = await self.aws.call(
+                self.s3_client.create_multipart_upload,
+                Bucket=self.bucket,
+                Key=self.key
+            )
+            self.upload_id = response['UploadId']
+
+    async def _upload_part(self, semaphore, number, data):
+        try:
+            response = await self.aws.call(
+                self.s3_client.upload_part,
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self.upload_id,
+                PartNumber=number,
+                Body=data
+            )
+            self.parts[number] = response['ETag']
+            self.uploaded_bytes += len(data)
+        finally:
+            semaphore.release()
+
+    async def upload(self, chunks):
+        started = time.perf_counter()
+        # 동시에 올라가는 파트 수를 제한하므로 메모리는 part_size * (concurrency + 1) 이내로 유지됨
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = []
+        number = max(self.parts, default=0) + 1
+        buffer = bytearray()
+
+        async def flush(data):
+            nonlocal number
+            if number > MAX_PARTS:
+                raise ValueError(f"Upload exceeds {MAX_PARTS} parts; increase part_size")
+            await semaphore.acquire()
+            tasks.append(asyncio.create_task(self._upload_part(semaphore, number, data)))
+            number += 1
+
+        try:
+            async for chunk in chunks:
+                buffer += chunk
+                while len(buffer) >= self.part_size:
+                    data = bytes(buffer[:self.part_size])
+                    del buffer[:self.part_size]
+                    await flush(data)
+                # 실패한 파트가 있으면 나머지 본문을 더 읽지 않고 중단
+                for task in tasks:
+                    if task.done() and task.exception():
+                        raise task.exception()
+            if buffer or (not self.parts and not tasks):
+                await flush(bytes(buffer))
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        await self.aws.call(
+            self.s3_client.complete_multipart_upload,
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            MultipartUpload={
+                "Parts": [{"PartNumber": n, "ETag": self.parts[n]} for n in sorted(self.parts)]
+            }
+        )
+        elapsed = time.perf_counter() - started
+        return {
+            "key": self.key,
+            "upload_id": self.upload_id,
+            "parts": len(self.parts),
+            "bytes": self.resumed_bytes + self.uploaded_bytes,
+            "seconds": round(elapsed, 3),
+            "mb_per_sec": round(self.uploaded_bytes / 1024 / 1024 / elapsed, 2) if elapsed else 0.0
+        }
+
+
+async def list_uploaded_parts(aws, s3_client, bucket, key, upload_id):
+    parts = []
+    params = {"Bucket": bucket, "Key": key, "UploadId": upload_id}
+    while True:
+        response = await aws.call(s3_client.list_parts, **params)
+        parts.extend(response.get('Parts', []))
+        if not response.get('IsTruncated'):
+            return parts
+        params["PartNumberMarker"] = response['NextPartNumberMarker']
+
+
+def contiguous_parts(parts):
+    # 이어서 올릴 때는 1번부터 빈틈없이 완료된 파트까지만 인정
+    # (병렬 업로드 중 끊기면 중간 파트가 빠질 수 있고, 그 뒤 파트는 다시 올려서 덮어씀)
+    result = []
+    for part in sorted(parts, key=lambda p: p['PartNumber']):
+        if part['PartNumber'] != len(result) + 1:
+            break
+        result.append(part)
+    return result
@@ -0,0 +1,142 @@
+import asyncio
+import os
+import sys
+
+import pytest
+from botocore.exceptions import ClientError
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "s3-service"))
+
+from aws_client import AWSCallLayer, CircuitBreaker, CircuitOpen, TokenBucket  # noqa: E402
+from cache import TTLCache  # noqa: E402
+
+
+def aws_failure(code, status):
+    return ClientError({"Error": {"Code": code, "Message": code}, "ResponseMetadata": {"HTTPStatusCode": status}}, "invoke")
+
+
+class FakeLambda:
+    """boto3 클라이언트처럼 meta.region_name이 있어서 AWSCallLayer가 API 호출로 보고 속도 제한을 적용함"""
+
+    class meta:
+        region_name = "ap-northeast-2"
+
+    def __init__(self, failures=()):
+        self.failures = list(failures)
+        self.calls = []
+
+    def invoke(self, FunctionName):
+        self.calls.append(FunctionName)
+        if self.failures:
+            raise self.failures.pop(0)
+        return {"StatusCode": 200}
+
+
+def expire(breaker):
+    # reset_seconds가 지난 것처럼 열린 시각을 앞당김
+    breaker.opened_at -= breaker.reset_seconds
+
+
+def test_token_bucket_halves_rate_on_throttling_and_ramps_back():
+    bucket = TokenBucket(20, 20)
+    bucket.throttled()
+    assert bucket.rate == 10
+    bucket.throttled()
+    assert bucket.rate == 5
+    for _ in range(20):
+        bucket.succeeded()
+    assert bucket.rate == 20
+    for _ in range(10):
+        bucket.throttled()
+    # 아무리 스로틀링돼도 설정 속도의 1/20 밑으로는 내려가지 않음
+    assert bucket.rate == 1
+
+
+def test_layer_backs_off_limiter_on_throttling_and_retries():
+    client = FakeLambda([aws_failure("ThrottlingException", 400)])
+    layer = AWSCallLayer("test", rate_limit=20, max_retries=1)
+
+    assert asyncio.run(layer.call(client.invoke, FunctionName="f")) == {"StatusCode": 200}
+    limiter = layer._limiters["ap-northeast-2/invoke"]
+    # 스로틀링으로 절반(10)이 됐다가 재시도 성공으로 1만큼 회복
+    assert limiter.rate == 11
+    assert layer.throttled == 1 and layer.retries == 1
+    assert client.calls == ["f", "f"]
+
+
+def test_breaker_opens_then_half_opens_and_closes_on_success():
+    breaker = CircuitBreaker(failures=2, reset_seconds=30)
+    breaker.failed()
+    assert breaker.state == "closed"
+    breaker.failed()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpen):
+        breaker.check("invoke")
+
+    expire(breaker)
+    breaker.check("invoke")
+    assert breaker.state == "half_open"
+    # 시험 호출이 진행 중이면 다른 호출은 계속 막음
+    with pytest.raises(CircuitOpen):
+        breaker.check("invoke")
+    breaker.succeeded()
+    assert breaker.state == "closed"
+
+
+def test_breaker_reopens_when_probe_fails():
+    breaker = CircuitBreaker(failures=1, reset_seconds=30)
+    breaker.failed()
+    expire(breaker)
+    breaker.check("invoke")
+    breaker.failed()
+    assert breaker.state == "open"
+    assert breaker.opened == 2
+    with pytest.raises(CircuitOpen):
+        breaker.check("invoke")
+
+
+def test_scoped_breakers_are_separate_but_share_the_limiter():
+    client = FakeLambda([aws_failure("ServiceException", 500)])
+    layer = AWSCallLayer("test", max_retries=0)
+    layer._breakers["ap-northeast-2/invoke/broken"] = CircuitBreaker(failures=1)
+
+    async def scenario():
+        with pytest.raises(ClientError):
+            await layer.call_scoped("broken", client.invoke, FunctionName="broken")
+        with pytest.raises(CircuitOpen):
+            await layer.call_scoped("broken", client.invoke, FunctionName="broken")
+        # 다른 함수 호출은 막히지 않음
+        return await layer.call_scoped("healthy", client.invoke, FunctionName="healthy")
+
+    assert asyncio.run(scenario()) == {"StatusCode": 200}
+    assert client.calls == ["broken", "healthy"]
+    assert list(layer._limiters) == ["ap-northeast-2/invoke"]
+    assert layer.stats()["circuits"] == {"ap-northeast-2/invoke/broken": "open"}
+
+
+def test_cache_falls_back_to_stale_value_when_upstream_is_degraded():
+    async def scenario():
+        cache = TTLCache("test", stale_seconds=0)
+
+        async def fresh():
+            return ["old"]
+
+        async def degraded():
+            raise aws_failure("ServiceUnavailable", 503)
+
+        async def rejected():
+            raise CircuitOpen("list_functions", 30)
+
+        async def invalid():
+            raise aws_failure("AccessDenied", 403)
+
+        assert await cache.get("list_functions", fresh, ttl=0) == ["old"]
+        assert await cache.get("list_functions", degraded, ttl=0) == ["old"]
+        assert await cache.get("list_functions", rejected, ttl=0) == ["old"]
+        # 요청 자체의 오류는 이전 값으로 가리지 않음
+        with pytest.raises(ClientError):
+            await cache.get("list_functions", invalid, ttl=0)
+        return cache
+
+    cache = asyncio.run(scenario())
+    assert cache.fallbacks == 2
@@ -0,0 +1,48 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "s3-service"))
+
+from cache import TTLCache  # noqa: E402
+
+
+def slow_loader(value, release):
+    async def load():
+        await release.wait()
+        return value
+    return load
+
+
+def test_invalidating_one_key_keeps_loads_of_other_keys():
+    async def scenario():
+        cache = TTLCache("test")
+        release = asyncio.Event()
+        a = asyncio.create_task(cache.get("list_objects_v2", slow_loader("a", release), ttl=60, bucket="a"))
+        b = asyncio.create_task(cache.get("list_objects_v2", slow_loader("b", release), ttl=60, bucket="b"))
+        await asyncio.sleep(0)
+        cache.invalidate("list_objects_v2", bucket="b")
+        release.set()
+        assert await asyncio.gather(a, b) == ["a", "b"]
+        return cache
+
+    cache = asyncio.run(scenario())
+    # a는 무효화와 무관하므로 캐시에 남고, 로드 중에 무효화된 b는 넣지 않음
+    assert [key[1] for key in cache._entries] == ['{"bucket": "a"}']
+    assert cache._loads == {}
+
+
+def test_load_started_after_invalidation_is_cached():
+    async def scenario():
+        cache = TTLCache("test")
+        release = asyncio.Event()
+        first = asyncio.create_task(cache.get("list_buckets", slow_loader("old", release), ttl=60))
+        await asyncio.sleep(0)
+        cache.invalidate("list_buckets")
+        second = asyncio.create_task(cache.get("list_buckets", slow_loader("new", release), ttl=60))
+        await asyncio.sleep(0)
+        release.set()
+        assert await asyncio.gather(first, second) == ["old", "new"]
+        return await cache.get("list_buckets", slow_loader("unused", asyncio.Event()), ttl=60)
+
+    assert asyncio.run(scenario()) == "new"
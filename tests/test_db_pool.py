@@ -0,0 +1,42 @@
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "rds-service"))
+
+from db_pool import fetch_rows  # noqa: E402
+
+
+class NamedCursor:
+    """psycopg2 이름 있는(서버 측) 커서처럼 execute 뒤에는 description이 없고 첫 fetch 이후에 채워지는 커서"""
+
+    name = "rds_service_stream"
+
+    def __init__(self, rows):
+        self._rows = list(rows)
+        self.description = None
+
+    def fetchmany(self, size):
+        self.description = (("id",), ("name",))
+        batch, self._rows = self._rows[:size], self._rows[size:]
+        return batch
+
+
+def test_named_cursor_fetches_before_reading_description():
+    cursor = NamedCursor([(i, f"row-{i}") for i in range(5)])
+    columns, rows = fetch_rows(cursor, 3)
+    assert columns == ["id", "name"]
+    assert rows == [{"id": 0, "name": "row-0"}, {"id": 1, "name": "row-1"}, {"id": 2, "name": "row-2"}]
+    columns, rows = fetch_rows(cursor, 3)
+    assert [row["id"] for row in rows] == [3, 4]
+    assert fetch_rows(cursor, 3) == (["id", "name"], [])
+
+
+def test_plain_cursor_rows_and_statements_without_results():
+    conn = sqlite3.connect(":memory:")
+    cursor = conn.cursor()
+    cursor.execute("CREATE TABLE t (id INTEGER)")
+    assert fetch_rows(cursor, 10) == ([], [])
+    cursor.executemany("INSERT INTO t VALUES (?)", [(1,), (2,)])
+    cursor.execute("SELECT id FROM t ORDER BY id")
+    assert fetch_rows(cursor, 10) == (["id"], [{"id": 1}, {"id": 2}])
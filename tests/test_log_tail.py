@@ -0,0 +1,108 @@
+import asyncio
+import gc
+import os
+import sys
+from types import SimpleNamespace
+
+from botocore.exceptions import EndpointConnectionError
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cloudwatch-service"))
+
+from log_tail import LogTailHub  # noqa: E402
+
+
+class FakeAWS:
+    async def call(self, fn, **params):
+        await asyncio.sleep(0)
+        return {"events": [{"timestamp": 1, "message": "hello"}], "nextForwardToken": "t"}
+
+
+class FlakyAWS(FakeAWS):
+    """fail_on번째 호출부터 연결 오류(ClientError가 아닌 예외)를 냄"""
+
+    def __init__(self, fail_on):
+        self.calls = 0
+        self.fail_on = fail_on
+
+    async def call(self, fn, **params):
+        self.calls += 1
+        if self.calls >= self.fail_on:
+            raise EndpointConnectionError(endpoint_url="https://logs")
+        return await super().call(fn, **params)
+
+
+def hub(aws=None):
+    return LogTailHub(aws or FakeAWS(), SimpleNamespace(get_log_events=None), interval=0.01)
+
+
+def test_stream_that_is_never_iterated_releases_the_poller():
+    async def scenario():
+        tails = hub()
+        events = await tails.stream("group", "stream")
+        assert tails.stats()["tails"] == 1
+        # 응답이 시작되기 전에 연결이 끊겨서 생성기가 그대로 버려진 상황
+        del events
+        gc.collect()
+        await asyncio.sleep(0.05)
+        return tails.stats()["tails"]
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_stream_backfills_and_unsubscribes_on_close():
+    async def scenario():
+        tails = hub()
+        events = await tails.stream("group", "stream")
+        first = await events.__anext__()
+        await events.aclose()
+        return first, tails.stats()["tails"]
+
+    first, remaining = asyncio.run(scenario())
+    assert first.startswith("event: log\n") and '"hello"' in first
+    assert remaining == 0
+
+
+def test_connection_error_on_first_poll_fails_the_subscription():
+    async def scenario():
+        tails = hub(FlakyAWS(fail_on=1))
+        try:
+            await asyncio.wait_for(tails.stream("group", "stream"), 1)
+        except EndpointConnectionError:
+            return tails.stats()["tails"]
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_connection_error_after_first_poll_is_broadcast_and_poller_keeps_running():
+    async def scenario():
+        aws = FlakyAWS(fail_on=2)
+        tails = hub(aws)
+        events = await tails.stream("group", "stream")
+        assert (await events.__anext__()).startswith("event: log\n")
+        error = await asyncio.wait_for(events.__anext__(), 1)
+        # 백오프 후에도 계속 재시도하고 폴러는 허브에 남아 있음
+        await asyncio.sleep(0.1)
+        calls, remaining = aws.calls, tails.stats()["tails"]
+        await events.aclose()
+        return error, calls, remaining
+
+    error, calls, remaining = asyncio.run(scenario())
+    assert error.startswith("event: error\n") and "Could not connect" in error
+    assert calls > 2
+    assert remaining == 1
+
+
+def test_poller_that_dies_is_removed_from_the_hub():
+    class BrokenAWS(FakeAWS):
+        async def call(self, fn, **params):
+            return {}
+
+    async def scenario():
+        tails = hub(BrokenAWS())
+        try:
+            await asyncio.wait_for(tails.stream("group", "stream"), 1)
+        except KeyError:
+            pass
+        return tails.stats()["tails"]
+
+    assert asyncio.run(scenario()) == 0
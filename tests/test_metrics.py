@@ -0,0 +1,53 @@
+import asyncio
+import os
+import sys
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cloudwatch-service"))
+
+from metrics import MetricSeriesCache, metric_query  # noqa: E402
+
+QUERIES = [
+    metric_query(f"m{index}", {"namespace": "CWAgent", "name": "cpu", "dimensions": {"host": host}}, 60)
+    for index, host in enumerate("ab")
+]
+CLIENT = SimpleNamespace(get_metric_data=None)
+
+
+class FakeAWS:
+    """get_metric_data 대역. 요청 구간의 60초 간격 데이터포인트(값 = timestamp)를 gate가 열린 뒤 돌려줌"""
+
+    def __init__(self):
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    async def call(self, fn, **params):
+        await self.gate.wait()
+        stamps = list(range(int(params["StartTime"]), int(params["EndTime"]), 60))
+        return {"MetricDataResults": [
+            {"Id": query["Id"], "Timestamps": [datetime.fromtimestamp(t, timezone.utc) for t in stamps], "Values": stamps}
+            for query in params["MetricDataQueries"]
+        ]}
+
+
+def test_entry_dropped_while_fetching_missing_range():
+    async def scenario():
+        cache = MetricSeriesCache(settle_seconds=0)
+        aws = FakeAWS()
+        # m0은 앞 구간만, m1은 전체 구간이 캐시에 있음
+        await cache.fetch(aws, CLIENT, QUERIES[:1], 0, 600, 60)
+        await cache.fetch(aws, CLIENT, QUERIES[1:], 0, 1200, 60)
+        aws.gate.clear()
+        task = asyncio.create_task(cache.fetch(aws, CLIENT, QUERIES, 0, 1200, 60))
+        await asyncio.sleep(0)
+        # m0의 뒤 구간을 조회하는 동안 다른 요청의 정리로 캐시 항목이 빠진 상황
+        cache._entries.clear()
+        cache.points = 0
+        aws.gate.set()
+        return await task
+
+    series = asyncio.run(scenario())
+    for timestamps, values in series.values():
+        assert list(timestamps) == list(range(0, 1200, 60))
+        assert list(values) == list(range(0, 1200, 60))
@@ -0,0 +1,27 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "auth-service"))
+
+from tokens import Revocations  # noqa: E402
+
+
+def test_revocations_survive_reopening_the_store(tmp_path):
+    path = str(tmp_path / "users.db")
+    Revocations(path).add("a", time.time() + 60)
+    revocations = Revocations(path)
+    assert revocations.is_revoked("a")
+    assert not revocations.is_revoked("b")
+    seq, rows = revocations.since(0)
+    assert seq == 1 and [jti for jti, _ in rows] == ["a"]
+
+
+def test_expired_revocations_are_pruned_without_moving_seq_back(tmp_path):
+    revocations = Revocations(str(tmp_path / "users.db"))
+    revocations.add("old", time.time() - 1)
+    revocations.add("new", time.time() + 60)
+    seq, rows = revocations.since(0)
+    assert seq == 2
+    assert [jti for jti, _ in rows] == ["new"]
+    assert not revocations.is_revoked("old")